@@ -1,11 +1,17 @@
 from __future__ import annotations
 
 import asyncio
+import os
+import time
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
+from ..integrations.http_client import IntegrationError
 from ..utils.metrics_tracker import track_agent_execution, get_trace_id_for_workflow
+from .intent_cache import intent_cache
+from .intent_model import intent_model
+from .intent_rules import IntentMatch, intent_rules, normalize_text
 from .models import (
     AccountEntitlement,
     CustomerInteraction,
@@ -19,6 +25,22 @@ from .models import (
     EscalationInfo,
     WorkflowState,
 )
+from .probe_graph import Probe, ProbeGraph
+from .telemetry import TELEMETRY_MAX_AGE_SECONDS
+from .workflow_spec import VerificationSpec, WorkflowSpec, workflow_specs
+
+# Model predictions below this confidence are decided by the rule table instead
+INTENT_MODEL_MIN_CONFIDENCE = float(os.getenv("INTENT_MODEL_MIN_CONFIDENCE", "0.6"))
+
+# Diagnostic probes of one workflow share a deadline; each probe also has its own timeout
+DIAGNOSTIC_DEADLINE_SECONDS = float(os.getenv("DIAGNOSTIC_DEADLINE_SECONDS", "3"))
+DIAGNOSTIC_PROBE_TIMEOUT_SECONDS = float(os.getenv("DIAGNOSTIC_PROBE_TIMEOUT_SECONDS", "2"))
+
+# Verification re-pulls telemetry until its checks pass or the budget runs out
+VERIFICATION_BUDGET_SECONDS = float(os.getenv("VERIFICATION_BUDGET_SECONDS", "15"))
+VERIFICATION_PROBE_TIMEOUT_SECONDS = float(os.getenv("VERIFICATION_PROBE_TIMEOUT_SECONDS", "2"))
+VERIFICATION_POLL_INITIAL_SECONDS = float(os.getenv("VERIFICATION_POLL_INITIAL_SECONDS", "0.25"))
+VERIFICATION_POLL_MAX_SECONDS = float(os.getenv("VERIFICATION_POLL_MAX_SECONDS", "4"))
 
 
 @dataclass
@@ -26,20 +48,31 @@ class WorkflowContext:
     """Shared context passed between agents within a workflow run."""
 
     workflow_id: str
-    workflow_type: WorkflowType
+    # None until the intent detection stage has run
+    workflow_type: Optional[WorkflowType]
     interaction: CustomerInteraction
     device: DeviceMetadata
     telemetry: TelemetrySnapshot
     entitlement: AccountEntitlement
-    # mock integration handles / clients (to be wired to real systems later)
-    cc_platform: Optional[Any] = None  # e.g. Genesys / Twilio client
+    # Integration clients (see integrations/backends.py)
+    cc_platform: Optional[Any] = None  # CCaaS, e.g. Genesys / Twilio
+    crm_client: Optional[Any] = None  # CRM / ticketing
+    device_client: Optional[Any] = None  # device management
+    # Live device readings: latest(device_id) and async probe(device_id, fields, since),
+    # e.g. telemetry.TelemetryHub or device_simulator.DeviceSimulator
     telemetry_client: Optional[Any] = None
-    crm_client: Optional[Any] = None
+    # Compiled definition of the workflow type (see workflow_spec.py); set with workflow_type
+    workflow: Optional[WorkflowSpec] = None
 
 
 class BaseAgent:
     name: str
     description: str = ""
+    # Outcomes a workflow spec can branch on after this agent's stage
+    outcomes: Tuple[str, ...] = ("done",)
+
+    def outcome(self, state: WorkflowState) -> str:
+        return "done"
 
     async def run(self, ctx: WorkflowContext, state: WorkflowState) -> WorkflowState:
         raise NotImplementedError
@@ -49,9 +82,9 @@ class BaseAgent:
         # Get or create trace ID for workflow
         trace_id = get_trace_id_for_workflow(ctx.workflow_id)
         
-        # Determine category from workflow type
-        category_id = ctx.workflow_type.value
-        category_name = ctx.workflow_type.value.replace("_", " ").title()
+        # Determine category from workflow type (unknown while intent detection runs)
+        category_id = ctx.workflow_type.value if ctx.workflow_type else None
+        category_name = category_id.replace("_", " ").title() if category_id else None
         
         # Get ticket ID from state if available
         ticket_id = getattr(state, "ticket_id", None)
@@ -101,248 +134,424 @@ class BaseAgent:
 
 class IntentDetectionAgent(BaseAgent):
     """
-    Very simple rule-based intent detection.
+    Intent detection from the rule table (see intent_rules.py / intent_rules.json),
+    optionally preceded by a local hashed n-gram classifier (see intent_model.py)
+    when a trained model file is deployed.
     In production, this would be replaced with an LLM or NLU model.
     """
 
     name = "intent_detection"
     description = "Classifies customer intents using multi-class LLM reasoning, matching queries to known workflows with confidence scoring."
 
+    @staticmethod
+    def _workflow_type(intent: str) -> WorkflowType:
+        try:
+            return WorkflowType(intent)
+        except ValueError:
+            # Rule files and models may name intents that have no workflow yet
+            return WorkflowType.printer_offline
+
+    @staticmethod
+    def detect_batch(texts: List[str]) -> List[IntentMatch]:
+        """
+        Detect intents for many texts. The model (if loaded) scores the whole batch
+        in one pass; predictions below INTENT_MODEL_MIN_CONFIDENCE fall back to the rules.
+        """
+        results: List[Optional[IntentMatch]] = [None] * len(texts)
+        if intent_model is not None and texts:
+            for i, (intent, confidence) in enumerate(intent_model.predict(texts)):
+                if confidence >= INTENT_MODEL_MIN_CONFIDENCE:
+                    results[i] = IntentMatch(intent, confidence, source="model")
+        return [match or intent_rules.match(text) for match, text in zip(results, texts)]
+
     async def run(self, ctx: WorkflowContext, state: WorkflowState) -> WorkflowState:
         text = ctx.interaction.text.lower()
+        state.stage = WorkflowStage.detecting_intent
+        state.status = WorkflowStatus.running
         self._log(state, "info", "Running intent detection", text=text)
 
-        if "offline" in text or "not responding" in text or "cannot print" in text:
-            inferred = WorkflowType.printer_offline
-        elif "ink" in text or "cartridge" in text:
-            inferred = WorkflowType.ink_error
-        else:
-            # default to offline; in production we might ask clarifying questions
-            inferred = WorkflowType.printer_offline
+        match = self.detect_batch([text])[0]
+        intent_cache.put(text, match)
+        inferred = self._workflow_type(match.intent)
+        ctx.workflow_type = inferred
+        state.workflow_type = inferred
 
-        state.diagnosis = (state.diagnosis or {}) | {"intent": inferred.value}
-        self._log(state, "info", "Intent detected", workflow_type=inferred.value)
+        state.diagnosis = (state.diagnosis or {}) | {
+            "intent": inferred.value,
+            "intent_confidence": match.confidence,
+            "intent_source": match.source,
+        }
+        self._log(
+            state,
+            "info",
+            "Intent detected",
+            workflow_type=inferred.value,
+            confidence=match.confidence,
+            source=match.source,
+            matched=match.matched,
+        )
         return state
 
+    def classify_batch(self, texts: List[str]) -> List[WorkflowType]:
+        """
+        Classify many interactions in one pass, tracked as a single agent execution.
+
+        Identical texts (after normalization) are classified once, and texts already
+        in the intent cache are not classified at all; a batch made only of cached
+        texts records no agent execution.
+        """
+        keys = [normalize_text(text) for text in texts]
+        detected: Dict[str, IntentMatch] = {}
+        misses = []
+        for key in dict.fromkeys(keys):
+            cached = intent_cache.get(key)
+            if cached is not None:
+                detected[key] = cached
+            else:
+                misses.append(key)
+
+        if misses:
+            with track_agent_execution(
+                agent_name=self.name,
+                agent_description=self.description,
+                input_text=f"batch of {len(texts)} interactions",
+            ) as tracker:
+                for key, match in zip(misses, self.detect_batch(misses)):
+                    intent_cache.put(key, match)
+                    detected[key] = match
+                tracker.set_output(f"{len(misses)} distinct interactions classified")
+        return [self._workflow_type(detected[key].intent) for key in keys]
+
 
 class DiagnosticAgent(BaseAgent):
     """
     Performs workflow-specific diagnostics.
+
+    The workflow spec names the probes to run (see PROBES); they form a probe graph
+    (see probe_graph.py) in which telemetry reads, the device management status and
+    account checks run concurrently under one deadline. The spec's root cause rules
+    are then applied to whichever probes answered in time.
     """
 
     name = "diagnostic"
     description = "Performs workflow-specific diagnostics to identify root causes of device issues."
 
+    def __init__(self, specs: Optional[Dict[str, WorkflowSpec]] = None) -> None:
+        probes = {
+            probe.name: probe
+            for probe in [
+                Probe("heartbeat", self._telemetry_probe("online", "last_heartbeat_ts", shape=self._heartbeat)),
+                Probe("network", self._telemetry_probe("network_reachable")),
+                Probe("spooler", self._telemetry_probe("spooler_healthy")),
+                Probe("errors", self._telemetry_probe("error_codes")),
+                Probe(
+                    "ink_levels",
+                    self._telemetry_probe(
+                        "ink_level_cyan", "ink_level_magenta", "ink_level_yellow", "ink_level_black", shape=self._ink_levels
+                    ),
+                ),
+                Probe("device_status", self._probe_device_status),
+                Probe("firmware", self._probe_firmware, inputs=("errors", "device_status")),
+                Probe("entitlement", self._probe_entitlement),
+            ]
+        }
+        self.graphs: Dict[str, ProbeGraph] = {}
+        for spec in (specs or workflow_specs).values():
+            unknown = [name for name in spec.probes if name not in probes]
+            if unknown:
+                raise ValueError(f"Workflow {spec.name!r} uses unknown probes: {', '.join(unknown)}")
+            try:
+                self.graphs[spec.name] = ProbeGraph([probes[name] for name in spec.probes])
+            except ValueError as e:
+                raise ValueError(f"Workflow {spec.name!r}: {e}") from e
+
     async def run(self, ctx: WorkflowContext, state: WorkflowState) -> WorkflowState:
         self._log(state, "info", "Starting diagnostic phase")
         state.stage = WorkflowStage.diagnosing
         state.status = WorkflowStatus.running
 
-        if ctx.workflow_type == WorkflowType.printer_offline:
-            await self._diagnose_printer_offline(ctx, state)
-        elif ctx.workflow_type == WorkflowType.ink_error:
-            await self._diagnose_ink_error(ctx, state)
-        else:
-            self._log(state, "error", "Unsupported workflow type", workflow_type=ctx.workflow_type.value)
-            state.status = WorkflowStatus.failed
-            state.stage = WorkflowStage.failed
-
+        spec = ctx.workflow
+        results = await self._run_probes(ctx, state)
+        diag: Dict[str, Any] = {}
+        for value in results.values():
+            diag.update({key: v for key, v in value.items() if key != "source"})
+        diag["root_cause"] = spec.root_cause(diag)
+        diag["missing_probes"] = sorted(set(self.graphs[spec.name].probes) - set(results))
+        state.diagnosis = (state.diagnosis or {}) | {spec.name: diag}
+        self._log(state, "info", f"Diagnostics completed for {spec.name}", diagnosis=diag)
         return state
 
-    async def _diagnose_printer_offline(self, ctx: WorkflowContext, state: WorkflowState) -> None:
-        diag = {}
-        t = ctx.telemetry
-        diag["heartbeat_seen"] = bool(t.last_heartbeat_ts)
-        diag["online"] = t.online
-        diag["network_reachable"] = t.network_reachable
-        diag["spooler_healthy"] = t.spooler_healthy
-        diag["error_codes"] = t.error_codes
-
-        # Simple root cause heuristic
-        if not t.online:
-            if not t.network_reachable:
-                root = "network_connectivity_issue"
-            elif not t.spooler_healthy:
-                root = "spooler_failure"
-            else:
-                root = "unknown_offline_state"
-        else:
-            root = "intermittent_issue_or_resolved"
-
-        diag["root_cause"] = root
-        state.diagnosis = (state.diagnosis or {}) | {"printer_offline": diag}
-        self._log(state, "info", "Diagnostics completed for printer_offline", diagnosis=diag)
-
-    async def _diagnose_ink_error(self, ctx: WorkflowContext, state: WorkflowState) -> None:
-        t = ctx.telemetry
-        diag: Dict[str, Any] = {
-            "error_codes": t.error_codes,
-            "ink_levels": {
-                "cyan": t.ink_level_cyan,
-                "magenta": t.ink_level_magenta,
-                "yellow": t.ink_level_yellow,
-                "black": t.ink_level_black,
-            },
+    async def _run_probes(self, ctx: WorkflowContext, state: WorkflowState) -> Dict[str, Any]:
+        """Run the workflow's probe graph and log each probe; returns the results that came back."""
+        started = time.perf_counter()
+        outcomes = await self.graphs[ctx.workflow.name].run(
+            ctx, DIAGNOSTIC_DEADLINE_SECONDS, DIAGNOSTIC_PROBE_TIMEOUT_SECONDS
+        )
+        results = {}
+        for name, outcome in outcomes.items():
+            data: Dict[str, Any] = {"probe": name, "outcome": outcome.status, "latency_ms": outcome.latency_ms}
+            if outcome.status == "ok":
+                results[name] = outcome.value
+                if "source" in outcome.value:
+                    data["source"] = outcome.value["source"]
+            elif outcome.error:
+                data["error"] = outcome.error
+            self._log(state, "info" if outcome.status == "ok" else "warn", "Diagnostic probe finished", **data)
+
+        missing = sorted(set(outcomes) - set(results))
+        self._log(
+            state,
+            "warn" if missing else "info",
+            "Diagnostic probes completed",
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 2),
+            completed=len(results),
+            missing=missing,
+        )
+        return results
+
+    # Probes: each returns diagnosis fields
+
+    @staticmethod
+    def _telemetry_probe(
+        *fields: str, shape: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+    ) -> Callable[[WorkflowContext, Dict[str, Any]], Awaitable[Dict[str, Any]]]:
+        """A probe reading `fields` live from the device, or from the trigger snapshot without a fresh reading."""
+
+        async def probe(ctx: WorkflowContext, inputs: Dict[str, Any]) -> Dict[str, Any]:
+            values, source = None, "live"
+            client = ctx.telemetry_client
+            if client is not None:
+                try:
+                    values = await client.probe(ctx.device.device_id, fields, time.time() - TELEMETRY_MAX_AGE_SECONDS)
+                except KeyError:
+                    pass
+            if values is None:
+                values, source = {name: getattr(ctx.telemetry, name) for name in fields}, "trigger_payload"
+            return {**(shape(values) if shape else values), "source": source}
+
+        return probe
+
+    @staticmethod
+    def _heartbeat(values: Dict[str, Any]) -> Dict[str, Any]:
+        return {"online": values["online"], "heartbeat_seen": bool(values["last_heartbeat_ts"])}
+
+    @staticmethod
+    def _ink_levels(values: Dict[str, Any]) -> Dict[str, Any]:
+        return {"ink_levels": {name.removeprefix("ink_level_"): level for name, level in values.items()}}
+
+    @staticmethod
+    async def _probe_device_status(ctx: WorkflowContext, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        if ctx.device_client is None:
+            return {}
+        status = await ctx.device_client.get_status(ctx.device.device_id)
+        return {"management_reachable": status.get("reachable"), "reported_firmware": status.get("firmware_version")}
+
+    @staticmethod
+    async def _probe_firmware(ctx: WorkflowContext, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        reported = inputs.get("device_status", {}).get("reported_firmware")
+        error_codes = inputs.get("errors", {}).get("error_codes", [])
+        return {
+            "firmware_version": reported or ctx.device.firmware_version,
+            "firmware_incompatible": any(code.startswith("INK_FW") for code in error_codes),
         }
 
-        # Mock rules for root cause
-        if any(code.startswith("INK_AUTH") for code in t.error_codes):
-            root = "cartridge_not_authentic"
-        elif any(code.startswith("INK_FW") for code in t.error_codes):
-            root = "firmware_incompatibility"
-        elif any(level is not None and level == 0 for level in diag["ink_levels"].values()):
-            root = "empty_cartridge"
-        else:
-            root = "undetermined_ink_issue"
-
-        diag["root_cause"] = root
-        state.diagnosis = (state.diagnosis or {}) | {"ink_error": diag}
-        self._log(state, "info", "Diagnostics completed for ink_error", diagnosis=diag)
+    @staticmethod
+    async def _probe_entitlement(ctx: WorkflowContext, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "entitlement": {
+                "has_ink_subscription": ctx.entitlement.has_ink_subscription,
+                "replacement_eligible": ctx.entitlement.replacement_eligible,
+            }
+        }
 
 
 class ActionExecutionAgent(BaseAgent):
     """
     Executes one or more remediation actions based on diagnosis.
-    In production this would call real device / ITSM / RPA APIs.
+    Device commands go to the device management backend, subscription and
+    shipment actions to the CRM (see integrations/backends.py).
     """
 
     name = "action_execution"
     description = "Executes remediation actions based on diagnosis, including device management and RPA operations."
 
+    # Actions carried out by the CRM; "noop" calls nothing and any other action is a device command
+    crm_actions: Dict[str, Callable[[WorkflowContext, str], Awaitable[Dict[str, Any]]]] = {
+        "sync_subscription": lambda ctx, key: ctx.crm_client.sync_subscription(
+            ctx.entitlement.account_id, idempotency_key=key
+        ),
+        "create_replacement_shipment": lambda ctx, key: ctx.crm_client.create_shipment(
+            ctx.entitlement.account_id, ctx.device.device_id, "ink_cartridge", idempotency_key=key
+        ),
+    }
+
     async def run(self, ctx: WorkflowContext, state: WorkflowState) -> WorkflowState:
         self._log(state, "info", "Starting action phase")
         state.stage = WorkflowStage.acting
 
-        if ctx.workflow_type == WorkflowType.printer_offline:
-            await self._actions_printer_offline(ctx, state)
-        elif ctx.workflow_type == WorkflowType.ink_error:
-            await self._actions_ink_error(ctx, state)
+        executed = len(state.actions)
+        spec = ctx.workflow
+        root = (state.diagnosis or {}).get(spec.name, {}).get("root_cause")
+        action = spec.action_for(root)
+        await self._execute(ctx, state, action.name, action.details, self._backend_call(ctx, action.name))
+
+        # A simulated device reacts to the remediation it receives
+        apply_action = getattr(ctx.telemetry_client, "apply_action", None)
+        if apply_action is not None:
+            for action in state.actions[executed:]:
+                if action.success:
+                    apply_action(ctx.device.device_id, action.name)
 
         return state
 
-    async def _record_action(self, state: WorkflowState, name: str, success: bool, details: str) -> None:
+    async def _record_action(
+        self, state: WorkflowState, name: str, success: bool, details: str, started_at: Optional[datetime] = None
+    ) -> None:
         now = datetime.utcnow()
         result = ActionResult(
             name=name,
             success=success,
             details=details,
-            started_at=now,
+            started_at=started_at or now,
             completed_at=now,
         )
         state.actions.append(result)
         self._log(state, "info" if success else "error", f"Action executed: {name}", success=success, details=details)
 
-    async def _actions_printer_offline(self, ctx: WorkflowContext, state: WorkflowState) -> None:
-        diag = (state.diagnosis or {}).get("printer_offline", {})
-        root = diag.get("root_cause")
-
-        # In a real system, these would be API calls to device mgmt / RPA
-        if root == "spooler_failure":
-            await asyncio.sleep(0.1)
-            await self._record_action(state, "restart_spooler", True, "Spooler restart command issued.")
-        elif root == "network_connectivity_issue":
-            await asyncio.sleep(0.1)
-            await self._record_action(state, "rebind_printer_ip", True, "Rebound printer to correct IP.")
-        elif root == "unknown_offline_state":
-            await asyncio.sleep(0.1)
-            await self._record_action(state, "reset_print_queue", True, "Cleared and reset print queue.")
-        else:
-            await asyncio.sleep(0.1)
-            await self._record_action(
-                state,
-                "noop",
-                True,
-                "No obvious issue detected; recorded observation for monitoring.",
-            )
-
-    async def _actions_ink_error(self, ctx: WorkflowContext, state: WorkflowState) -> None:
-        diag = (state.diagnosis or {}).get("ink_error", {})
-        root = diag.get("root_cause")
-
-        if root == "cartridge_not_authentic":
-            await asyncio.sleep(0.1)
-            await self._record_action(
-                state,
-                "sync_subscription",
-                True,
-                "Synced subscription and revalidated cartridge entitlement.",
-            )
-        elif root == "firmware_incompatibility":
-            await asyncio.sleep(0.1)
-            await self._record_action(
-                state,
-                "refresh_firmware",
-                True,
-                "Queued firmware refresh for printer and cartridges.",
-            )
-        elif root == "empty_cartridge" and state.diagnosis:
-            await asyncio.sleep(0.1)
-            await self._record_action(
-                state,
-                "create_replacement_shipment",
-                True,
-                "Auto-created replacement cartridge shipment for customer.",
-            )
-        else:
-            await asyncio.sleep(0.1)
-            await self._record_action(
-                state,
-                "reset_cartridge_state",
-                True,
-                "Reset cartridge state and requested device to re-enumerate cartridges.",
-            )
+    async def _execute(
+        self,
+        ctx: WorkflowContext,
+        state: WorkflowState,
+        name: str,
+        details: str,
+        call: Optional[Callable[[str], Awaitable[Dict[str, Any]]]],
+    ) -> None:
+        """
+        Run one remediation through its backend and record the outcome. The call gets an
+        idempotency key scoped to this workflow attempt, so backend retries are deduplicated.
+        """
+        started_at = datetime.utcnow()
+        success = True
+        if call is not None:
+            try:
+                await call(f"{ctx.workflow_id}:{name}:{state.attempts}")
+            except IntegrationError as e:
+                success, details = False, f"{details} Backend call failed: {e}"
+        await self._record_action(state, name, success, details, started_at)
+
+    def _backend_call(self, ctx: WorkflowContext, name: str) -> Optional[Callable[[str], Awaitable[Dict[str, Any]]]]:
+        """The backend call carrying out action `name` (None: nothing to call, or no client configured)."""
+        if name == "noop":
+            return None
+        crm_call = self.crm_actions.get(name)
+        if crm_call is not None:
+            return (lambda key: crm_call(ctx, key)) if ctx.crm_client else None
+        client = ctx.device_client
+        return (lambda key: client.run_action(ctx.device.device_id, name, idempotency_key=key)) if client else None
 
 
 class VerificationAgent(BaseAgent):
     """
-    Verifies if self-heal actions resolved the issue using telemetry and simple rules.
+    Verifies if self-heal actions resolved the issue by re-pulling device telemetry.
+
+    Each poll runs the workflow type's probes concurrently through
+    ctx.telemetry_client, each under its own deadline, and only accepts readings
+    taken after verification started. Polls repeat with exponential backoff until
+    the checks pass or the verification budget is spent. A device the client has
+    never seen is verified against the trigger payload snapshot instead.
     """
 
     name = "verification"
     description = "Verifies if self-heal actions resolved the issue using telemetry and validation rules."
+    outcomes = ("passed", "failed")
+
+    def outcome(self, state: WorkflowState) -> str:
+        return "passed" if state.verification and state.verification.success else "failed"
 
     async def run(self, ctx: WorkflowContext, state: WorkflowState) -> WorkflowState:
         self._log(state, "info", "Starting verification phase")
         state.stage = WorkflowStage.verifying
 
-        if ctx.workflow_type == WorkflowType.printer_offline:
-            result = await self._verify_printer_offline(ctx, state)
-        else:
-            result = await self._verify_ink_error(ctx, state)
+        result = await self._verify(ctx, state, ctx.workflow.verification)
 
         state.verification = result
         self._log(state, "info", "Verification completed", success=result.success, checks=result.checks)
         return state
 
-    async def _verify_printer_offline(self, ctx: WorkflowContext, state: WorkflowState) -> VerificationResult:
-        # In reality we'd re-pull telemetry from a device platform
-        t = ctx.telemetry
-        checks = {
-            "device_online": bool(t.online),
-            "heartbeat_recent": t.last_heartbeat_ts is not None,
-            "spooler_healthy": bool(t.spooler_healthy),
-        }
-        success = all(checks.values())
-        details = "All checks passed" if success else "One or more verification checks failed"
-        return VerificationResult(success=success, checks=checks, details=details)
-
-    async def _verify_ink_error(self, ctx: WorkflowContext, state: WorkflowState) -> VerificationResult:
-        t = ctx.telemetry
-        checks = {
-            "no_error_codes": not t.error_codes,
-            "ink_levels_non_zero": all(
-                level is None or level > 0
-                for level in [
-                    t.ink_level_cyan,
-                    t.ink_level_magenta,
-                    t.ink_level_yellow,
-                    t.ink_level_black,
-                ]
-            ),
-        }
+    async def _verify(self, ctx: WorkflowContext, state: WorkflowState, spec: VerificationSpec) -> VerificationResult:
+        client = ctx.telemetry_client
+        if client is None or not hasattr(client, "probe"):
+            return self._verify_snapshot(ctx, state, spec)
+
+        probes = spec.probes
+        since = time.time()
+        deadline = time.monotonic() + VERIFICATION_BUDGET_SECONDS
+        delay = VERIFICATION_POLL_INITIAL_SECONDS
+        checks: Dict[str, bool] = {}
+        poll = 0
+        while True:
+            poll += 1
+            # Each probe gets its own deadline, never past the end of the budget
+            timeout = max(0.0, min(VERIFICATION_PROBE_TIMEOUT_SECONDS, deadline - time.monotonic()))
+            results = await asyncio.gather(
+                *(self._probe(client, ctx.device.device_id, fields, since, timeout) for fields in probes.values())
+            )
+            outcomes = {name: outcome for name, (_, outcome, _) in zip(probes, results)}
+            self._log(
+                state,
+                "info",
+                "Verification probes",
+                poll=poll,
+                outcomes=outcomes,
+                latency_ms={name: latency for name, (_, _, latency) in zip(probes, results)},
+            )
+            if all(outcome == "unknown_device" for outcome in outcomes.values()):
+                return self._verify_snapshot(ctx, state, spec)
+
+            fields: Dict[str, Any] = {}
+            for values, _, _ in results:
+                fields.update(values or {})
+            checks = spec.evaluate(TelemetrySnapshot(**fields).model_dump())
+            # A check only counts once every probe has answered with a fresh reading
+            if all(outcome == "ok" for outcome in outcomes.values()) and all(checks.values()):
+                return VerificationResult(success=True, checks=checks, details=f"{spec.passed} (poll {poll})")
+
+            # Stop when too little budget is left for another poll's probes to answer
+            remaining = deadline - time.monotonic()
+            if remaining < VERIFICATION_POLL_INITIAL_SECONDS:
+                break
+            await asyncio.sleep(min(delay, remaining - VERIFICATION_POLL_INITIAL_SECONDS))
+            delay = min(delay * 2, VERIFICATION_POLL_MAX_SECONDS)
+
+        pending = sorted(name for name, outcome in outcomes.items() if outcome != "ok")
+        details = f"{spec.failed}: checks did not pass within {VERIFICATION_BUDGET_SECONDS:g}s ({poll} polls)"
+        if pending:
+            details += f"; no fresh answer from probes: {', '.join(pending)}"
+        return VerificationResult(success=False, checks=checks, details=details)
+
+    @staticmethod
+    async def _probe(
+        client: Any, device_id: str, fields: Tuple[str, ...], since: float, timeout: float
+    ) -> Tuple[Optional[Dict[str, Any]], str, float]:
+        """(field values or None, outcome, latency ms) of one probe."""
+        started = time.perf_counter()
+        try:
+            values = await asyncio.wait_for(client.probe(device_id, fields, since), timeout)
+            outcome = "ok" if values is not None else "stale"
+        except asyncio.TimeoutError:
+            values, outcome = None, "timeout"
+        except KeyError:
+            values, outcome = None, "unknown_device"
+        except Exception:
+            values, outcome = None, "error"
+        return values, outcome, round((time.perf_counter() - started) * 1000, 2)
+
+    def _verify_snapshot(self, ctx: WorkflowContext, state: WorkflowState, spec: VerificationSpec) -> VerificationResult:
+        self._log(state, "warn", "No live telemetry for device; verifying against the trigger snapshot")
+        checks = spec.evaluate(ctx.telemetry.model_dump())
         success = all(checks.values())
-        details = "Ink system healthy" if success else "Ink error persists or levels invalid"
-        return VerificationResult(success=success, checks=checks, details=details)
+        details = spec.passed if success else spec.failed
+        return VerificationResult(success=success, checks=checks, details=f"{details} (trigger snapshot)")
 
 
 class EscalationDecisionAgent(BaseAgent):
@@ -360,41 +569,71 @@ class EscalationDecisionAgent(BaseAgent):
         attempts = state.attempts
         verification = state.verification
 
-        escalate = False
-        reason = None
-        target_queue = None
-
-        if verification and not verification.success:
-            if ctx.workflow_type == WorkflowType.printer_offline:
-                if attempts >= 2:
-                    escalate = True
-                    reason = "Automated recovery attempts failed for printer_offline."
-                    target_queue = "L2-Networking"
-            elif ctx.workflow_type == WorkflowType.ink_error:
-                diag = (state.diagnosis or {}).get("ink_error", {})
-                root = diag.get("root_cause")
-                if root in {"physical_damage", "undetermined_ink_issue"} or attempts >= 2:
-                    escalate = True
-                    reason = "Ink error unresolved; possible physical damage or repeated failure."
-                    target_queue = "L2-Hardware"
-
-        state.escalation = EscalationInfo(required=escalate, reason=reason, target_queue=target_queue)
-
-        if escalate:
-            state.status = WorkflowStatus.escalated
-            state.stage = WorkflowStage.escalated
-            self._log(
-                state,
-                "warn",
-                "Workflow escalated",
-                reason=reason,
-                target_queue=target_queue,
-            )
-        else:
-            state.status = WorkflowStatus.completed
-            state.stage = WorkflowStage.completed
-            self._log(state, "info", "Workflow completed without escalation")
+        spec = ctx.workflow
+        root = (state.diagnosis or {}).get(spec.name, {}).get("root_cause")
 
+        # Unresolved, and no automated attempt left (or the root cause needs a human anyway)
+        if verification and not verification.success and not spec.can_retry(attempts, root):
+            return await self.escalate(ctx, state, spec.escalation.reason, spec.escalation.queue)
+
+        state.escalation = EscalationInfo(required=False)
+        state.status = WorkflowStatus.completed
+        state.stage = WorkflowStage.completed
+        self._log(state, "info", "Workflow completed without escalation")
+        return state
+
+    async def escalate(
+        self, ctx: WorkflowContext, state: WorkflowState, reason: str, target_queue: str
+    ) -> WorkflowState:
+        """Escalate unconditionally (e.g. when the workflow ran out of time) and hand off to a human."""
+        state.escalation = EscalationInfo(required=True, reason=reason, target_queue=target_queue)
+        state.status = WorkflowStatus.escalated
+        state.stage = WorkflowStage.escalated
+        self._log(
+            state,
+            "warn",
+            "Workflow escalated",
+            reason=reason,
+            target_queue=target_queue,
+        )
+        await self._hand_off(ctx, state)
         return state
 
+    async def _hand_off(self, ctx: WorkflowContext, state: WorkflowState) -> None:
+        """
+        Open a CRM ticket and route the interaction to the target queue. Failed calls
+        are logged; the workflow stays escalated either way.
+        """
+        escalation = state.escalation
+        summary = {
+            "workflow_id": ctx.workflow_id,
+            "workflow_type": ctx.workflow_type.value if ctx.workflow_type else None,
+            "device_id": ctx.device.device_id,
+            "account_id": ctx.entitlement.account_id,
+            "reason": escalation.reason,
+            "actions": [a.name for a in state.actions],
+        }
+        if ctx.crm_client is not None:
+            try:
+                ticket = await ctx.crm_client.create_ticket(
+                    {**summary, "queue": escalation.target_queue},
+                    idempotency_key=f"{ctx.workflow_id}:ticket",
+                )
+                escalation.ticket_id = ticket.get("ticket_id")
+                self._log(state, "info", "Escalation ticket created", ticket_id=escalation.ticket_id)
+            except IntegrationError as e:
+                self._log(state, "error", "Escalation ticket creation failed", error=str(e))
+        # The interaction is routed even without a ticket, so a human picks it up
+        if ctx.cc_platform is not None:
+            try:
+                await ctx.cc_platform.route_to_queue(
+                    ctx.workflow_id,
+                    escalation.target_queue,
+                    {**summary, "ticket_id": escalation.ticket_id},
+                    idempotency_key=f"{ctx.workflow_id}:route",
+                )
+                self._log(state, "info", "Escalation routed", target_queue=escalation.target_queue)
+            except IntegrationError as e:
+                self._log(state, "error", "Escalation routing failed", error=str(e))
+
 
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .models import WorkflowState, WorkflowTriggerRequest
+
+WORKFLOW_CHECKPOINTS = os.getenv("WORKFLOW_CHECKPOINTS", "1").lower() not in ("0", "false", "no")
+WORKFLOW_CHECKPOINT_PATH = Path(
+    os.getenv("WORKFLOW_CHECKPOINT_PATH", str(Path(__file__).parent.parent / "workflow_checkpoints.jsonl"))
+)
+# The log is rewritten with only the unfinished workflows once it grows past this size
+WORKFLOW_CHECKPOINT_MAX_BYTES = int(os.getenv("WORKFLOW_CHECKPOINT_MAX_BYTES", str(64 * 1024 * 1024)))
+# fsync every record (survives power loss, not just a process restart) at the cost of a disk flush per stage
+WORKFLOW_CHECKPOINT_FSYNC = os.getenv("WORKFLOW_CHECKPOINT_FSYNC", "0").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class Checkpoint:
+    """An unfinished workflow as recorded in the log: how it was triggered and how far it got."""
+
+    request: WorkflowTriggerRequest
+    state: WorkflowState
+    # Last completed stage (None if no stage completed) and the stage to run next
+    stage: Optional[str] = None
+    next_stage: Optional[str] = None
+
+
+class CheckpointLog:
+    """
+    Append-only JSONL log of workflow progress, used to resume workflows after a restart.
+
+    Every workflow writes a "start" record with its trigger request and initial state,
+    a "stage" record with the full state after each completed stage (and the stage to
+    run next), and an "end" record once it is finished. Replaying the log yields the unfinished
+    workflows at their last completed stage.
+
+    Records are encoded on the caller (the state keeps changing once the call returns)
+    and appended in order by a single background thread, so the event loop never waits
+    on the file. Each one is flushed to the OS once written and survives a process
+    crash; a torn final line is skipped on replay.
+
+    The start and latest stage record of each unfinished workflow are also kept in
+    memory (by the writer thread), so the log can be compacted to just those once it
+    grows past max_bytes.
+    """
+
+    def __init__(
+        self,
+        path: Path = WORKFLOW_CHECKPOINT_PATH,
+        max_bytes: int = WORKFLOW_CHECKPOINT_MAX_BYTES,
+        fsync: bool = WORKFLOW_CHECKPOINT_FSYNC,
+    ) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self._file = None
+        # workflow_id -> [start line, latest stage line or None]
+        self._live: Dict[str, List[Optional[str]]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-log")
+        self._stats = {"records": 0, "bytes": 0, "compactions": 0, "replayed": 0, "skipped_lines": 0}
+
+    # Writing
+
+    def start(self, req: WorkflowTriggerRequest, state: WorkflowState) -> None:
+        line = self._line(
+            {"type": "start", "workflow_id": state.id},
+            request=req.model_dump_json(),
+            state=state.model_dump_json(warnings=False),
+        )
+        self._submit("start", state.id, line)
+
+    def stage(self, state: WorkflowState, stage: str, next_stage: Optional[str]) -> None:
+        line = self._line(
+            {"type": "stage", "workflow_id": state.id, "stage": stage, "next": next_stage},
+            state=state.model_dump_json(warnings=False),
+        )
+        self._submit("stage", state.id, line)
+
+    def end(self, workflow_id: str) -> None:
+        self._submit("end", workflow_id, self._line({"type": "end", "workflow_id": workflow_id}))
+
+    @staticmethod
+    def _line(header: Dict[str, Any], **payloads: str) -> str:
+        header["ts"] = round(time.time(), 3)
+        line = json.dumps(header, separators=(",", ":"))
+        # Payloads are already JSON; splice them in rather than parse and re-encode them
+        for key, payload in payloads.items():
+            line = f'{line[:-1]},"{key}":{payload}}}'
+        return line + "\n"
+
+    def _submit(self, kind: str, workflow_id: str, line: str) -> None:
+        try:
+            self._executor.submit(self._write, kind, workflow_id, line)
+        except RuntimeError:
+            # Closed: the workflow resumes from its previous record after a restart
+            print(f"⚠️ Checkpoint log closed; dropped {kind} record for workflow {workflow_id}")
+
+    def _write(self, kind: str, workflow_id: str, line: str) -> None:
+        if kind == "start":
+            self._live[workflow_id] = [line, None]
+        elif kind == "stage":
+            live = self._live.get(workflow_id)
+            if live is not None:
+                live[1] = line
+        else:
+            self._live.pop(workflow_id, None)
+        try:
+            self._append(line)
+        except OSError as e:
+            print(f"⚠️ Failed to write {kind} checkpoint for workflow {workflow_id}: {e}")
+
+    def _append(self, line: str) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(line)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._stats["records"] += 1
+        self._stats["bytes"] += len(line)
+        if self.max_bytes and self._file.tell() > self.max_bytes:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the log with only the unfinished workflows' records (atomically, via rename)."""
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for lines in self._live.values():
+                f.writelines(line for line in lines if line is not None)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.replace(tmp, self.path)
+        self._stats["compactions"] += 1
+
+    # Recovery
+
+    async def replay(self) -> List[Checkpoint]:
+        """
+        Unfinished workflows recorded in the log, oldest first. Afterwards the log is
+        compacted to just these, so it does not grow across restarts.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._replay)
+
+    def _replay(self) -> List[Checkpoint]:
+        records: Dict[str, List[Optional[str]]] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        workflow_id = record["workflow_id"]
+                        kind = record["type"]
+                    except (ValueError, KeyError, TypeError):
+                        # Torn write from a crash, or a corrupt line
+                        self._stats["skipped_lines"] += 1
+                        continue
+                    if kind == "start":
+                        records[workflow_id] = [line, None]
+                    elif kind == "stage" and workflow_id in records:
+                        records[workflow_id][1] = line
+                    elif kind == "end":
+                        records.pop(workflow_id, None)
+        except FileNotFoundError:
+            return []
+
+        checkpoints = []
+        for workflow_id, (start, latest) in list(records.items()):
+            try:
+                checkpoints.append(self._checkpoint(start, latest))
+            except ValueError as e:
+                print(f"⚠️ Dropping unreadable checkpoint for workflow {workflow_id}: {e}")
+                records.pop(workflow_id)
+        self._live = records
+        self._stats["replayed"] += len(checkpoints)
+        self._compact()
+        return checkpoints
+
+    @staticmethod
+    def _checkpoint(start: str, latest: Optional[str]) -> Checkpoint:
+        record = json.loads(start)
+        request = WorkflowTriggerRequest.model_validate(record["request"])
+        if latest is None:
+            # Triggered but no stage completed: runs again from the beginning
+            return Checkpoint(request, WorkflowState.model_validate(record["state"]))
+        record = json.loads(latest)
+        return Checkpoint(request, WorkflowState.model_validate(record["state"]), record["stage"], record["next"])
+
+    def close(self) -> None:
+        """Write the queued records and close the file."""
+        self._executor.shutdown(wait=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": str(self.path), "unfinished": len(self._live), **self._stats}
+
+
+# Global instance
+checkpoint_log = CheckpointLog() if WORKFLOW_CHECKPOINTS else None
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from .models import TelemetrySnapshot
+
+# What each remediation action repairs on a simulated device
+ACTION_EFFECTS: Dict[str, Dict[str, Any]] = {
+    "restart_spooler": {"spooler_healthy": True, "online": True},
+    "rebind_printer_ip": {"network_reachable": True, "online": True},
+    "reset_print_queue": {"online": True},
+    "sync_subscription": {"error_codes": []},
+    "refresh_firmware": {"error_codes": []},
+    "reset_cartridge_state": {"error_codes": []},
+}
+
+
+class DeviceSimulator:
+    """
+    Stub device fleet standing in for a telemetry client in tests and local runs.
+
+    Devices are added with their current telemetry. Probes answer after a random
+    latency, and can be made to fail or hang to exercise timeouts. Remediation
+    actions (see ACTION_EFFECTS) take effect on the device after effect_delay
+    seconds; a device in `broken` ignores them, so verification keeps failing.
+    """
+
+    def __init__(
+        self,
+        latency: Tuple[float, float] = (0.005, 0.03),
+        effect_delay: float = 0.3,
+        failure_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency = latency
+        self.effect_delay = effect_delay
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.broken: Set[str] = set()
+        self._rng = random.Random(seed)
+        self._devices: Dict[str, Dict[str, Any]] = {}
+        # device_id -> [(due monotonic time, field changes)]
+        self._pending: Dict[str, List[Tuple[float, Dict[str, Any]]]] = {}
+        self.probes = 0
+        self.actions: List[Tuple[str, str]] = []
+
+    def add_device(self, device_id: str, telemetry: TelemetrySnapshot) -> None:
+        self._devices[device_id] = telemetry.model_dump()
+
+    def apply_action(self, device_id: str, action: str) -> None:
+        self.actions.append((device_id, action))
+        effect = ACTION_EFFECTS.get(action)
+        if effect and device_id in self._devices and device_id not in self.broken:
+            self._pending.setdefault(device_id, []).append((time.monotonic() + self.effect_delay, effect))
+
+    def _current(self, device_id: str) -> Dict[str, Any]:
+        fields = self._devices[device_id]
+        pending = self._pending.get(device_id)
+        if pending:
+            now = time.monotonic()
+            for due, effect in [p for p in pending if p[0] <= now]:
+                fields.update(effect)
+            self._pending[device_id] = [p for p in pending if p[0] > now]
+        if fields.get("online"):
+            fields["last_heartbeat_ts"] = datetime.utcnow()
+        return fields
+
+    def latest(self, device_id: str, max_age_seconds: Optional[float] = None) -> Optional[TelemetrySnapshot]:
+        if device_id not in self._devices:
+            return None
+        return TelemetrySnapshot(**self._current(device_id))
+
+    async def probe(self, device_id: str, fields: Sequence[str], since: float) -> Optional[Dict[str, Any]]:
+        """Read `fields` from the device itself; every answer is fresh."""
+        self.probes += 1
+        if device_id not in self._devices:
+            raise KeyError(device_id)
+        await asyncio.sleep(self._rng.uniform(*self.latency))
+        roll = self._rng.random()
+        if roll < self.hang_rate:
+            await asyncio.sleep(3600)
+        if roll < self.hang_rate + self.failure_rate:
+            raise ConnectionError(f"Simulated probe failure for {device_id}")
+        current = self._current(device_id)
+        return {name: current.get(name) for name in fields}
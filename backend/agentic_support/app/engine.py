@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 import asyncio
+import os
+import time
 import uuid
-from datetime import datetime
-from typing import Dict
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Set, Tuple, Union
 
+from ..integrations.backends import IntegrationClients, integration_clients
 from .agents import (
     ActionExecutionAgent,
+    BaseAgent,
     DiagnosticAgent,
     EscalationDecisionAgent,
     IntentDetectionAgent,
@@ -14,12 +18,34 @@ from .agents import (
     WorkflowContext,
 )
 from .models import (
+    Channel,
     WorkflowState,
     WorkflowStatus,
     WorkflowStage,
     WorkflowType,
     WorkflowTriggerRequest,
 )
+from .checkpoints import Checkpoint, CheckpointLog, checkpoint_log
+from .events import EVENT_POLL_SECONDS, HEARTBEAT_SECONDS, WorkflowEventBus, encode_event, event_bus
+from .intent_cache import intent_cache
+from .intent_rules import IntentMatch
+from .scheduler import SchedulerSaturated, WorkflowScheduler
+from .state_store import TERMINAL_STATUSES, SharedSQLiteStateStore, StateStore, create_state_store
+from .telemetry import TelemetryHub, telemetry_hub
+from .work_queue import WORKFLOW_SHARED_QUEUE, WorkQueue
+from .workflow_spec import Stage, WorkflowSpec, workflow_specs
+
+# Workflows are scheduled earliest-deadline-first on created_at + SLA * weight: premium
+# tiers, and callers waiting on an IVR line, get less slack than their SLA alone allows
+TIER_WEIGHTS = {"platinum": 0.5, "gold": 0.75, "silver": 1.0, "bronze": 1.25}
+CHANNEL_WEIGHTS = {Channel.voice: 0.25, Channel.chat: 1.0}
+
+# Hard limit on a workflow run; on expiry the running agent is cancelled and the case escalated
+WORKFLOW_TIMEOUT_SECONDS = float(os.getenv("WORKFLOW_TIMEOUT_SECONDS", "120"))
+# Escalation queue for workflows that time out before their type is known
+WORKFLOW_TIMEOUT_QUEUE = os.getenv("WORKFLOW_TIMEOUT_QUEUE", "L1-Support")
+
+STATE_LOCK_STRIPES = int(os.getenv("WORKFLOW_STATE_LOCK_STRIPES", "64"))
 
 
 class WorkflowEngine:
@@ -31,157 +57,665 @@ class WorkflowEngine:
     explicitly to keep it easy to follow and test.
     """
 
-    def __init__(self) -> None:
-        self._runs: Dict[str, WorkflowState] = {}
-        self._lock = asyncio.Lock()
+    def __init__(
+        self,
+        store: Optional[StateStore] = None,
+        scheduler: Optional[WorkflowScheduler] = None,
+        events: Optional[WorkflowEventBus] = None,
+        telemetry: Optional[TelemetryHub] = None,
+        telemetry_client: Optional[Any] = None,
+        integrations: Optional[IntegrationClients] = None,
+        workflows: Optional[Dict[str, WorkflowSpec]] = None,
+        checkpoints: Optional[CheckpointLog] = None,
+        timeout_seconds: Optional[float] = None,
+        work_queue: Optional[WorkQueue] = None,
+    ) -> None:
+        # Backing store for workflow state (in-memory or SQLite, see state_store.py)
+        self.store = store or create_state_store()
+        # Bounded worker pool that runs the orchestration (see scheduler.py)
+        self.scheduler = scheduler or WorkflowScheduler()
+        # Writers are serialized per workflow through a lock stripe chosen by id hash;
+        # readers never lock because the store only holds published snapshots.
+        self._write_locks = [asyncio.Lock() for _ in range(STATE_LOCK_STRIPES)]
+        # Stage transitions are pushed to watchers (see events.py); per running
+        # workflow we track the last event seq and how many logs it covered
+        self.events = events or event_bus
+        self._event_cursors: Dict[str, Tuple[int, int]] = {}
+        # Live device telemetry read by the diagnostic and verification agents (see telemetry.py)
+        self.telemetry = telemetry or telemetry_hub
+        # What agents read and probe device telemetry through; the hub unless overridden
+        # (e.g. a device_simulator.DeviceSimulator in tests)
+        self.telemetry_client = telemetry_client or self.telemetry
+        # Device management, CRM and CCaaS clients on one pooled connection (see integrations/)
+        self.integrations = integrations or integration_clients
+
+        # Workflow definitions by type, compiled from workflows.json (see workflow_spec.py)
+        self.workflows = workflows or workflow_specs
+        # Shared job queue when workflows run in engine worker processes (see work_queue.py);
+        # None when this process runs the workflows it admits
+        self.work_queue = work_queue
+        # Stage-level progress log for resuming after a restart (None when disabled, see
+        # checkpoints.py); the shared queue keeps that progress itself
+        self.checkpoints = work_queue or checkpoints or checkpoint_log
+
+        self.timeout_seconds = timeout_seconds or WORKFLOW_TIMEOUT_SECONDS
+        # Timeout scopes of the running workflows by id; cancel() expires them early
+        self._running: Dict[str, asyncio.Timeout] = {}
+        # Workflows that have started running, until their final state is persisted
+        # (the event is set then); past their timeout scope they can no longer be cancelled
+        self._in_flight: Dict[str, asyncio.Event] = {}
+        # Workflows cancelled but not yet wound down: (reason, event set once the final
+        # state is persisted) while running, (reason, None) while still queued
+        self._cancelled: Dict[str, Tuple[str, Optional[asyncio.Event]]] = {}
+        self._sla = {"met": 0, "missed": 0, "timed_out": 0, "cancelled": 0}
+        self._sla_by_tier: Dict[str, Dict[str, int]] = {}
+        # Queue mode: workflows this process claimed from the shared queue and has not finished
+        self._claimed: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
 
         # Reusable agent instances
         self.intent_agent = IntentDetectionAgent()
-        self.diagnostic_agent = DiagnosticAgent()
+        self.diagnostic_agent = DiagnosticAgent(self.workflows)
         self.action_agent = ActionExecutionAgent()
         self.verification_agent = VerificationAgent()
         self.escalation_agent = EscalationDecisionAgent()
+        # Stage agents by the name workflow specs refer to them with
+        self.agents: Dict[str, BaseAgent] = {
+            agent.name: agent
+            for agent in (self.diagnostic_agent, self.action_agent, self.verification_agent, self.escalation_agent)
+        }
+        self._check_workflows()
+
+    def _check_workflows(self) -> None:
+        """Every agent stage names a known agent and has a transition for each of its outcomes."""
+        for spec in self.workflows.values():
+            for stage in spec.stages.values():
+                if stage.agent is None:
+                    continue
+                agent = self.agents.get(stage.agent)
+                if agent is None:
+                    raise ValueError(f"Workflow {spec.name!r} stage {stage.name!r} uses unknown agent {stage.agent!r}")
+                missing = sorted(set(agent.outcomes) - set(stage.transitions))
+                if missing:
+                    raise ValueError(
+                        f"Workflow {spec.name!r} stage {stage.name!r} has no transition for: {', '.join(missing)}"
+                    )
 
     async def trigger(self, req: WorkflowTriggerRequest) -> WorkflowState:
         """
-        Create a new workflow instance and start orchestration in the background.
+        Create a new workflow instance and queue its orchestration.
+
+        Only admission happens here: when workflow_type is omitted (and the intent
+        cache has no answer), intent detection runs as the first stage of the workflow.
+        Raises SchedulerSaturated when the run queue is full; nothing is stored in that case.
+        """
+        state = self._enqueue(req, req.workflow_type or self._cached_intent(req))
+        if self.work_queue is None:
+            await self._persist(state)
+            return state
+
+        state.updated_at = datetime.utcnow()
+        snapshot = self._snapshot(state)
+        if not await self.work_queue.put_many([(req, snapshot, self._priority(req, snapshot))]):
+            raise self.work_queue.saturated()
+        return snapshot
+
+    async def trigger_many(
+        self, reqs: List[WorkflowTriggerRequest]
+    ) -> List[Union[WorkflowState, SchedulerSaturated]]:
+        """
+        Create and queue several workflows.
+
+        Intents missing from the requests are classified in one batched pass and all
+        accepted workflows are written to the store together. Returns, per request,
+        either the new state or the SchedulerSaturated error that rejected it.
+        """
+        untyped = [i for i, req in enumerate(reqs) if req.workflow_type is None]
+        inferred = self.intent_agent.classify_batch([reqs[i].interaction.text for i in untyped])
+        workflow_types = [req.workflow_type for req in reqs]
+        for i, workflow_type in zip(untyped, inferred):
+            workflow_types[i] = workflow_type
+
+        results: List[Union[WorkflowState, SchedulerSaturated]] = []
+        for req, workflow_type in zip(reqs, workflow_types):
+            try:
+                results.append(self._enqueue(req, workflow_type))
+            except SchedulerSaturated as e:
+                results.append(e)
+
+        now = datetime.utcnow()
+        admitted = [i for i, state in enumerate(results) if isinstance(state, WorkflowState)]
+        snapshots = []
+        for i in admitted:
+            results[i].updated_at = now
+            snapshots.append(self._snapshot(results[i]))
+
+        if self.work_queue is not None:
+            jobs = [(reqs[i], snapshot, self._priority(reqs[i], snapshot)) for i, snapshot in zip(admitted, snapshots)]
+            accepted = await self.work_queue.put_many(jobs)
+            # The rest were turned away because the shared queue is full
+            for i in admitted[accepted:]:
+                results[i] = self.work_queue.saturated()
+            return results
+
+        # New workflows have no other writer yet, so no lock stripe is needed
+        await self.store.put_many(snapshots)
+        for snapshot in snapshots:
+            self._publish(snapshot)
+        return results
+
+    def _enqueue(
+        self, req: WorkflowTriggerRequest, intent: Union[WorkflowType, IntentMatch, None]
+    ) -> WorkflowState:
+        """
+        Build the initial state and submit its orchestration to the scheduler (in queue
+        mode the caller puts it on the shared queue instead).
         """
-        workflow_type = req.workflow_type or await self._infer_workflow_type(req)
         workflow_id = str(uuid.uuid4())
 
+        if isinstance(intent, IntentMatch):
+            workflow_type = self.intent_agent._workflow_type(intent.intent)
+            diagnosis = {
+                "intent": workflow_type.value,
+                "intent_confidence": intent.confidence,
+                "intent_source": "cache",
+            }
+        else:
+            workflow_type = intent
+            diagnosis = {"intent": workflow_type.value} if workflow_type else None
+
+        created_at = datetime.utcnow()
         state = WorkflowState(
             id=workflow_id,
             workflow_type=workflow_type,
             status=WorkflowStatus.pending,
             stage=WorkflowStage.triggered,
-            diagnosis={"intent": workflow_type.value},
+            diagnosis=diagnosis,
+            sla_deadline=created_at + timedelta(minutes=req.entitlement.sla_minutes),
+            created_at=created_at,
         )
+        if self.work_queue is not None:
+            return state
+        ctx = self._context(req, state)
 
-        async with self._lock:
-            self._runs[workflow_id] = state
-
-        ctx = WorkflowContext(
-            workflow_id=workflow_id,
-            workflow_type=workflow_type,
-            interaction=req.interaction,
-            device=req.device,
-            telemetry=req.telemetry,
-            entitlement=req.entitlement,
+        # Orchestration runs on the scheduler's worker pool
+        self.scheduler.submit(
+            lambda: self._run_workflow(ctx, state),
+            priority=self._priority(req, state),
+            queue=workflow_type.value if workflow_type else "unclassified",
         )
-
-        # Fire-and-forget orchestration in the background
-        asyncio.create_task(self._run_workflow(ctx, state))
+        if self.checkpoints:
+            self.checkpoints.start(req, state)
         return state
 
-    async def _infer_workflow_type(self, req: WorkflowTriggerRequest) -> WorkflowType:
-        # Simple reuse of the IntentDetectionAgent
-        tmp_state = WorkflowState(
-            id=str(uuid.uuid4()),
-            workflow_type=WorkflowType.printer_offline,  # placeholder; will be overwritten
-        )
-        ctx = WorkflowContext(
-            workflow_id=tmp_state.id,
-            workflow_type=tmp_state.workflow_type,
+    def _context(self, req: WorkflowTriggerRequest, state: WorkflowState) -> WorkflowContext:
+        self.telemetry.register_device(req.device)
+        return WorkflowContext(
+            workflow_id=state.id,
+            workflow_type=state.workflow_type,
             interaction=req.interaction,
             device=req.device,
             telemetry=req.telemetry,
             entitlement=req.entitlement,
+            cc_platform=self.integrations.ccaas,
+            crm_client=self.integrations.crm,
+            device_client=self.integrations.device,
+            telemetry_client=self.telemetry_client,
         )
-        result = await self.intent_agent._run_with_metrics(ctx, tmp_state)
-        intent_value = (result.diagnosis or {}).get("intent", WorkflowType.printer_offline.value)
+
+    @staticmethod
+    def _priority(req: WorkflowTriggerRequest, state: WorkflowState) -> float:
+        """Scheduling key (lower runs first): the SLA deadline with its slack scaled by tier and channel."""
+        slack = (state.sla_deadline - state.created_at).total_seconds() if state.sla_deadline else 0.0
+        weight = TIER_WEIGHTS.get(req.entitlement.tier.lower(), 1.0) * CHANNEL_WEIGHTS.get(req.interaction.channel, 1.0)
+        return state.created_at.timestamp() + slack * weight
+
+    @staticmethod
+    def _cached_intent(req: WorkflowTriggerRequest) -> Optional[IntentMatch]:
+        # Repeated openers are answered from the cache without running (and recording) the agent
+        return intent_cache.get(req.interaction.text)
+
+    async def _run_workflow(
+        self, ctx: WorkflowContext, state: WorkflowState, resume: Optional[Checkpoint] = None
+    ) -> None:
+        """
+        Run a workflow to its final state under a hard time limit (timeout_seconds).
+
+        When the limit expires the running agent is cancelled at its next await and the
+        case is escalated. cancel() ends the same scope early and marks the workflow
+        cancelled instead. Either way the final state is persisted, counted against the
+        SLA, and closed in the checkpoint log.
+        """
+        if state.id in self._cancelled:
+            # Cancelled while queued; cancel() already recorded the final state
+            del self._cancelled[state.id]
+            self._claimed.discard(state.id)
+            return
+
+        finished = self._in_flight[state.id] = asyncio.Event()
         try:
-            return WorkflowType(intent_value)
-        except ValueError:
-            return WorkflowType.printer_offline
+            await self._finish_workflow(ctx, state, resume)
+        finally:
+            del self._in_flight[state.id]
+            finished.set()
 
-    async def _run_workflow(self, ctx: WorkflowContext, state: WorkflowState) -> None:
+    async def _finish_workflow(
+        self, ctx: WorkflowContext, state: WorkflowState, resume: Optional[Checkpoint] = None
+    ) -> None:
+        try:
+            async with asyncio.timeout(self.timeout_seconds) as scope:
+                self._running[state.id] = scope
+                try:
+                    state = await self._run_stages(ctx, state, resume)
+                finally:
+                    # From here on the workflow can no longer be cancelled
+                    del self._running[state.id]
+            state = self._generate_summary(state)
+        except TimeoutError as exc:
+            if state.id in self._cancelled:
+                self._mark_cancelled(state, self._cancelled[state.id][0])
+            elif scope.expired():
+                await self._escalate_overrun(ctx, state)
+                state = self._generate_summary(state)
+            else:
+                self._mark_failed(state, exc)
+        except Exception as exc:  # pragma: no cover - defensive
+            self._mark_failed(state, exc)
+
+        self._record_sla(state, ctx.entitlement.tier)
+        await self._persist(state)
+        if self.checkpoints:
+            self.checkpoints.end(state.id)
+        self._claimed.discard(state.id)
+        _, done = self._cancelled.pop(state.id, (None, None))
+        if done is not None:
+            done.set()
+
+    async def _run_stages(
+        self, ctx: WorkflowContext, state: WorkflowState, resume: Optional[Checkpoint] = None
+    ) -> WorkflowState:
         """
         Execute the state machine:
-          - Diagnosis
-          - Action
-          - Verification
-          - (optional) second attempt
-          - Escalation decision
+          - Intent detection (when the workflow type was not supplied or cached)
+          - The stages of the workflow type's spec, from its start stage, following
+            each agent's outcome through the stage's transition table
+        With the default specs that is diagnosis -> action -> verification -> (retry while
+        attempts remain) -> escalation decision.
+
+        Every completed stage is checkpointed; a workflow resumed from a checkpoint
+        continues with the stage after its last completed one.
         """
-        try:
+        if resume is not None and resume.stage is not None:
+            spec = self._workflow_spec(ctx)
+            name = resume.next_stage
+        else:
+            # 0) Intent detection (with metrics tracking, under this workflow's trace)
+            detected = state.workflow_type is None
+            if detected:
+                state = await self.intent_agent._run_with_metrics(ctx, state)
+            spec = self._workflow_spec(ctx)
+
             state.status = WorkflowStatus.running
             state.stage = WorkflowStage.diagnosing
             state.attempts = 1
+            name = spec.start
+            if detected:
+                self._checkpoint(state, self.intent_agent.name, name)
+                await self._persist(state)
 
-            # 1) Diagnostic (with metrics tracking)
-            state = await self.diagnostic_agent._run_with_metrics(ctx, state)
-            await self._persist(state)
+        while name is not None:
+            stage = spec.stages[name]
+            if stage.agent is None:
+                name = self._retry(spec, stage, state)
+                continue
+            # Each stage runs with metrics tracking
+            agent = self.agents[stage.agent]
+            state = await agent._run_with_metrics(ctx, state)
+            name = stage.transitions[agent.outcome(state)]
+            self._checkpoint(state, stage.name, name)
+            if name is not None:
+                await self._persist(state)
+        return state
 
-            # 2) Action (with metrics tracking)
-            state = await self.action_agent._run_with_metrics(ctx, state)
-            await self._persist(state)
+    async def _escalate_overrun(self, ctx: WorkflowContext, state: WorkflowState) -> None:
+        """Hand a workflow that ran out of time to a human, on its workflow's queue if known."""
+        self._sla["timed_out"] += 1
+        reason = f"Workflow exceeded its {self.timeout_seconds:g}s time limit while {state.stage.value}"
+        queue = ctx.workflow.escalation.queue if ctx.workflow else WORKFLOW_TIMEOUT_QUEUE
+        await self.escalation_agent.escalate(ctx, state, reason, queue)
 
-            # 3) Verification (with metrics tracking)
-            state = await self.verification_agent._run_with_metrics(ctx, state)
-            await self._persist(state)
+    @staticmethod
+    def _mark_cancelled(state: WorkflowState, reason: str) -> None:
+        state.logs.append(
+            {
+                "timestamp": datetime.utcnow(),
+                "level": "warn",
+                "message": "Workflow cancelled",
+                "data": {"reason": reason, "stage": state.stage.value},
+            }
+        )
+        state.status = WorkflowStatus.cancelled
+        state.stage = WorkflowStage.cancelled
 
-            # 4) Optional second attempt if verification failed and rules allow
-            if state.verification and not state.verification.success:
-                state.attempts += 1
-                # For printer_offline we allow up to 2 attempts before escalation
-                if ctx.workflow_type == WorkflowType.printer_offline and state.attempts <= 2:
-                    state.stage = WorkflowStage.diagnosing
-                    state.logs.append(
-                        {
-                            "timestamp": datetime.utcnow(),
-                            "level": "info",
-                            "message": "Verification failed; retrying automated remediation.",
-                            "data": {"attempt": state.attempts},
-                        }
-                    )
-                    # Re-run diagnostics and actions with updated attempt count (with metrics)
-                    state = await self.diagnostic_agent._run_with_metrics(ctx, state)
-                    await self._persist(state)
-                    state = await self.action_agent._run_with_metrics(ctx, state)
-                    await self._persist(state)
-                    state = await self.verification_agent._run_with_metrics(ctx, state)
-                    await self._persist(state)
-
-            # 5) Escalation / Closure (with metrics tracking)
-            state = await self.escalation_agent._run_with_metrics(ctx, state)
-            # Generate summary & resolution text
-            state = self._generate_summary(state)
-            await self._persist(state)
+    @staticmethod
+    def _mark_failed(state: WorkflowState, exc: Exception) -> None:
+        state.status = WorkflowStatus.failed
+        state.stage = WorkflowStage.failed
+        state.logs.append(
+            {
+                "timestamp": datetime.utcnow(),
+                "level": "error",
+                "message": "Workflow execution failed",
+                "data": {"error": str(exc)},
+            }
+        )
 
-        except Exception as exc:  # pragma: no cover - defensive
-            state.status = WorkflowStatus.failed
-            state.stage = WorkflowStage.failed
+    def _record_sla(self, state: WorkflowState, tier: Optional[str] = None) -> None:
+        """Count a finished workflow as meeting or missing its SLA deadline (cancelled ones are not judged)."""
+        if state.status == WorkflowStatus.cancelled:
+            self._sla["cancelled"] += 1
+            return
+        if state.sla_deadline is None:
+            return
+        by_tier = self._sla_by_tier.setdefault(tier, {"met": 0, "missed": 0})
+        overdue = (datetime.utcnow() - state.sla_deadline).total_seconds()
+        if overdue <= 0:
+            self._sla["met"] += 1
+            by_tier["met"] += 1
+            return
+        self._sla["missed"] += 1
+        by_tier["missed"] += 1
+        state.logs.append(
+            {
+                "timestamp": datetime.utcnow(),
+                "level": "warn",
+                "message": "SLA deadline missed",
+                "data": {"sla_deadline": state.sla_deadline.isoformat(), "overdue_seconds": round(overdue, 3)},
+            }
+        )
+
+    async def cancel(self, workflow_id: str, reason: str = "Cancelled by request") -> Optional[WorkflowState]:
+        """
+        Cancel a pending or running workflow and return its final state (None if unknown;
+        finished workflows are returned unchanged).
+
+        A running workflow's current agent is cancelled at its next await and no further
+        stage runs; backend actions that already completed are not rolled back.
+        """
+        state = await self.store.get(workflow_id)
+        if state is None or state.status in TERMINAL_STATUSES:
+            return state
+        if self.work_queue is not None and workflow_id not in self._claimed:
+            return await self._cancel_shared(state, reason)
+
+        scope = self._running.get(workflow_id)
+        if scope is not None:
+            _, done = self._cancelled.get(workflow_id, (None, None))
+            if done is None:
+                done = asyncio.Event()
+                self._cancelled[workflow_id] = (reason, done)
+                scope.reschedule(asyncio.get_running_loop().time())
+            await done.wait()
+            return await self.store.get(workflow_id)
+
+        finished = self._in_flight.get(workflow_id)
+        if finished is not None:
+            # Its stages are over and it is being wound down (e.g. escalated after a
+            # timeout); too late to cancel, so report the final state
+            await finished.wait()
+            return await self.store.get(workflow_id)
+
+        # Still queued: record the final state now and skip the job when a worker picks it up
+        self._cancelled[workflow_id] = (reason, None)
+        state = await self._cancel_queued(state, reason)
+        if self.checkpoints:
+            self.checkpoints.end(workflow_id)
+        return state
+
+    async def _cancel_queued(self, state: WorkflowState, reason: str) -> WorkflowState:
+        state = self._snapshot(state)
+        self._mark_cancelled(state, reason)
+        self._record_sla(state)
+        await self._persist(state)
+        return state
+
+    async def _cancel_shared(self, state: WorkflowState, reason: str) -> WorkflowState:
+        """Queue mode: cancel a workflow that is queued or held by another process."""
+        where = await self.work_queue.cancel(state.id, reason)
+        if where == "queued":
+            return await self._cancel_queued(state, reason)
+        if where == "leased":
+            # The process holding the job cancels it at its next poll; wait for the result
+            deadline = time.monotonic() + self.work_queue.lease_seconds
+            while state.status not in TERMINAL_STATUSES and time.monotonic() < deadline:
+                await asyncio.sleep(self.work_queue.poll_seconds)
+                state = await self.store.get(state.id) or state
+        return state
+
+    def sla_stats(self) -> Dict[str, Any]:
+        judged = self._sla["met"] + self._sla["missed"]
+        return {
+            "timeout_seconds": self.timeout_seconds,
+            "running": len(self._running),
+            **self._sla,
+            "miss_rate": round(self._sla["missed"] / judged, 4) if judged else 0.0,
+            "by_tier": {
+                tier: {**counts, "miss_rate": round(counts["missed"] / (counts["met"] + counts["missed"]), 4)}
+                for tier, counts in self._sla_by_tier.items()
+            },
+        }
+
+    def _workflow_spec(self, ctx: WorkflowContext) -> WorkflowSpec:
+        spec = self.workflows.get(ctx.workflow_type)
+        if spec is None:
+            raise ValueError(f"No workflow definition for {ctx.workflow_type.value!r}")
+        ctx.workflow = spec
+        return spec
+
+    def _checkpoint(self, state: WorkflowState, stage: str, next_stage: Optional[str]) -> None:
+        if self.checkpoints:
+            self.checkpoints.stage(state, stage, next_stage)
+
+    @staticmethod
+    def _retry(spec: WorkflowSpec, stage: Stage, state: WorkflowState) -> Optional[str]:
+        """A retry stage: go back for another automated attempt if the spec allows one."""
+        root = (state.diagnosis or {}).get(spec.name, {}).get("root_cause")
+        if not spec.can_retry(state.attempts, root):
+            return stage.otherwise
+        state.attempts += 1
+        state.stage = WorkflowStage.diagnosing
+        state.logs.append(
+            {
+                "timestamp": datetime.utcnow(),
+                "level": "info",
+                "message": "Verification failed; retrying automated remediation.",
+                "data": {"attempt": state.attempts},
+            }
+        )
+        return stage.retry
+
+    async def get_state(self, workflow_id: str) -> Optional[WorkflowState]:
+        """
+        Latest published snapshot of a workflow. Lock-free: snapshots are never
+        mutated after _persist hands them to the store.
+        """
+        return await self.store.get(workflow_id)
+
+    async def _persist(self, state: WorkflowState) -> None:
+        """
+        Publish a snapshot of the live state to the configured store.
+        """
+        state.updated_at = datetime.utcnow()
+        snapshot = self._snapshot(state)
+        async with self._write_locks[hash(state.id) % len(self._write_locks)]:
+            await self.store.put(snapshot)
+        self._publish(snapshot)
+
+    def _publish(self, snapshot: WorkflowState) -> None:
+        """Push stage, status and the logs added since the previous transition to watchers."""
+        seq, logged = self._event_cursors.get(snapshot.id, (0, 0))
+        seq += 1
+        terminal = snapshot.status in TERMINAL_STATUSES
+        if terminal:
+            self._event_cursors.pop(snapshot.id, None)
+        else:
+            self._event_cursors[snapshot.id] = (seq, len(snapshot.logs))
+
+        if not self.events.has_subscribers(snapshot.id):
+            return
+        self.events.publish(snapshot.id, seq, self._delta(snapshot, logged), terminal=terminal)
+
+    @staticmethod
+    def _delta(snapshot: WorkflowState, logged: int) -> Dict[str, Any]:
+        return {
+            "workflow_id": snapshot.id,
+            "workflow_type": snapshot.workflow_type,
+            "stage": snapshot.stage,
+            "status": snapshot.status,
+            "attempts": snapshot.attempts,
+            "updated_at": snapshot.updated_at,
+            "log_offset": logged,
+            "logs": snapshot.logs[logged:],
+        }
+
+    async def poll_events(self, state: WorkflowState) -> AsyncIterator[bytes]:
+        """
+        Queue mode: the workflow runs in an engine worker process, so watchers follow it
+        by polling the shared store, with each change sent as the same `delta` event
+        the in-process bus publishes. Ends when the workflow finishes.
+        """
+        seq, idle = 0, 0.0
+        while state.status not in TERMINAL_STATUSES:
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+            latest = await self.store.get(state.id)
+            if latest is None or latest.updated_at == state.updated_at:
+                idle += EVENT_POLL_SECONDS
+                if idle >= HEARTBEAT_SECONDS:
+                    idle = 0.0
+                    yield b": keep-alive\n\n"
+                continue
+            seq, idle = seq + 1, 0.0
+            yield encode_event("delta", self._delta(latest, len(state.logs)), seq)
+            state = latest
+
+    def event_seq(self, workflow_id: str) -> int:
+        """Seq of the last transition published for a running workflow (0 if none)."""
+        return self._event_cursors.get(workflow_id, (0, 0))[0]
+
+    @staticmethod
+    def _snapshot(state: WorkflowState) -> WorkflowState:
+        """
+        Copy-on-write snapshot of a running workflow.
+
+        Agents only append to logs/actions and replace every other field wholesale
+        (diagnosis is rebuilt with `|`), so copying those two lists is enough to
+        keep the snapshot stable while the workflow continues.
+        """
+        return state.model_copy(update={"logs": list(state.logs), "actions": list(state.actions)})
+
+    async def restore(self) -> List[WorkflowState]:
+        """
+        Reload workflows that were still pending or running when the process stopped,
+        so their status stays queryable after a restart, and resume the ones found in
+        the checkpoint log from their last completed stage.
+
+        Stages that completed are not run again. A stage that was cut off part-way runs
+        again; its backend calls reuse the same idempotency keys, so the backends do not
+        apply an action twice.
+
+        In queue mode nothing is restored here: the jobs of a stopped worker go back to
+        the shared queue and resume wherever they are claimed next.
+        """
+        if self.work_queue is not None:
+            return []
+        restored = {state.id: state for state in await self.store.load_active()}
+        if not self.checkpoints:
+            return list(restored.values())
+
+        for checkpoint in await self.checkpoints.replay():
+            state = checkpoint.state
             state.logs.append(
                 {
                     "timestamp": datetime.utcnow(),
-                    "level": "error",
-                    "message": "Workflow execution failed",
-                    "data": {"error": str(exc)},
+                    "level": "warn",
+                    "message": "Resuming workflow after restart",
+                    "data": {"last_completed_stage": checkpoint.stage, "next_stage": checkpoint.next_stage},
                 }
             )
             await self._persist(state)
+            await self._resume(checkpoint)
+            restored[state.id] = state
+        return list(restored.values())
 
-    async def get_state(self, workflow_id: str) -> Optional[WorkflowState]:
-        async with self._lock:
-            return self._runs.get(workflow_id)
+    async def _resume(self, checkpoint: Checkpoint) -> None:
+        """Queue a checkpointed workflow to continue after its last completed stage (or from the start)."""
+        state = checkpoint.state
+        ctx = self._context(checkpoint.request, state)
+        await self.scheduler.submit_wait(
+            lambda: self._run_workflow(ctx, state, checkpoint),
+            priority=self._priority(checkpoint.request, state),
+            queue=state.workflow_type.value if state.workflow_type else "unclassified",
+        )
 
-    async def _persist(self, state: WorkflowState) -> None:
+    async def serve_queue(self, owner: str) -> None:
         """
-        In a real system, this would write to a durable store.
-        For demo purposes we keep everything in memory.
+        Queue mode, in an engine worker process: claim jobs from the shared queue while
+        this process's scheduler has idle workers, keep their leases renewed, and act on
+        cancellation requests made through other processes. Runs until cancelled.
         """
-        async with self._lock:
-            self._runs[state.id] = state
+        queue = self.work_queue
+        renew_at = time.monotonic() + queue.lease_seconds / 3
+        while True:
+            jobs = await queue.claim(owner, self.scheduler.capacity())
+            for job in jobs:
+                checkpoint = job.checkpoint
+                self._claimed.add(checkpoint.state.id)
+                if job.reclaimed:
+                    checkpoint.state.logs.append(
+                        {
+                            "timestamp": datetime.utcnow(),
+                            "level": "warn",
+                            "message": "Resuming workflow after its previous worker stopped",
+                            "data": {"last_completed_stage": checkpoint.stage, "next_stage": checkpoint.next_stage},
+                        }
+                    )
+                    await self._persist(checkpoint.state)
+                await self._resume(checkpoint)
+
+            for workflow_id, reason in await queue.cancel_requests(owner):
+                if workflow_id in self._claimed and workflow_id not in self._cancelled:
+                    self._spawn(self.cancel(workflow_id, reason))
+
+            if time.monotonic() >= renew_at:
+                await queue.renew(owner)
+                renew_at = time.monotonic() + queue.lease_seconds / 3
+            if not jobs:
+                await asyncio.sleep(queue.poll_seconds)
+
+    def _spawn(self, coro: Awaitable[Any]) -> None:
+        # Hold the task until it finishes so it cannot be garbage-collected mid-flight
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def start(self) -> None:
+        self.scheduler.start()
+
+    async def close(self) -> None:
+        await self.scheduler.stop()
+        # Before the store: the shared queue's final writes go through the store's writer
+        if self.checkpoints:
+            self.checkpoints.close()
+        await self.store.close()
+        await self.integrations.close()
 
     def _generate_summary(self, state: WorkflowState) -> WorkflowState:
         """
         Produce a human-readable case summary and resolution reason.
         In production this could be delegated to an LLM using the logs as context.
         """
-        if state.workflow_type == WorkflowType.printer_offline:
-            base = "Printer offline self-heal workflow executed."
-        else:
-            base = "Printer ink error self-heal workflow executed."
+        spec = self.workflows.get(state.workflow_type)
+        base = spec.summary if spec else "Self-heal workflow executed."
 
         actions = ", ".join(a.name for a in state.actions) or "no actions taken"
         verification = "succeeded" if state.verification and state.verification.success else "did not fully succeed"
@@ -197,7 +731,19 @@ class WorkflowEngine:
         return state
 
 
+def create_engine() -> WorkflowEngine:
+    """
+    The engine for this process. With WORKFLOW_SHARED_QUEUE set it admits workflows to
+    the shared queue in the workflow database, and `python -m agentic_support.app.worker`
+    processes run them; otherwise it runs them itself.
+    """
+    if not WORKFLOW_SHARED_QUEUE:
+        return WorkflowEngine()
+    store = SharedSQLiteStateStore()
+    return WorkflowEngine(store=store, work_queue=WorkQueue(store))
+
+
 # Singleton engine instance used by FastAPI routes
-engine = WorkflowEngine()
+engine = create_engine()
 
 
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+# Per-subscriber frame buffer; a watcher that falls this far behind is told to resync
+EVENT_BUFFER_SIZE = int(os.getenv("WORKFLOW_EVENT_BUFFER_SIZE", "256"))
+HEARTBEAT_SECONDS = float(os.getenv("WORKFLOW_EVENT_HEARTBEAT_SECONDS", "15"))
+# How often a watcher polls the shared store when workflows run in other processes
+EVENT_POLL_SECONDS = float(os.getenv("WORKFLOW_EVENT_POLL_SECONDS", "0.25"))
+
+_CLOSE = (None, b"")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def encode_event(event: str, payload: Dict[str, Any], seq: Optional[int] = None) -> bytes:
+    """Serialize one Server-Sent Events frame."""
+    data = json.dumps(payload, default=_json_default, separators=(",", ":"))
+    frame = f"event: {event}\n"
+    if seq is not None:
+        frame += f"id: {seq}\n"
+    return (frame + f"data: {data}\n\n").encode("utf-8")
+
+
+class Subscription:
+    """One watcher of one workflow; frames arrive as pre-encoded bytes."""
+
+    def __init__(self, workflow_id: str, buffer_size: int) -> None:
+        self.workflow_id = workflow_id
+        self.queue: "asyncio.Queue[Tuple[Optional[int], bytes]]" = asyncio.Queue(maxsize=buffer_size)
+        self.overflowed = False
+
+    def offer(self, seq: Optional[int], frame: bytes) -> bool:
+        try:
+            self.queue.put_nowait((seq, frame))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def frames(self, after_seq: int = 0, heartbeat_seconds: float = HEARTBEAT_SECONDS) -> AsyncIterator[bytes]:
+        """
+        Yield frames until the workflow finishes, skipping anything already covered
+        by the snapshot at after_seq. Emits an SSE comment as keep-alive when idle.
+        """
+        while True:
+            try:
+                seq, frame = await asyncio.wait_for(self.queue.get(), timeout=heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            if (seq, frame) == _CLOSE:
+                return
+            if seq is not None and seq <= after_seq:
+                continue
+            yield frame
+
+
+class WorkflowEventBus:
+    """
+    In-process pub/sub for workflow stage transitions.
+
+    publish() serializes a delta once and fans the same bytes out to every
+    subscriber of that workflow, so the cost per transition does not grow with the
+    number of watchers, and nothing is serialized when nobody is watching. Each
+    subscriber has a bounded buffer; when it fills, the backlog is replaced by a
+    single `resync` event and the client should re-fetch the full status.
+    """
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE) -> None:
+        self.buffer_size = buffer_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._stats = {"published": 0, "delivered": 0, "overflows": 0}
+
+    def subscribe(self, workflow_id: str) -> Subscription:
+        sub = Subscription(workflow_id, self.buffer_size)
+        self._subscribers.setdefault(workflow_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subscribers.get(sub.workflow_id)
+        if subs is None:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._subscribers[sub.workflow_id]
+
+    def has_subscribers(self, workflow_id: str) -> bool:
+        return workflow_id in self._subscribers
+
+    def publish(self, workflow_id: str, seq: int, payload: Dict[str, Any], terminal: bool = False) -> None:
+        """Fan a delta out to the workflow's watchers; on terminal, close their streams."""
+        subs = self._subscribers.get(workflow_id)
+        if not subs:
+            return
+        frame = encode_event("delta", payload, seq)
+        self._stats["published"] += 1
+        for sub in list(subs):
+            if sub.offer(seq, frame):
+                self._stats["delivered"] += 1
+            else:
+                self._resync(sub, seq)
+            if terminal:
+                self._close(sub, seq)
+        if terminal:
+            self._subscribers.pop(workflow_id, None)
+
+    def _resync(self, sub: Subscription, seq: Optional[int]) -> None:
+        self._stats["overflows"] += 1
+        sub.overflowed = True
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.offer(seq, encode_event("resync", {"workflow_id": sub.workflow_id}, seq))
+
+    def _close(self, sub: Subscription, seq: Optional[int]) -> None:
+        if not sub.offer(*_CLOSE):
+            self._resync(sub, seq)
+            sub.offer(*_CLOSE)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["watched_workflows"] = len(self._subscribers)
+        stats["subscribers"] = sum(len(subs) for subs in self._subscribers.values())
+        stats["buffer_size"] = self.buffer_size
+        return stats
+
+
+# Global instance
+event_bus = WorkflowEventBus()
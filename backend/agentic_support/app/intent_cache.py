@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .intent_rules import IntentMatch, intent_rules, normalize_text
+
+
+class IntentCache:
+    """
+    LRU + TTL cache of detected intents keyed on normalized interaction text
+    (case and whitespace folded), so repeated openers such as "my printer is
+    offline" skip intent detection and its metrics write.
+
+    Entries are tagged with the rule-table version and ignored once the rules
+    are reloaded.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        version: Callable[[], int] = lambda: intent_rules.version,
+    ) -> None:
+        self.max_entries = max_entries or int(os.getenv("INTENT_CACHE_SIZE", "10000"))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("INTENT_CACHE_TTL_SECONDS", "300"))
+        self.ttl_seconds = ttl_seconds
+        self._version = version
+
+        self._entries: "OrderedDict[str, Tuple[IntentMatch, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, text: str) -> Optional[IntentMatch]:
+        key = normalize_text(text)
+        version = self._version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                match, expires_at, entry_version = entry
+                if expires_at > time.monotonic() and entry_version == version:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return match
+                del self._entries[key]
+                self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, text: str, match: IntentMatch) -> None:
+        key = normalize_text(text)
+        entry = (match, time.monotonic() + self.ttl_seconds, self._version())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
+
+
+# Global instance
+intent_cache = IntentCache()
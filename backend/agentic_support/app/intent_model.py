@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .intent_rules import normalize_text
+
+# NumPy - optional; without it the agent uses the rule table only
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+INTENT_MODEL_PATH = Path(os.getenv("INTENT_MODEL_PATH", str(Path(__file__).parent / "intent_model.npz")))
+DEFAULT_FEATURES = 1 << 18
+
+
+# Token -> hash cache; transcripts reuse a small vocabulary
+TOKEN_CACHE_SIZE = 1 << 20
+_BIGRAM_MULTIPLIER = 0x9E3779B1
+
+
+class IntentModel:
+    """
+    Linear intent classifier over hashed word unigram + bigram features.
+
+    weights has shape (n_features, n_classes); row 0 is the bias. A batch is
+    featurized into one sparse matrix in coordinate form (row, feature index,
+    value) with numpy: tokens are hashed once (crc32, cached), bigram indices are
+    combined from adjacent token hashes, and every n-gram occurrence of a row
+    weighs 1/sqrt(number of n-grams). Scoring is that sparse matrix times weights:
+    one gather of weight rows and one np.bincount per class, then a softmax.
+    """
+
+    def __init__(self, weights: "np.ndarray", classes: Sequence[str]) -> None:
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy is required for the intent model")
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.classes = list(classes)
+        self.n_features = self.weights.shape[0]
+        self._token_hashes: Dict[str, int] = {}
+
+    def _hash_tokens(self, tokens: List[str]) -> List[int]:
+        cache = self._token_hashes
+        hashes = []
+        for token in tokens:
+            h = cache.get(token)
+            if h is None:
+                h = zlib.crc32(token.encode("utf-8"))
+                if len(cache) < TOKEN_CACHE_SIZE:
+                    cache[token] = h
+            hashes.append(h)
+        return hashes
+
+    def featurize(self, texts: Sequence[str]) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """(rows, feature indices, values) of the batch's sparse feature matrix, bias excluded."""
+        hashes: List[int] = []
+        lengths: List[int] = []
+        for text in texts:
+            tokens = normalize_text(text).split()
+            hashes.extend(self._hash_tokens(tokens))
+            lengths.append(len(tokens))
+
+        h = np.asarray(hashes, dtype=np.uint64)
+        lengths_arr = np.asarray(lengths, dtype=np.int64)
+        token_rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths_arr)
+        buckets = np.uint64(self.n_features - 1)
+
+        unigrams = (h % buckets + np.uint64(1)).astype(np.int64)
+        # Adjacent tokens of the same text form a bigram
+        same_text = token_rows[:-1] == token_rows[1:]
+        bigrams = ((h[:-1] * np.uint64(_BIGRAM_MULTIPLIER) + h[1:]) % buckets + np.uint64(1)).astype(np.int64)
+
+        indices = np.concatenate([unigrams, bigrams[same_text]])
+        rows = np.concatenate([token_rows, token_rows[:-1][same_text]])
+        grams_per_row = lengths_arr + np.maximum(lengths_arr - 1, 0)
+        scale = 1.0 / np.sqrt(np.maximum(grams_per_row, 1))
+        return rows, indices, scale[rows].astype(np.float32)
+
+    def _scores(self, rows, indices, values, batch_size: int) -> "np.ndarray":
+        contributions = self.weights[indices] * values[:, None]
+        scores = np.empty((batch_size, len(self.classes)), dtype=np.float32)
+        for c in range(len(self.classes)):
+            scores[:, c] = np.bincount(rows, weights=contributions[:, c], minlength=batch_size)
+        return scores + self.weights[0]
+
+    @staticmethod
+    def _softmax(scores: "np.ndarray") -> "np.ndarray":
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, texts: Sequence[str]) -> "np.ndarray":
+        if not texts:
+            return np.zeros((0, len(self.classes)), dtype=np.float32)
+        return self._softmax(self._scores(*self.featurize(texts), len(texts)))
+
+    def predict(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """(intent, confidence) for each text."""
+        proba = self.predict_proba(texts)
+        best = proba.argmax(axis=1)
+        return [(self.classes[i], round(float(p), 4)) for i, p in zip(best, proba[np.arange(len(best)), best])]
+
+    @classmethod
+    def train(
+        cls,
+        texts: Sequence[str],
+        labels: Sequence[str],
+        n_features: int = DEFAULT_FEATURES,
+        epochs: int = 30,
+        learning_rate: float = 1.0,
+        l2: float = 1e-6,
+        batch_size: int = 512,
+        seed: int = 0,
+    ) -> "IntentModel":
+        """Multinomial logistic regression by minibatch gradient descent."""
+        classes = sorted(set(labels))
+        class_index = {c: i for i, c in enumerate(classes)}
+        model = cls(np.zeros((n_features, len(classes)), dtype=np.float32), classes)
+        y = np.asarray([class_index[label] for label in labels], dtype=np.int64)
+
+        order = list(range(len(texts)))
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(order)
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                rows, indices, values = model.featurize([texts[i] for i in batch])
+                error = model._softmax(model._scores(rows, indices, values, len(batch)))
+                error[np.arange(len(batch)), y[batch]] -= 1.0
+                # Gradient X^T (P - Y), accumulated only for the feature rows this batch touches
+                touched, position = np.unique(indices, return_inverse=True)
+                grad = np.empty((len(touched), len(classes)), dtype=np.float32)
+                for c in range(len(classes)):
+                    grad[:, c] = np.bincount(position, weights=values * error[rows, c], minlength=len(touched))
+                model.weights[touched] -= learning_rate * (grad / len(batch) + l2 * model.weights[touched])
+                model.weights[0] -= learning_rate * error.mean(axis=0)
+        return model
+
+    def save(self, path: Path) -> None:
+        np.savez_compressed(path, weights=self.weights, classes=np.asarray(self.classes))
+
+    @classmethod
+    def load(cls, path: Path) -> "IntentModel":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["weights"], [str(c) for c in data["classes"]])
+
+
+def load_intent_model(path: Path = INTENT_MODEL_PATH) -> Optional[IntentModel]:
+    """Load the model file if present; None means rule-based detection only."""
+    if not Path(path).exists():
+        return None
+    if not NUMPY_AVAILABLE:
+        print(f"⚠️ numpy not installed; ignoring intent model at {path}")
+        return None
+    try:
+        model = IntentModel.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Could not load intent model from {path}: {e}")
+        return None
+    print(f"✅ Intent model loaded from {path} ({len(model.classes)} intents)")
+    return model
+
+
+def _read_labeled(path: Path) -> Tuple[List[str], List[str]]:
+    texts, labels = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                texts.append(row["text"])
+                labels.append(row["intent"])
+    return texts, labels
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Train an intent model offline from labeled transcripts.
+
+    Input is JSONL with one {"text": ..., "intent": ...} object per line.
+    10% of the rows are held out to report accuracy.
+
+    Usage (from backend/):
+        python -m agentic_support.app.intent_model transcripts.jsonl [-o intent_model.npz]
+    """
+    parser = argparse.ArgumentParser(description="Train the hashed n-gram intent classifier")
+    parser.add_argument("data", type=Path)
+    parser.add_argument("-o", "--output", type=Path, default=INTENT_MODEL_PATH)
+    parser.add_argument("--features", type=int, default=DEFAULT_FEATURES)
+    parser.add_argument("--epochs", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    if not NUMPY_AVAILABLE:
+        print("❌ numpy is required to train the intent model")
+        return 1
+
+    texts, labels = _read_labeled(args.data)
+    rows = list(range(len(texts)))
+    random.Random(0).shuffle(rows)
+    held_out = rows[: len(rows) // 10]
+    train = rows[len(rows) // 10:]
+
+    started = time.perf_counter()
+    model = IntentModel.train(
+        [texts[i] for i in train], [labels[i] for i in train], n_features=args.features, epochs=args.epochs
+    )
+    elapsed = time.perf_counter() - started
+    if held_out:
+        predicted = model.predict([texts[i] for i in held_out])
+        accuracy = sum(p == labels[i] for (p, _), i in zip(predicted, held_out)) / len(held_out)
+        print(f"Held-out accuracy: {accuracy:.3f} on {len(held_out)} rows")
+    model.save(args.output)
+    print(f"✅ Trained on {len(train)} rows in {elapsed:.1f}s; saved {args.output}")
+    return 0
+
+
+# Global instance (None when no model file is deployed)
+intent_model = load_intent_model()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+INTENT_RULES_PATH = Path(os.getenv("INTENT_RULES_PATH", str(Path(__file__).parent / "intent_rules.json")))
+# How often (seconds) match() checks the rule file for changes
+INTENT_RULES_RELOAD_SECONDS = float(os.getenv("INTENT_RULES_RELOAD_SECONDS", "2"))
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace; rule phrases and input go through the same step."""
+    return " ".join(text.lower().split())
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """
+    Regex source matching any of `phrases`, factored as a prefix trie.
+
+    Python's regex engine tries alternatives one by one at every position, so a flat
+    `a|b|c|...` of thousands of phrases is linear in the rule count. Sharing prefixes
+    means each position only follows the branch that matches the next character.
+    A phrase that is a prefix of another becomes an optional (greedy) tail, so the
+    longest phrase wins.
+    """
+    trie: Dict[str, Any] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+@dataclass
+class IntentMatch:
+    intent: str
+    # Share of the total matched weight that went to `intent` (0 when nothing matched)
+    confidence: float
+    scores: Dict[str, float] = field(default_factory=dict)
+    matched: List[str] = field(default_factory=list)
+    source: str = "rules"
+
+
+class IntentRuleSet:
+    """A compiled rule table: every phrase of every intent in one regex."""
+
+    def __init__(self, rules: List[Dict[str, Any]], default_intent: str) -> None:
+        self.default_intent = default_intent
+        self.intents: List[str] = []
+        # phrase -> [(intent, weight)], a phrase may count towards several intents
+        self.phrases: Dict[str, List[Tuple[str, float]]] = {}
+        for rule in rules:
+            intent = rule["intent"]
+            if intent not in self.intents:
+                self.intents.append(intent)
+            default_weight = float(rule.get("weight", 1.0))
+            for entry in rule.get("phrases", []):
+                # A phrase is a string, or {"phrase": ..., "weight": ...} to override the rule weight
+                if isinstance(entry, dict):
+                    phrase, weight = entry["phrase"], float(entry.get("weight", default_weight))
+                else:
+                    phrase, weight = entry, default_weight
+                phrase = normalize_text(phrase)
+                if phrase:
+                    self.phrases.setdefault(phrase, []).append((intent, weight))
+
+        started = time.perf_counter()
+        if self.phrases:
+            self.pattern = re.compile(r"(?<!\w)" + _trie_pattern(self.phrases) + r"(?!\w)")
+        else:
+            self.pattern = None
+        self.compile_ms = (time.perf_counter() - started) * 1000
+
+    @classmethod
+    def from_file(cls, path: Path) -> "IntentRuleSet":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("rules", []), data.get("default_intent", "printer_offline"))
+
+    def match(self, text: str) -> IntentMatch:
+        """
+        Score each intent by the summed weight of the distinct phrases found in `text`.
+        Ties go to the intent declared first in the rule file.
+        """
+        if self.pattern is None:
+            return IntentMatch(self.default_intent, 0.0)
+        matched = set(self.pattern.findall(normalize_text(text)))
+        scores: Dict[str, float] = {}
+        for phrase in matched:
+            for intent, weight in self.phrases[phrase]:
+                scores[intent] = scores.get(intent, 0.0) + weight
+        if not scores:
+            return IntentMatch(self.default_intent, 0.0)
+
+        best = max(self.intents, key=lambda intent: scores.get(intent, 0.0))
+        total = sum(scores.values())
+        return IntentMatch(best, round(scores[best] / total, 4), scores, sorted(matched))
+
+
+class IntentRuleEngine:
+    """
+    Rule set loaded from a JSON file and recompiled when the file changes.
+
+    The file's mtime is checked at most every reload_seconds on the match path.
+    A file that fails to load or compile is reported and the previous rules stay
+    in use.
+    """
+
+    def __init__(self, path: Path = INTENT_RULES_PATH, reload_seconds: float = INTENT_RULES_RELOAD_SECONDS) -> None:
+        self.path = Path(path)
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._rules: Optional[IntentRuleSet] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._reloads = 0
+        self._reload_errors = 0
+        self._load()
+
+    @property
+    def rules(self) -> IntentRuleSet:
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_seconds:
+            self._checked_at = now
+            try:
+                mtime = self.path.stat().st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self._load()
+        return self._rules
+
+    def _load(self) -> None:
+        with self._lock:
+            # Recorded before parsing so a broken or missing file is reported once, not on every check
+            try:
+                self._mtime = self.path.stat().st_mtime
+            except OSError:
+                self._mtime = None
+            try:
+                rules = IntentRuleSet.from_file(self.path)
+            except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+                self._reload_errors += 1
+                print(f"⚠️ Could not load intent rules from {self.path}: {e}")
+                if self._rules is None:
+                    self._rules = IntentRuleSet([], "printer_offline")
+                return
+            self._rules = rules
+            self._reloads += 1
+
+    @property
+    def version(self) -> int:
+        """Bumped on every successful (re)load; lets callers drop results from older rules."""
+        self.rules
+        return self._reloads
+
+    def match(self, text: str) -> IntentMatch:
+        return self.rules.match(text)
+
+    def stats(self) -> Dict[str, Any]:
+        rules = self._rules
+        return {
+            "path": str(self.path),
+            "intents": len(rules.intents),
+            "phrases": len(rules.phrases),
+            "compile_ms": round(rules.compile_ms, 3),
+            "reloads": self._reloads,
+            "reload_errors": self._reload_errors,
+        }
+
+
+# Global instance
+intent_rules = IntentRuleEngine()
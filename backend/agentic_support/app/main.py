@@ -1,16 +1,31 @@
 from __future__ import annotations
 
+import json
 import logging
+import os
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Query
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
 
+from ..db.database import db_pool
+from ..db.time_range import date_range_end
+from ..utils.metrics_writer import metrics_writer
 from .engine import engine
+from .events import encode_event, event_bus
+from .intent_cache import intent_cache
+from .intent_rules import intent_rules
+from .scheduler import SchedulerSaturated
+from .state_store import TERMINAL_STATUSES
+from .telemetry import telemetry_hub
 from .models import (
     SimulateTelemetryRequest,
     TriggerWorkflowResponse,
+    WorkflowStatus,
     WorkflowStatusResponse,
     WorkflowTriggerRequest,
 )
@@ -21,13 +36,39 @@ logging.basicConfig(level=logging.INFO)
 # Initialize database on startup
 try:
     from ..db.schema import init_database
+    from ..services.metrics_cache import metrics_cache
     from ..services.metrics_service import metrics_service
     init_database()
+    metrics_writer.add_listener(metrics_cache.invalidate_since)
 except ImportError as e:
     logger.warning(f"Could not import metrics modules: {e}")
     metrics_service = None
+    metrics_cache = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Startup: start the workflow workers and telemetry sources, and reload or resume
+    in-flight workflows. Shutdown: write any buffered agent metrics and workflow state
+    before the process exits.
+    """
+    await engine.start()
+    await telemetry_hub.start()
+    restored = await engine.restore()
+    if restored:
+        resumed = engine.checkpoints.stats()["replayed"] if engine.checkpoints else 0
+        logger.info("Restored %d in-flight workflows (%d resumed from checkpoints)", len(restored), resumed)
+    try:
+        yield
+    finally:
+        await telemetry_hub.close()
+        await engine.close()
+        metrics_writer.close()
+        db_pool.close()
+
 
 app = FastAPI(
+    lifespan=lifespan,
     title="Agentic Customer Support Self-Healing API",
     version="0.1.0",
     description=(
@@ -58,11 +99,16 @@ async def trigger_workflow(payload: WorkflowTriggerRequest, background: Backgrou
     Optionally, a specific workflow_type can be supplied; otherwise an intent-detection
     step will infer the best matching workflow.
 
-    The orchestration runs asynchronously in the background. This endpoint returns
-    immediately with a workflow_id that can be used to query status.
+    The orchestration runs asynchronously on a bounded worker pool. This endpoint returns
+    immediately with a workflow_id that can be used to query status, or 429 with a
+    Retry-After header when the run queue is full.
     """
-    state = await engine.trigger(payload)
-    logger.info("Triggered workflow %s of type %s", state.id, state.workflow_type.value)
+    try:
+        state = await engine.trigger(payload)
+    except SchedulerSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    workflow_type = state.workflow_type.value if state.workflow_type else "(pending intent detection)"
+    logger.info("Triggered workflow %s of type %s", state.id, workflow_type)
 
     return TriggerWorkflowResponse(
         workflow_id=state.id,
@@ -73,6 +119,100 @@ async def trigger_workflow(payload: WorkflowTriggerRequest, background: Backgrou
     )
 
 
+BATCH_MAX_ITEMS = int(os.getenv("WORKFLOW_BATCH_MAX_ITEMS", "1000"))
+BATCH_CHUNK_SIZE = int(os.getenv("WORKFLOW_BATCH_CHUNK_SIZE", "200"))
+
+_BATCH_ADAPTER = TypeAdapter(List[WorkflowTriggerRequest])
+_ITEM_ADAPTER = TypeAdapter(WorkflowTriggerRequest)
+
+
+def _validation_errors(e: ValidationError) -> List[Dict[str, Any]]:
+    return [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+
+
+def _parse_batch(body: bytes, content_type: str) -> List[Union[WorkflowTriggerRequest, List[Dict[str, Any]]]]:
+    """
+    Validate a batch body: NDJSON (one request per line) or a JSON array.
+
+    Returns one entry per item: the validated request, or its validation errors.
+    A JSON array is validated in a single pass; only a batch with invalid items
+    falls back to per-item validation to find them.
+    """
+    items: List[Union[WorkflowTriggerRequest, List[Dict[str, Any]]]] = []
+    if "ndjson" in content_type or "jsonl" in content_type:
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(_ITEM_ADAPTER.validate_json(line))
+            except ValidationError as e:
+                items.append(_validation_errors(e))
+        return items
+
+    try:
+        return _BATCH_ADAPTER.validate_json(body)
+    except ValidationError:
+        pass
+    try:
+        raw = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if not isinstance(raw, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array or NDJSON of workflow trigger requests")
+    for item in raw:
+        try:
+            items.append(_ITEM_ADAPTER.validate_python(item))
+        except ValidationError as e:
+            items.append(_validation_errors(e))
+    return items
+
+
+@app.post("/trigger-workflows:batch")
+async def trigger_workflows_batch(request: Request) -> StreamingResponse:
+    """
+    Start many workflows from one request.
+
+    Accepts a JSON array of WorkflowTriggerRequest, or NDJSON with
+    Content-Type: application/x-ndjson. Items are processed in chunks: intents are
+    classified in one batched pass per chunk and the chunk's workflows are stored
+    together. The response is NDJSON with one line per input item, in order:
+      - status_code 200 with workflow_id, workflow_type, status, stage, created_at
+      - status_code 422 with validation errors for that item
+      - status_code 429 with retry_after when the run queue was full
+    """
+    items = _parse_batch(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+
+    async def stream():
+        for start in range(0, len(items), BATCH_CHUNK_SIZE):
+            chunk = items[start:start + BATCH_CHUNK_SIZE]
+            valid = [(start + i, item) for i, item in enumerate(chunk) if isinstance(item, WorkflowTriggerRequest)]
+            results = await engine.trigger_many([req for _, req in valid]) if valid else []
+            by_index = dict(zip((index for index, _ in valid), results))
+
+            lines = []
+            for index, item in enumerate(chunk, start):
+                result = by_index.get(index)
+                if result is None:
+                    line = {"index": index, "status_code": 422, "errors": item}
+                elif isinstance(result, SchedulerSaturated):
+                    line = {"index": index, "status_code": 429, "error": str(result), "retry_after": result.retry_after}
+                else:
+                    line = {"index": index, "status_code": 200} | TriggerWorkflowResponse(
+                        workflow_id=result.id,
+                        workflow_type=result.workflow_type,
+                        status=result.status,
+                        stage=result.stage,
+                        created_at=result.created_at,
+                    ).model_dump(mode="json")
+                lines.append(json.dumps(line))
+            logger.info("Batch trigger: processed items %d-%d", start, start + len(chunk) - 1)
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @app.get("/get-workflow-status", response_model=WorkflowStatusResponse)
 async def get_workflow_status(workflow_id: str) -> WorkflowStatusResponse:
     """
@@ -92,24 +232,146 @@ async def get_workflow_status(workflow_id: str) -> WorkflowStatusResponse:
     return WorkflowStatusResponse(workflow=state)
 
 
-# In-memory telemetry store used for /simulate-telemetry
-_TELEMETRY_STORE: Dict[str, Dict] = {}
+@app.delete("/workflows/{workflow_id}", response_model=WorkflowStatusResponse)
+async def cancel_workflow(workflow_id: str) -> WorkflowStatusResponse:
+    """
+    Cancel a pending or running workflow.
+
+    A queued workflow never starts; a running one has its current agent cancelled and
+    runs no further stages (backend actions already taken are not rolled back).
+    Returns the cancelled workflow, or 409 if it had already finished or was past the
+    point where it can be cancelled (e.g. being escalated after its time limit).
+    """
+    state = await engine.cancel(workflow_id)
+    if not state:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    if state.status != WorkflowStatus.cancelled:
+        raise HTTPException(status_code=409, detail=f"Workflow already {state.status.value}")
+    logger.info("Cancelled workflow %s", workflow_id)
+    return WorkflowStatusResponse(workflow=state)
+
+
+@app.get("/workflows/{workflow_id}/events")
+async def stream_workflow_events(workflow_id: str) -> StreamingResponse:
+    """
+    Server-Sent Events stream of a workflow's stage transitions.
+
+    The first `snapshot` event carries the full workflow state. Each following
+    `delta` event carries stage, status and only the log entries added since the
+    previous event (`log_offset` is the index of the first one). A `resync` event
+    means the client fell behind and should re-fetch /get-workflow-status.
+    The stream ends when the workflow completes, escalates or fails.
+    """
+    # Subscribe before reading the snapshot so no transition falls in between
+    subscription = event_bus.subscribe(workflow_id)
+    seq = engine.event_seq(workflow_id)
+    state = await engine.get_state(workflow_id)
+    if not state:
+        event_bus.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    async def stream():
+        try:
+            yield encode_event("snapshot", {"workflow": state}, seq)
+            if state.status in TERMINAL_STATUSES:
+                return
+            # With the shared queue the workflow runs in another process; follow it through the store
+            frames = engine.poll_events(state) if engine.work_queue is not None else subscription.frames(after_seq=seq)
+            async for frame in frames:
+                yield frame
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/simulate-telemetry")
 async def simulate_telemetry(payload: SimulateTelemetryRequest) -> Dict[str, str]:
     """
-    Mock endpoint to upsert device telemetry.
+    Upsert one device telemetry reading into the telemetry hub.
 
-    In a production deployment this would typically be replaced with:
-      - a webhook from a device telemetry platform, or
-      - a polling job that reads from an IoT / streaming source (e.g., Kafka, MQTT).
+    For high-volume feeds use /telemetry:ingest; in a production deployment the
+    hub would typically be fed by a webhook from a device telemetry platform or a
+    consumer of an IoT / streaming source (e.g., Kafka, MQTT).
     """
-    _TELEMETRY_STORE[payload.device_id] = payload.telemetry.model_dump()
+    telemetry_hub.ingest(payload.device_id, payload.telemetry)
     logger.info("Updated simulated telemetry for device %s", payload.device_id)
     return {"status": "ok", "device_id": payload.device_id}
 
 
+@app.post("/telemetry:ingest")
+async def ingest_telemetry(request: Request) -> Dict[str, Any]:
+    """
+    Stream device telemetry into the telemetry hub.
+
+    The body is NDJSON, one /simulate-telemetry payload per line
+    ({"device_id": ..., "telemetry": {...}}), and is ingested as it arrives.
+    Invalid lines are skipped and reported (the first 100) with their line number.
+    """
+    accepted, errors = await telemetry_hub.ingest_stream(request.stream())
+    return {"accepted": accepted, "rejected": len(errors), "errors": errors}
+
+
+@app.get("/devices/{device_id}/telemetry")
+async def get_device_telemetry(device_id: str, history: int = Query(0, ge=0)) -> Dict[str, Any]:
+    """Latest reading for a device, plus up to `history` of its most recent retained readings."""
+    reading = telemetry_hub.latest_reading(device_id)
+    if reading is None:
+        raise HTTPException(status_code=404, detail="No telemetry for device")
+    received_at, latest = reading
+    response: Dict[str, Any] = {
+        "device_id": device_id,
+        "received_at": datetime.utcfromtimestamp(received_at),
+        "telemetry": latest,
+    }
+    if history:
+        response["history"] = [
+            {"received_at": datetime.utcfromtimestamp(ts), "telemetry": telemetry}
+            for ts, telemetry in telemetry_hub.history(device_id, history)
+        ]
+    return response
+
+
+def _fleet_query(query, **kwargs) -> Dict[str, Any]:
+    try:
+        return query(**kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.get("/api/v1/fleet/offline")
+async def get_fleet_offline(
+    minutes: float = Query(10, gt=0, description="Minimum time offline"),
+    group_by: Optional[str] = Query(None, description="model or firmware_version"),
+) -> Dict[str, Any]:
+    """Devices currently reporting offline that have not been online for at least `minutes`."""
+    return _fleet_query(telemetry_hub.columns.offline_devices, min_offline_seconds=minutes * 60, group_by=group_by)
+
+
+@app.get("/api/v1/fleet/low-ink")
+async def get_fleet_low_ink(
+    threshold: int = Query(5, ge=1, le=100, description="Ink level percentage"),
+    group_by: Optional[str] = Query(None, description="model or firmware_version"),
+) -> Dict[str, Any]:
+    """Devices whose latest reading has any ink level below `threshold` percent."""
+    return _fleet_query(telemetry_hub.columns.low_ink, threshold=threshold, group_by=group_by)
+
+
+@app.get("/api/v1/fleet/errors")
+async def get_fleet_errors(
+    minutes: float = Query(60, gt=0, description="Look-back window"),
+    group_by: Optional[str] = Query(None, description="model or firmware_version"),
+) -> Dict[str, Any]:
+    """Per error code, the number of devices that reported it within the last `minutes`."""
+    return _fleet_query(telemetry_hub.columns.error_code_devices, since_seconds=minutes * 60, group_by=group_by)
+
+
 @app.get("/api/v1/metrics/channels")
 async def get_channel_metrics(
     from_date: Optional[str] = Query(None),
@@ -118,7 +380,11 @@ async def get_channel_metrics(
     """Get entry channel volumes."""
     if not metrics_service:
         return {"channels": []}
-    return {"channels": metrics_service.get_channel_volumes(from_date, to_date)}
+    return metrics_cache.get_or_compute(
+        "channels",
+        {"from_date": from_date, "to_date": to_date},
+        lambda: {"channels": metrics_service.get_channel_volumes(from_date, to_date)},
+    )
 
 
 @app.get("/api/v1/metrics/kpi")
@@ -129,7 +395,11 @@ async def get_kpi_metrics(
     """Get key performance indicators."""
     if not metrics_service:
         return {"self_heal_rate": 0, "avg_resolution_time_seconds": 0, "cost_savings_usd": 0}
-    return metrics_service.get_kpi_metrics(from_date, to_date)
+    return metrics_cache.get_or_compute(
+        "kpi",
+        {"from_date": from_date, "to_date": to_date},
+        lambda: metrics_service.get_kpi_metrics(from_date, to_date),
+    )
 
 
 @app.get("/api/v1/metrics/agents")
@@ -141,20 +411,27 @@ async def get_agent_metrics(
     """Get agent performance data."""
     if not metrics_service:
         return {"agents": []}
-    if agent_name:
-        # Get individual agent details
-        executions = metrics_service.get_agent_metrics(agent_name, from_date, to_date)
-        aggregates = metrics_service.get_agent_aggregates(agent_name, from_date, to_date)
-        return {
-            "agent_name": agent_name,
-            "aggregates": aggregates[0] if aggregates else {},
-            "executions": executions,
-        }
-    else:
+
+    def compute() -> Dict:
+        if agent_name:
+            # Get individual agent details
+            executions = metrics_service.get_agent_metrics(agent_name, from_date, to_date)
+            aggregates = metrics_service.get_agent_aggregates(agent_name, from_date, to_date)
+            return {
+                "agent_name": agent_name,
+                "aggregates": aggregates[0] if aggregates else {},
+                "executions": executions,
+            }
         # Get all agents aggregates
         aggregates = metrics_service.get_agent_aggregates(None, from_date, to_date)
         return {"agents": aggregates}
 
+    return metrics_cache.get_or_compute(
+        "agents",
+        {"agent_name": agent_name, "from_date": from_date, "to_date": to_date},
+        compute,
+    )
+
 
 @app.get("/api/v1/metrics/agents/{agent_name}/details")
 async def get_agent_details(
@@ -175,6 +452,13 @@ async def get_agent_details(
     }
 
 
+def _date_window_end(to_date: Optional[str]) -> Optional[datetime]:
+    try:
+        return date_range_end(to_date)
+    except ValueError:
+        return None
+
+
 @app.get("/api/v1/metrics/categories")
 async def get_category_metrics(
     category_id: Optional[str] = Query(None),
@@ -184,12 +468,16 @@ async def get_category_metrics(
     """Get category performance data."""
     if not metrics_service:
         return {"categories": [], "resolution": {"total": 0, "breakdown": {}}}
-    categories = metrics_service.get_category_metrics(category_id, from_date, to_date)
-    resolution = metrics_service.get_resolution_metrics(category_id, from_date, to_date)
-    return {
-        "categories": categories,
-        "resolution": resolution,
-    }
+    return metrics_cache.get_or_compute(
+        "categories",
+        {"category_id": category_id, "from_date": from_date, "to_date": to_date},
+        lambda: {
+            "categories": metrics_service.get_category_metrics(category_id, from_date, to_date),
+            "resolution": metrics_service.get_resolution_metrics(category_id, from_date, to_date),
+        },
+        # category_metrics is a DATE column: the window runs to the end of to_date's day
+        window_end=_date_window_end(to_date),
+    )
 
 
 @app.get("/api/v1/metrics/collaboration")
@@ -215,36 +503,7 @@ async def get_insights(
     """Get category insights comparing AI vs Human performance."""
     if not metrics_service:
         return {"insights": []}
-    categories = metrics_service.get_category_metrics(None, from_date, to_date)
-    resolution = metrics_service.get_resolution_metrics(None, from_date, to_date)
-    
-    # Build insights for each category
-    insights = []
-    for cat in categories[:10]:  # Top 10 categories
-        cat_id = cat["category_id"]
-        cat_resolution = metrics_service.get_resolution_metrics(cat_id, from_date, to_date)
-        
-        # Get AI metrics for this category
-        ai_metrics = metrics_service.get_agent_aggregates(None, from_date, to_date)
-        # Filter by category (would need category_id in agent_metrics for real implementation)
-        
-        insights.append({
-            "category_id": cat_id,
-            "category_name": cat["category_name"],
-            "ai_handled": {
-                "resolution_rate": cat["success_rate"],
-                "avg_time_seconds": (cat.get("avg_latency_ms", 0) / 1000) if cat.get("avg_latency_ms") else 0,
-                "accuracy": cat["success_rate"],  # Simplified
-                "cost_usd": cat.get("total_cost_usd", 0.0),
-            },
-            "human_handled": {
-                "resolution_rate": 82.0,  # Placeholder
-                "avg_time_seconds": 432.0,  # 7.2 minutes placeholder
-                "csat": 4.3,  # Placeholder
-                "cost_usd": 12.50,  # Placeholder
-            },
-        })
-    
+    insights = metrics_service.get_category_insights(from_date, to_date, limit=10)
     return {"insights": insights}
 
 
@@ -256,8 +515,37 @@ async def get_alerts(
     """Get system health alerts."""
     if not metrics_service:
         return {"alerts": []}
-    alerts = metrics_service.get_alerts(from_date, to_date)
-    return {"alerts": alerts}
+    # Alert thresholds are evaluated relative to now, so the window is always open
+    return metrics_cache.get_or_compute(
+        "alerts",
+        {"from_date": from_date, "to_date": to_date},
+        lambda: {"alerts": metrics_service.get_alerts(from_date, to_date)},
+        always_open=True,
+    )
+
+
+@app.get("/api/v1/metrics/system")
+async def get_system_metrics() -> Dict:
+    """Get internal health counters for the metrics pipeline and the workflow runtime."""
+    stats = {
+        "writer": metrics_writer.stats(),
+        "db_pool": db_pool.stats(),
+        "state_store": engine.store.stats(),
+        "scheduler": engine.scheduler.stats(),
+        "sla": engine.sla_stats(),
+        "events": event_bus.stats(),
+        "intent_rules": intent_rules.stats(),
+        "intent_cache": intent_cache.stats(),
+        "telemetry": telemetry_hub.stats(),
+        "integrations": engine.integrations.stats(),
+    }
+    if engine.work_queue is not None:
+        stats["work_queue"] = engine.work_queue.stats()
+    elif engine.checkpoints:
+        stats["checkpoints"] = engine.checkpoints.stats()
+    if metrics_cache:
+        stats["response_cache"] = metrics_cache.stats()
+    return stats
 
 
 @app.get("/health")
@@ -281,10 +569,9 @@ CCaaS / Contact Center (e.g., Genesys, Twilio, Amazon Connect)
 
 Device Telemetry Platforms
 ---------------------------
-- Replace the in-memory _TELEMETRY_STORE and TelemetrySnapshot with a thin
-  adapter around your real telemetry source:
-  - e.g., a service that queries a device management API
-  - or a subscriber to telemetry events on Kafka/IoT Core.
+- Feed the telemetry hub (app/telemetry.py) from your real telemetry source:
+  - e.g., a service that posts NDJSON to /telemetry:ingest,
+  - or a subscriber to telemetry events on Kafka/IoT Core calling telemetry_hub.ingest().
 
 - The DiagnosticAgent and VerificationAgent are the natural extension points:
   replace the mocked checks with real API calls and business rules.
@@ -6,19 +6,22 @@ from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
+from .workflow_spec import workflow_specs
+
 
 class Channel(str, Enum):
     chat = "chat"
     voice = "voice"
 
 
-class WorkflowType(str, Enum):
-    printer_offline = "printer_offline"
-    ink_error = "ink_error"
+# One member per workflow defined in workflows.json (e.g. printer_offline, ink_error),
+# so a new issue type is added to the spec file alone
+WorkflowType = Enum("WorkflowType", {name: name for name in workflow_specs}, type=str)
 
 
 class WorkflowStage(str, Enum):
     triggered = "triggered"
+    detecting_intent = "detecting_intent"
     diagnosing = "diagnosing"
     acting = "acting"
     verifying = "verifying"
@@ -26,6 +29,7 @@ class WorkflowStage(str, Enum):
     escalated = "escalated"
     completed = "completed"
     failed = "failed"
+    cancelled = "cancelled"
 
 
 class WorkflowStatus(str, Enum):
@@ -34,6 +38,7 @@ class WorkflowStatus(str, Enum):
     completed = "completed"
     escalated = "escalated"
     failed = "failed"
+    cancelled = "cancelled"
 
 
 class CustomerInteraction(BaseModel):
@@ -100,6 +105,7 @@ class EscalationInfo(BaseModel):
     required: bool = False
     reason: Optional[str] = None
     target_queue: Optional[str] = None
+    ticket_id: Optional[str] = None
 
 
 class WorkflowLogEntry(BaseModel):
@@ -111,7 +117,8 @@ class WorkflowLogEntry(BaseModel):
 
 class WorkflowState(BaseModel):
     id: str
-    workflow_type: WorkflowType
+    # None until the intent detection stage has run
+    workflow_type: Optional[WorkflowType] = None
     stage: WorkflowStage = WorkflowStage.triggered
     status: WorkflowStatus = WorkflowStatus.pending
     attempts: int = 0
@@ -121,6 +128,8 @@ class WorkflowState(BaseModel):
     escalation: Optional[EscalationInfo] = None
     summary: Optional[str] = None
     resolution_reason: Optional[str] = None
+    # created_at plus the account's entitlement SLA
+    sla_deadline: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     logs: List[WorkflowLogEntry] = []
@@ -128,7 +137,7 @@ class WorkflowState(BaseModel):
 
 class TriggerWorkflowResponse(BaseModel):
     workflow_id: str
-    workflow_type: WorkflowType
+    workflow_type: Optional[WorkflowType] = None
     status: WorkflowStatus
     stage: WorkflowStage
     created_at: datetime
@@ -141,5 +150,8 @@ class WorkflowStatusResponse(BaseModel):
 class SimulateTelemetryRequest(BaseModel):
     device_id: str
     telemetry: TelemetrySnapshot
+    # Optional device attributes, used to group fleet telemetry queries
+    model: Optional[str] = None
+    firmware_version: Optional[str] = None
 
 
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# A probe reads one aspect of a device or account: (ctx, results of its inputs) -> value
+ProbeFn = Callable[[Any, Dict[str, Any]], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class Probe:
+    name: str
+    run: ProbeFn
+    # Probes whose results this one reads; it starts once they have finished
+    inputs: Tuple[str, ...] = ()
+
+
+@dataclass
+class ProbeOutcome:
+    status: str  # ok | timeout | error
+    value: Any = None
+    latency_ms: float = 0.0
+    error: Optional[str] = None
+
+
+class ProbeGraph:
+    """
+    A set of diagnostic probes and their dependencies.
+
+    Every probe starts as soon as its inputs have finished, so independent probes
+    run concurrently. The whole run shares one deadline and each probe has its own
+    timeout within it; a probe that times out or fails leaves its result out, and
+    probes that depend on it run with the inputs that are available.
+    """
+
+    def __init__(self, probes: Sequence[Probe]) -> None:
+        self.probes: Dict[str, Probe] = {}
+        for probe in probes:
+            if probe.name in self.probes:
+                raise ValueError(f"Duplicate probe {probe.name!r}")
+            self.probes[probe.name] = probe
+        for probe in probes:
+            unknown = [name for name in probe.inputs if name not in self.probes]
+            if unknown:
+                raise ValueError(f"Probe {probe.name!r} depends on unknown probes: {', '.join(unknown)}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[Probe]:
+        order: List[Probe] = []
+        done: set = set()
+        visiting: set = set()
+
+        def visit(probe: Probe) -> None:
+            if probe.name in done:
+                return
+            if probe.name in visiting:
+                raise ValueError(f"Probe dependency cycle through {probe.name!r}")
+            visiting.add(probe.name)
+            for name in probe.inputs:
+                visit(self.probes[name])
+            visiting.discard(probe.name)
+            done.add(probe.name)
+            order.append(probe)
+
+        for probe in self.probes.values():
+            visit(probe)
+        return order
+
+    async def run(self, ctx: Any, deadline_seconds: float, probe_timeout_seconds: float) -> Dict[str, ProbeOutcome]:
+        """Run every probe; returns an outcome per probe by the deadline at the latest."""
+        deadline = time.monotonic() + deadline_seconds
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_probe(probe: Probe) -> ProbeOutcome:
+            if probe.inputs:
+                await asyncio.gather(*(tasks[name] for name in probe.inputs))
+            inputs = {}
+            for name in probe.inputs:
+                outcome = tasks[name].result()
+                if outcome.status == "ok":
+                    inputs[name] = outcome.value
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return ProbeOutcome("timeout", error="deadline passed before the probe could start")
+            started = time.perf_counter()
+            try:
+                value = await asyncio.wait_for(probe.run(ctx, inputs), min(probe_timeout_seconds, remaining))
+                outcome = ProbeOutcome("ok", value)
+            except asyncio.TimeoutError:
+                outcome = ProbeOutcome("timeout")
+            except Exception as e:
+                outcome = ProbeOutcome("error", error=f"{type(e).__name__}: {e}")
+            outcome.latency_ms = round((time.perf_counter() - started) * 1000, 2)
+            return outcome
+
+        # Dependencies are created first, so each probe can await its inputs' tasks
+        for probe in self.order:
+            tasks[probe.name] = asyncio.create_task(run_probe(probe))
+        try:
+            await asyncio.gather(*tasks.values())
+        except asyncio.CancelledError:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return {name: task.result() for name, task in tasks.items()}
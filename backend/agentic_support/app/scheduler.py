@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class SchedulerSaturated(Exception):
+    """Raised by WorkflowScheduler.submit when the queue is full."""
+
+    def __init__(self, retry_after: int, depth: int) -> None:
+        super().__init__(f"Workflow queue is full ({depth} waiting); retry after {retry_after}s")
+        self.retry_after = retry_after
+        self.depth = depth
+
+
+class _QueueStats:
+    __slots__ = ("depth", "enqueued", "rejected", "started", "completed", "failed", "wait_ms_total", "wait_ms_max")
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.enqueued = 0
+        self.rejected = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.wait_ms_total / self.started, 3) if self.started else 0.0,
+            "max_wait_ms": round(self.wait_ms_max, 3),
+        }
+
+
+class WorkflowScheduler:
+    """
+    Bounded priority queue drained by a fixed pool of worker tasks.
+
+    - submit() never blocks: when max_queue_size jobs are already waiting it raises
+      SchedulerSaturated with a Retry-After estimate, so callers can shed load (HTTP 429).
+    - Lower priority values run first; equal priorities run in submission order. The
+      engine passes each workflow's weighted SLA deadline, i.e. earliest-deadline-first.
+    - Jobs are grouped under a queue name (e.g. the workflow type) for depth and
+      wait-time metrics; all names share one bounded queue and worker pool.
+    - Worker tasks are held by the scheduler, so in-flight workflows cannot be
+      garbage-collected the way bare create_task() results can.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue_size: Optional[int] = None) -> None:
+        self.workers = workers or int(os.getenv("WORKFLOW_WORKERS", "32"))
+        self.max_queue_size = max_queue_size or int(os.getenv("WORKFLOW_QUEUE_SIZE", "1000"))
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+        self._queues: Dict[str, _QueueStats] = {}
+        self._running = 0
+        # Exponentially weighted average job duration, used for Retry-After
+        self._avg_run_seconds = 0.0
+
+    def start(self) -> None:
+        """Start the worker pool on the running event loop (idempotent)."""
+        if self._worker_tasks:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_queue_size)
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"workflow-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the workers; queued jobs that have not started are dropped."""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+
+    def submit(self, job: Callable[[], Awaitable[Any]], priority: float = 0, queue: str = "default") -> None:
+        """Enqueue a coroutine factory, or raise SchedulerSaturated if the queue is full."""
+        self.start()
+        stats = self._queues.setdefault(queue, _QueueStats())
+        try:
+            self._queue.put_nowait((priority, next(self._sequence), time.perf_counter(), queue, job))
+        except asyncio.QueueFull:
+            stats.rejected += 1
+            raise SchedulerSaturated(self._retry_after(), self._queue.qsize())
+        stats.enqueued += 1
+        stats.depth += 1
+
+    async def submit_wait(self, job: Callable[[], Awaitable[Any]], priority: float = 0, queue: str = "default") -> None:
+        """Enqueue a coroutine factory, waiting for room in the queue instead of raising."""
+        self.start()
+        stats = self._queues.setdefault(queue, _QueueStats())
+        await self._queue.put((priority, next(self._sequence), time.perf_counter(), queue, job))
+        stats.enqueued += 1
+        stats.depth += 1
+
+    def capacity(self) -> int:
+        """Workers neither running a job nor spoken for by one already waiting in the queue."""
+        backlog = self._queue.qsize() if self._queue else 0
+        return max(0, self.workers - self._running - backlog)
+
+    def _retry_after(self) -> int:
+        # Time for the workers to drain the current backlog, at least one second
+        backlog = self._queue.qsize() if self._queue else 0
+        return max(1, math.ceil(backlog * self._avg_run_seconds / self.workers))
+
+    async def _worker(self) -> None:
+        while True:
+            priority, _, enqueued_at, queue, job = await self._queue.get()
+            stats = self._queues[queue]
+            wait_ms = (time.perf_counter() - enqueued_at) * 1000
+            stats.depth -= 1
+            stats.started += 1
+            stats.wait_ms_total += wait_ms
+            stats.wait_ms_max = max(stats.wait_ms_max, wait_ms)
+
+            self._running += 1
+            started = time.perf_counter()
+            try:
+                await job()
+                stats.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats.failed += 1
+                print(f"⚠️ Scheduled workflow job failed: {e}")
+            finally:
+                self._running -= 1
+                elapsed = time.perf_counter() - started
+                self._avg_run_seconds = elapsed if not self._avg_run_seconds else (
+                    0.9 * self._avg_run_seconds + 0.1 * elapsed
+                )
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue_size": self.max_queue_size,
+            "depth": self._queue.qsize() if self._queue else 0,
+            "running": self._running,
+            "avg_run_ms": round(self._avg_run_seconds * 1000, 3),
+            "queues": {name: stats.as_dict() for name, stats in self._queues.items()},
+        }
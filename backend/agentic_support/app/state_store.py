@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ..db.database import ConnectionPool
+from .models import WorkflowState, WorkflowStatus
+
+TERMINAL_STATUSES = {
+    WorkflowStatus.completed,
+    WorkflowStatus.escalated,
+    WorkflowStatus.failed,
+    WorkflowStatus.cancelled,
+}
+
+STATE_STORE_READERS = int(os.getenv("WORKFLOW_STATE_READERS", "4"))
+
+WORKFLOW_DB_PATH = Path(os.getenv("WORKFLOW_DB_PATH", str(Path(__file__).parent.parent / "workflows.db")))
+
+
+class StateStore:
+    """
+    Storage boundary for WorkflowState.
+
+    The engine only talks to this interface, so the backing store can be swapped
+    (in-memory for demos, SQLite for restarts, a shared database later).
+    """
+
+    async def get(self, workflow_id: str) -> Optional[WorkflowState]:
+        raise NotImplementedError
+
+    async def put(self, state: WorkflowState) -> None:
+        raise NotImplementedError
+
+    async def put_many(self, states: List[WorkflowState]) -> None:
+        """Persist several workflows at once (one transaction where the backend has them)."""
+        for state in states:
+            await self.put(state)
+
+    async def load_active(self) -> List[WorkflowState]:
+        """Workflows that were pending or running when the store was last written."""
+        return []
+
+    async def close(self) -> None:
+        """Flush pending writes and release resources."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class InMemoryStateStore(StateStore):
+    """
+    Process-local store with bounded memory.
+
+    Active workflows are always kept. Finished workflows (completed, escalated,
+    failed) sit in an LRU and are evicted once they have been idle for
+    retention_seconds or when more than max_finished are held.
+    """
+
+    def __init__(self, max_finished: Optional[int] = None, retention_seconds: Optional[float] = None) -> None:
+        self.max_finished = max_finished or int(os.getenv("WORKFLOW_STATE_MAX_FINISHED", "10000"))
+        if retention_seconds is None:
+            retention_seconds = float(os.getenv("WORKFLOW_STATE_RETENTION_SECONDS", "3600"))
+        self.retention_seconds = retention_seconds
+
+        self._entries: Dict[str, WorkflowState] = {}
+        # Finished workflow ids in least-recently-used order, with last access time
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._evictions = 0
+
+    async def get(self, workflow_id: str) -> Optional[WorkflowState]:
+        state = self._entries.get(workflow_id)
+        if state is not None and workflow_id in self._finished:
+            self._finished[workflow_id] = time.monotonic()
+            self._finished.move_to_end(workflow_id)
+        return state
+
+    async def put(self, state: WorkflowState) -> None:
+        self._remember(state)
+
+    def _remember(self, state: WorkflowState) -> None:
+        self._entries[state.id] = state
+        if state.status in TERMINAL_STATUSES:
+            self._finished[state.id] = time.monotonic()
+            self._finished.move_to_end(state.id)
+        self._evict()
+
+    def _evict(self) -> None:
+        cutoff = time.monotonic() - self.retention_seconds
+        while self._finished:
+            workflow_id, last_used = next(iter(self._finished.items()))
+            if last_used > cutoff and len(self._finished) <= self.max_finished:
+                break
+            del self._finished[workflow_id]
+            self._entries.pop(workflow_id, None)
+            self._evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "finished_entries": len(self._finished),
+            "evictions": self._evictions,
+            "max_finished": self.max_finished,
+            "retention_seconds": self.retention_seconds,
+        }
+
+
+class SQLiteStateStore(InMemoryStateStore):
+    """
+    Durable store: an InMemoryStateStore hot layer with write-behind to SQLite.
+
+    put() only records the state; a single background thread serializes it
+    (zlib-compressed JSON) and writes it. Several updates of the same workflow that
+    arrive before a flush are coalesced, so only the latest one is encoded and
+    written. States must not be mutated after put() (WorkflowEngine passes snapshots). Finished workflows
+    evicted from memory are read back from disk on demand and re-admitted to the LRU.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = WORKFLOW_DB_PATH,
+        max_finished: Optional[int] = None,
+        retention_seconds: Optional[float] = None,
+    ) -> None:
+        super().__init__(max_finished=max_finished, retention_seconds=retention_seconds)
+        self._pool = ConnectionPool(db_path=db_path, max_readers=STATE_STORE_READERS)
+        with self._pool.writer() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workflow_states (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    updated_at DATETIME NOT NULL,
+                    state BLOB NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_workflow_states_status ON workflow_states(status)")
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-store")
+        # One thread per reader connection, so disk reads queue here rather than
+        # piling up threads that wait on the pool
+        self._read_executor = ThreadPoolExecutor(max_workers=STATE_STORE_READERS, thread_name_prefix="state-store-read")
+        self._pending: Dict[str, WorkflowState] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_scheduled = False
+        self._rows_written = 0
+        self._flushes = 0
+        self._disk_reads = 0
+
+    @staticmethod
+    def _encode(state: WorkflowState) -> bytes:
+        return zlib.compress(state.model_dump_json().encode("utf-8"), 1)
+
+    @staticmethod
+    def _decode(blob: bytes) -> WorkflowState:
+        return WorkflowState.model_validate_json(zlib.decompress(blob))
+
+    async def get(self, workflow_id: str) -> Optional[WorkflowState]:
+        state = await super().get(workflow_id)
+        if state is not None:
+            return state
+        with self._pending_lock:
+            pending = self._pending.get(workflow_id)
+        if pending is not None:
+            return pending
+        blob = await asyncio.get_running_loop().run_in_executor(self._read_executor, self._read, workflow_id)
+        if blob is None:
+            return None
+        self._disk_reads += 1
+        # Decoded on the loop: the thread only does SQLite I/O, which releases the GIL
+        state = self._decode(blob)
+        cached = self._entries.get(workflow_id)
+        if cached is not None:
+            # Written while the read was in flight; that version is newer
+            return cached
+        self._remember(state)
+        return state
+
+    async def put(self, state: WorkflowState) -> None:
+        self._remember(state)
+        self._enqueue([state])
+
+    async def put_many(self, states: List[WorkflowState]) -> None:
+        """Persist several workflows in a single transaction."""
+        for state in states:
+            self._remember(state)
+        self._enqueue(states)
+
+    async def load_active(self) -> List[WorkflowState]:
+        states = await asyncio.get_running_loop().run_in_executor(self._read_executor, self._read_active)
+        for state in states:
+            self._remember(state)
+        return states
+
+    async def close(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._flush)
+        self._executor.shutdown(wait=True)
+        self._read_executor.shutdown(wait=True)
+        self._pool.close()
+
+    def _enqueue(self, states: List[WorkflowState]) -> None:
+        with self._pending_lock:
+            for state in states:
+                self._pending[state.id] = state
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self._executor.submit(self._flush)
+
+    def _flush(self) -> None:
+        with self._pending_lock:
+            states = list(self._pending.values())
+            self._pending.clear()
+            self._flush_scheduled = False
+        if not states:
+            return
+        try:
+            with self._pool.writer() as conn:
+                self.upsert(conn, states)
+        except Exception as e:
+            print(f"⚠️ Failed to persist {len(states)} workflow states: {e}")
+            return
+        self._flushes += 1
+
+    def upsert(self, conn: Any, states: List[WorkflowState]) -> None:
+        """Write states on the writer connection, inside the caller's transaction."""
+        rows = [
+            (state.id, state.status.value, state.stage.value, state.updated_at, self._encode(state))
+            for state in states
+        ]
+        conn.executemany("""
+            INSERT INTO workflow_states (id, status, stage, updated_at, state)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                status = excluded.status,
+                stage = excluded.stage,
+                updated_at = excluded.updated_at,
+                state = excluded.state
+        """, rows)
+        self._rows_written += len(rows)
+
+    def _read(self, workflow_id: str) -> Optional[bytes]:
+        with self._pool.reader() as conn:
+            row = conn.execute("SELECT state FROM workflow_states WHERE id = ?", (workflow_id,)).fetchone()
+        return row["state"] if row else None
+
+    def _read_active(self) -> List[WorkflowState]:
+        active = [WorkflowStatus.pending.value, WorkflowStatus.running.value]
+        with self._pool.reader() as conn:
+            rows = conn.execute(
+                "SELECT state FROM workflow_states WHERE status IN (?, ?)", active
+            ).fetchall()
+        return [self._decode(row["state"]) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self._pending_lock:
+            pending = len(self._pending)
+        stats.update({
+            "backend": "sqlite",
+            "db_path": str(self._pool.db_path),
+            "pending_writes": pending,
+            "rows_written": self._rows_written,
+            "flushes": self._flushes,
+            "disk_reads": self._disk_reads,
+        })
+        return stats
+
+
+class SharedSQLiteStateStore(SQLiteStateStore):
+    """
+    SQLiteStateStore shared by several processes: API workers and the engine worker
+    processes of the shared queue (see work_queue.py and worker.py).
+
+    Running workflows are updated by whichever process runs them, so only finished
+    workflows (which no longer change) are cached in memory. Every other read goes to
+    this process's own unflushed write or to disk, so any process answers status
+    reads with the latest progress.
+    """
+
+    def _remember(self, state: WorkflowState) -> None:
+        if state.status in TERMINAL_STATUSES:
+            super()._remember(state)
+
+    # Access for other tables in the workflow database (the shared queue's jobs)
+
+    def submit_write(self, fn: Callable[..., Any], *args: Any) -> "Future[Any]":
+        """
+        Run fn(conn, *args) on the writer thread with the writer connection, committed
+        when it returns. Ordered with this store's state writes: it sees every state
+        put() before the call, and is written before any put() after it.
+        """
+        return self._executor.submit(self._call_writer, fn, args)
+
+    async def run_write(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """submit_write() and wait for fn's result."""
+        return await asyncio.wrap_future(self.submit_write(fn, *args))
+
+    async def run_read(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(conn, *args) with a reader connection on the store's reader threads."""
+        return await asyncio.get_running_loop().run_in_executor(self._read_executor, self.read, fn, *args)
+
+    def read(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(conn, *args) with a reader connection on the calling thread."""
+        with self._pool.reader() as conn:
+            return fn(conn, *args)
+
+    def _call_writer(self, fn: Callable[..., Any], args: Any) -> Any:
+        with self._pool.writer() as conn:
+            return fn(conn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["backend"] = "shared"
+        return stats
+
+
+def create_state_store() -> StateStore:
+    """Build the store selected by WORKFLOW_STATE_STORE (memory | sqlite | shared)."""
+    backend = os.getenv("WORKFLOW_STATE_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteStateStore()
+    if backend == "shared":
+        return SharedSQLiteStateStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown WORKFLOW_STATE_STORE: {backend}")
+    return InMemoryStateStore()
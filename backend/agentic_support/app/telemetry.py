@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from .models import DeviceMetadata, SimulateTelemetryRequest, TelemetrySnapshot
+from .telemetry_columns import TelemetryColumns
+# A reading older than this is not "fresh"; agents fall back to the trigger payload snapshot
+TELEMETRY_MAX_AGE_SECONDS = float(os.getenv("TELEMETRY_MAX_AGE_SECONDS", "300"))
+# Optional sources started with the app: an NDJSON file to replay, and a TCP port accepting NDJSON lines
+TELEMETRY_REPLAY_FILE = os.getenv("TELEMETRY_REPLAY_FILE")
+TELEMETRY_TCP_PORT = int(os.getenv("TELEMETRY_TCP_PORT", "0"))
+
+# (received_at epoch seconds, snapshot)
+Reading = Tuple[float, TelemetrySnapshot]
+
+_EVENT_ADAPTER = TypeAdapter(SimulateTelemetryRequest)
+
+
+class TelemetryHub:
+    """
+    Device telemetry: the latest reading per device, plus the fleet's history
+    in a bounded columnar store (see telemetry_columns.py) for per-device
+    history and fleet queries.
+
+    Updates arrive as NDJSON lines of {"device_id": ..., "telemetry": {...}}
+    (the /simulate-telemetry payload) from the ingest endpoint, a replayed file
+    or a TCP socket, and are applied a chunk of lines at a time; a bad line is
+    reported and skipped without failing the rest of its chunk.
+
+    All methods run on the event loop; ingestion is plain dict/column work with
+    no awaits, so readers never see a half-applied update.
+    """
+
+    def __init__(self, max_age_seconds: float = TELEMETRY_MAX_AGE_SECONDS, columns: Optional[TelemetryColumns] = None) -> None:
+        self.max_age_seconds = max_age_seconds
+        self._latest: Dict[str, Reading] = {}
+        self.columns = columns or TelemetryColumns()
+        self._stats = {"ingested": 0, "rejected": 0, "lookups": 0, "fresh_hits": 0}
+        self._sources: List[asyncio.Task] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # Ingestion
+
+    def ingest(self, device_id: str, telemetry: TelemetrySnapshot, received_at: Optional[float] = None) -> None:
+        received_at = received_at or time.time()
+        self._latest[device_id] = (received_at, telemetry)
+        self.columns.append(device_id, telemetry, received_at)
+        self._stats["ingested"] += 1
+
+    def register_device(self, device: DeviceMetadata) -> None:
+        """Record the device's model and firmware version for fleet queries."""
+        self.columns.set_device(device.device_id, device.model, device.firmware_version)
+
+    def ingest_lines(self, lines: List[bytes], first_line: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Ingest NDJSON lines (blank lines are skipped).
+
+        Returns (accepted count, errors), each error being {"line": number, "errors": [...]}
+        with lines numbered from `first_line`.
+        """
+        received_at = time.time()
+        accepted = 0
+        errors: List[Dict[str, Any]] = []
+        for number, line in enumerate(lines, first_line):
+            if not line.strip():
+                continue
+            try:
+                event = _EVENT_ADAPTER.validate_json(line)
+            except ValidationError as e:
+                errors.append(
+                    {"line": number, "errors": [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]}
+                )
+                continue
+            if event.model is not None or event.firmware_version is not None:
+                self.columns.set_device(event.device_id, event.model, event.firmware_version)
+            self.ingest(event.device_id, event.telemetry, received_at)
+            accepted += 1
+        self._stats["rejected"] += len(errors)
+        return accepted, errors
+
+    async def ingest_stream(self, chunks: AsyncIterator[bytes], max_errors: int = 100) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Ingest an NDJSON byte stream as it arrives, one chunk of complete lines at a time.
+
+        Returns (accepted count, the first `max_errors` errors).
+        """
+        accepted, errors, line_number = 0, [], 0
+        tail = b""
+        async for data in chunks:
+            *lines, tail = (tail + data).split(b"\n")
+            if lines:
+                count, chunk_errors = self.ingest_lines(lines, line_number)
+                accepted += count
+                errors.extend(chunk_errors[: max_errors - len(errors)])
+                line_number += len(lines)
+        if tail.strip():
+            count, chunk_errors = self.ingest_lines([tail], line_number)
+            accepted += count
+            errors.extend(chunk_errors[: max_errors - len(errors)])
+        return accepted, errors
+
+    # Reads
+
+    def latest(self, device_id: str, max_age_seconds: Optional[float] = None) -> Optional[TelemetrySnapshot]:
+        """Newest reading for the device, or None if there is none younger than max_age_seconds."""
+        self._stats["lookups"] += 1
+        reading = self._latest.get(device_id)
+        if reading is None:
+            return None
+        received_at, telemetry = reading
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        if time.time() - received_at > max_age:
+            return None
+        self._stats["fresh_hits"] += 1
+        return telemetry
+
+    async def probe(self, device_id: str, fields: Sequence[str], since: float) -> Optional[Dict[str, Any]]:
+        """
+        Values of `fields` from the device's newest reading, if it arrived at or after `since`
+        (None until then). Raises KeyError for a device that has never reported.
+        """
+        received_at, telemetry = self._latest[device_id]
+        if received_at < since:
+            return None
+        return {name: getattr(telemetry, name) for name in fields}
+
+    def latest_reading(self, device_id: str) -> Optional[Reading]:
+        """(received_at, snapshot) of the device's newest reading, however old."""
+        return self._latest.get(device_id)
+
+    def history(self, device_id: str, limit: Optional[int] = None) -> List[Reading]:
+        """Retained readings for the device, oldest first (at most `limit` of the newest)."""
+        return self.columns.history(device_id, limit)
+
+    # Sources
+
+    async def replay_file(self, path: Path, chunk_lines: int = 1000, rate: Optional[float] = None) -> int:
+        """
+        Ingest an NDJSON file, `chunk_lines` lines at a time.
+
+        With `rate` (lines per second) the replay is paced; otherwise it runs as fast
+        as possible, yielding to the event loop between chunks. Returns lines accepted.
+        """
+        accepted, line_number = 0, 0
+        started = time.monotonic()
+        with open(path, "rb") as f:
+            while True:
+                chunk = [line for _, line in zip(range(chunk_lines), f)]
+                if not chunk:
+                    break
+                count, errors = self.ingest_lines(chunk, line_number)
+                accepted += count
+                line_number += len(chunk)
+                for error in errors[:5]:
+                    print(f"⚠️ Telemetry replay {path}: rejected line {error['line']}: {error['errors']}")
+                ahead = accepted / rate - (time.monotonic() - started) if rate else 0.0
+                await asyncio.sleep(max(0.0, ahead))
+        print(f"✅ Replayed {accepted} telemetry readings from {path}")
+        return accepted
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def chunks() -> AsyncIterator[bytes]:
+            while data := await reader.read(1 << 16):
+                yield data
+
+        try:
+            _, errors = await self.ingest_stream(chunks())
+            if errors:
+                print(f"⚠️ Telemetry TCP source: rejected lines, first: {errors[0]}")
+        finally:
+            writer.close()
+
+    async def start(self, replay_file: Optional[str] = TELEMETRY_REPLAY_FILE, tcp_port: int = TELEMETRY_TCP_PORT) -> None:
+        """Start the configured replay file and TCP sources, if any."""
+        if replay_file:
+            self._sources.append(asyncio.create_task(self.replay_file(Path(replay_file))))
+        if tcp_port and self._server is None:
+            self._server = await asyncio.start_server(self._handle_connection, "127.0.0.1", tcp_port)
+            print(f"✅ Telemetry TCP source listening on 127.0.0.1:{tcp_port}")
+
+    async def close(self) -> None:
+        for task in self._sources:
+            task.cancel()
+        self._sources.clear()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["devices"] = len(self._latest)
+        stats["max_age_seconds"] = self.max_age_seconds
+        stats["history"] = self.columns.stats()
+        return stats
+
+
+# Global instance
+telemetry_hub = TelemetryHub()
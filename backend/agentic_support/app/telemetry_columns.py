@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import math
+import os
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .models import TelemetrySnapshot
+
+# NumPy - optional; without it samples are kept in array.array columns and fleet queries are unavailable
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Samples kept across the fleet; past this the oldest quarter is dropped
+TELEMETRY_MAX_SAMPLES = int(os.getenv("TELEMETRY_MAX_SAMPLES", "5000000"))
+
+INK_COLORS = ("cyan", "magenta", "yellow", "black")
+GROUP_FIELDS = ("model", "firmware_version")
+# Tri-state booleans and missing ink levels are stored as -1
+_UNKNOWN = -1
+
+
+class _Column:
+    """Append-only typed column: a growable NumPy buffer, or an array.array without NumPy."""
+
+    def __init__(self, typecode: str) -> None:
+        self.size = 0
+        self.data = np.empty(1024, dtype=np.dtype(typecode)) if NUMPY_AVAILABLE else array(typecode)
+
+    def append(self, value: Any) -> None:
+        if NUMPY_AVAILABLE:
+            if self.size == len(self.data):
+                grown = np.empty(len(self.data) * 2, dtype=self.data.dtype)
+                grown[:self.size] = self.data
+                self.data = grown
+            self.data[self.size] = value
+        else:
+            self.data.append(value)
+        self.size += 1
+
+    def values(self) -> "np.ndarray":
+        return self.data[:self.size]
+
+    def drop_head(self, count: int) -> None:
+        if NUMPY_AVAILABLE:
+            self.data[:self.size - count] = self.data[count:self.size]
+        else:
+            del self.data[:count]
+        self.size -= count
+
+    def __getitem__(self, index: int) -> Any:
+        return self.data[index]
+
+    def __setitem__(self, index: int, value: Any) -> None:
+        self.data[index] = value
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.itemsize * len(self.data)
+
+
+class _Dictionary:
+    """Dictionary encoding of repeated strings to dense codes; code 0 means unknown."""
+
+    def __init__(self) -> None:
+        self.values: List[str] = ["unknown"]
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def get(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def _tristate(value: Optional[bool]) -> int:
+    return _UNKNOWN if value is None else int(value)
+
+
+class TelemetryColumns:
+    """
+    Fleet telemetry history in columnar form: one typed column per field, a few
+    dozen bytes per sample instead of a pydantic object per reading.
+
+    Per sample: device code, received_at, heartbeat time (NaN when absent),
+    online / spooler_healthy / network_reachable (-1, 0, 1) and the four ink
+    levels (-1 when absent). Error codes are dictionary-encoded and stored CSR
+    style: the codes of sample i are error_ids[error_offsets[i]:error_offsets[i + 1]].
+    Per device: model and firmware_version codes, first-seen time and its latest row.
+
+    Fleet queries run as NumPy expressions over whole columns and group devices
+    with np.bincount over the model / firmware_version codes.
+    """
+
+    def __init__(self, max_samples: int = TELEMETRY_MAX_SAMPLES) -> None:
+        self.max_samples = max_samples
+
+        self.device = _Column("I")
+        self.received_at = _Column("d")
+        self.heartbeat = _Column("d")
+        self.online = _Column("b")
+        self.spooler_healthy = _Column("b")
+        self.network_reachable = _Column("b")
+        self.ink = {color: _Column("b") for color in INK_COLORS}
+        # Offsets are absolute (they keep counting across compactions); subtract _errors_dropped
+        self.error_offsets = _Column("q")
+        self.error_offsets.append(0)
+        self.error_ids = _Column("I")
+
+        self.devices = _Dictionary()
+        self.models = _Dictionary()
+        self.firmware = _Dictionary()
+        self.error_codes = _Dictionary()
+        # Indexed by device code; entry 0 is the "unknown" device. Rows are absolute (minus _rows_dropped).
+        self.device_model = _Column("I")
+        self.device_firmware = _Column("I")
+        self.device_first_seen = _Column("d")
+        self.device_last_row = _Column("q")
+        self._add_device_slot()
+
+        self._rows_dropped = 0
+        self._errors_dropped = 0
+
+    def _add_device_slot(self) -> None:
+        self.device_model.append(0)
+        self.device_firmware.append(0)
+        # Set by the first sample; a device registered without samples is never "seen"
+        self.device_first_seen.append(math.inf)
+        self.device_last_row.append(-1)
+
+    def _device_code(self, device_id: str) -> int:
+        code = self.devices.encode(device_id)
+        if code == self.device_model.size:
+            self._add_device_slot()
+        return code
+
+    def set_device(self, device_id: str, model: Optional[str], firmware_version: Optional[str]) -> None:
+        """Record (or update) the device attributes fleet queries group by."""
+        code = self._device_code(device_id)
+        if model is not None:
+            self.device_model[code] = self.models.encode(model)
+        if firmware_version is not None:
+            self.device_firmware[code] = self.firmware.encode(firmware_version)
+
+    def append(self, device_id: str, telemetry: TelemetrySnapshot, received_at: float) -> None:
+        if self.device.size >= self.max_samples:
+            self._drop_oldest(max(1, self.max_samples // 4))
+
+        code = self._device_code(device_id)
+        if self.device_first_seen[code] > received_at:
+            self.device_first_seen[code] = received_at
+        self.device_last_row[code] = self._rows_dropped + self.device.size
+        self.device.append(code)
+        self.received_at.append(received_at)
+        heartbeat = telemetry.last_heartbeat_ts
+        self.heartbeat.append(heartbeat.timestamp() if heartbeat else math.nan)
+        self.online.append(_tristate(telemetry.online))
+        self.spooler_healthy.append(_tristate(telemetry.spooler_healthy))
+        self.network_reachable.append(_tristate(telemetry.network_reachable))
+        for color, column in self.ink.items():
+            level = getattr(telemetry, f"ink_level_{color}")
+            column.append(_UNKNOWN if level is None else min(max(level, 0), 100))
+        for error_code in telemetry.error_codes:
+            self.error_ids.append(self.error_codes.encode(error_code))
+        self.error_offsets.append(self._errors_dropped + self.error_ids.size)
+
+    def _drop_oldest(self, count: int) -> None:
+        errors = int(self.error_offsets[count] - self.error_offsets[0])
+        for column in (self.device, self.received_at, self.heartbeat, self.online,
+                       self.spooler_healthy, self.network_reachable, *self.ink.values()):
+            column.drop_head(count)
+        self.error_offsets.drop_head(count)
+        self.error_ids.drop_head(errors)
+        self._rows_dropped += count
+        self._errors_dropped += errors
+
+    def __len__(self) -> int:
+        return self.device.size
+
+    # Per-device reads
+
+    def _snapshot(self, row: int) -> Tuple[float, TelemetrySnapshot]:
+        def flag(column: _Column) -> Optional[bool]:
+            value = int(column[row])
+            return None if value == _UNKNOWN else bool(value)
+
+        heartbeat = float(self.heartbeat[row])
+        start = int(self.error_offsets[row]) - self._errors_dropped
+        end = int(self.error_offsets[row + 1]) - self._errors_dropped
+        fields: Dict[str, Any] = {
+            "online": flag(self.online),
+            "last_heartbeat_ts": None if math.isnan(heartbeat) else datetime.fromtimestamp(heartbeat),
+            "error_codes": [self.error_codes.values[int(self.error_ids[i])] for i in range(start, end)],
+            "spooler_healthy": flag(self.spooler_healthy),
+            "network_reachable": flag(self.network_reachable),
+        }
+        for color, column in self.ink.items():
+            level = int(column[row])
+            fields[f"ink_level_{color}"] = None if level == _UNKNOWN else level
+        return float(self.received_at[row]), TelemetrySnapshot(**fields)
+
+    def history(self, device_id: str, limit: Optional[int] = None) -> List[Tuple[float, TelemetrySnapshot]]:
+        """The device's retained samples, oldest first (at most `limit` of the newest)."""
+        code = self.devices.get(device_id)
+        if code is None:
+            return []
+        if NUMPY_AVAILABLE:
+            rows = np.flatnonzero(self.device.values() == code)
+            rows = rows[-limit:] if limit else rows
+        else:
+            rows = [row for row in range(self.device.size - 1, -1, -1) if self.device[row] == code][:limit][::-1]
+        return [self._snapshot(int(row)) for row in rows]
+
+    # Fleet queries
+
+    def _latest_rows(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """(device codes, latest row) of every device with a retained sample."""
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy is required for fleet telemetry queries")
+        rows = self.device_last_row.values() - self._rows_dropped
+        devices = np.flatnonzero(rows >= 0)
+        return devices, rows[devices]
+
+    def _grouped(self, devices: "np.ndarray", group_by: Optional[str], started: float) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"devices": int(len(devices)), "samples": len(self)}
+        if group_by is not None:
+            dictionary, column = self._group_column(group_by)
+            counts = np.bincount(column.values()[devices], minlength=len(dictionary))
+            order = np.argsort(-counts, kind="stable")
+            result["group_by"] = group_by
+            result["groups"] = {dictionary.values[i]: int(counts[i]) for i in order if counts[i]}
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    def _group_column(self, group_by: str) -> Tuple[_Dictionary, _Column]:
+        if group_by == "model":
+            return self.models, self.device_model
+        if group_by == "firmware_version":
+            return self.firmware, self.device_firmware
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_FIELDS)}")
+
+    def offline_devices(self, min_offline_seconds: float = 600, group_by: Optional[str] = None, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Devices whose latest sample reports offline and that have not reported
+        online in the last `min_offline_seconds` (nor been first seen within it).
+        """
+        started = time.perf_counter()
+        devices, rows = self._latest_rows()
+        cutoff = (now or time.time()) - min_offline_seconds
+
+        online = self.online.values()
+        recently_online = np.zeros(self.device_model.size, dtype=bool)
+        recently_online[self.device.values()[(online == 1) & (self.received_at.values() >= cutoff)]] = True
+        offline = (
+            (online[rows] == 0)
+            & ~recently_online[devices]
+            & (self.device_first_seen.values()[devices] <= cutoff)
+        )
+        return self._grouped(devices[offline], group_by, started)
+
+    def low_ink(self, threshold: int = 5, group_by: Optional[str] = None, colors: Tuple[str, ...] = INK_COLORS) -> Dict[str, Any]:
+        """Devices whose latest sample has any of `colors` known and below `threshold` percent."""
+        started = time.perf_counter()
+        devices, rows = self._latest_rows()
+        low = np.zeros(len(devices), dtype=bool)
+        for color in colors:
+            levels = self.ink[color].values()[rows]
+            low |= (levels >= 0) & (levels < threshold)
+        return self._grouped(devices[low], group_by, started)
+
+    def error_code_devices(self, since_seconds: float = 3600, group_by: Optional[str] = None, now: Optional[float] = None) -> Dict[str, Any]:
+        """Per error code, the number of distinct devices that reported it in the last `since_seconds`."""
+        started = time.perf_counter()
+        self._latest_rows()
+        cutoff = (now or time.time()) - since_seconds
+
+        offsets = self.error_offsets.values() - self._errors_dropped
+        row_of_error = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(offsets))
+        in_window = (self.received_at.values() >= cutoff)[row_of_error]
+        codes = self.error_ids.values()[in_window].astype(np.int64)
+        devices = self.device.values()[row_of_error[in_window]].astype(np.int64)
+        # Distinct (device, code) pairs, marked in a dense devices x codes bitmap
+        seen = np.zeros(self.device_model.size * len(self.error_codes), dtype=bool)
+        seen[devices * len(self.error_codes) + codes] = True
+        pairs = np.flatnonzero(seen)
+        devices, codes = pairs // len(self.error_codes), pairs % len(self.error_codes)
+
+        result: Dict[str, Any] = {"samples": len(self)}
+        if group_by is None:
+            counts = np.bincount(codes, minlength=len(self.error_codes))
+            result["error_codes"] = {self.error_codes.values[i]: int(counts[i]) for i in np.argsort(-counts, kind="stable") if counts[i]}
+        else:
+            dictionary, column = self._group_column(group_by)
+            groups = column.values()[devices].astype(np.int64)
+            counts = np.bincount(groups * len(self.error_codes) + codes, minlength=len(dictionary) * len(self.error_codes))
+            by_group: Dict[str, Dict[str, int]] = {}
+            for key in np.flatnonzero(counts):
+                group, code = divmod(int(key), len(self.error_codes))
+                by_group.setdefault(dictionary.values[group], {})[self.error_codes.values[code]] = int(counts[key])
+            result["group_by"] = group_by
+            result["groups"] = by_group
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        columns = [self.device, self.received_at, self.heartbeat, self.online, self.spooler_healthy,
+                   self.network_reachable, *self.ink.values(), self.error_offsets, self.error_ids]
+        used = sum(column.data.itemsize * column.size for column in columns)
+        return {
+            "backend": "numpy" if NUMPY_AVAILABLE else "array",
+            "samples": len(self),
+            "max_samples": self.max_samples,
+            "samples_dropped": self._rows_dropped,
+            "devices": len(self.devices) - 1,
+            "error_codes": len(self.error_codes) - 1,
+            "bytes_per_sample": round(used / len(self), 1) if len(self) else 0.0,
+            "allocated_bytes": sum(column.nbytes for column in columns),
+        }
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .checkpoints import Checkpoint
+from .models import WorkflowState, WorkflowTriggerRequest
+from .scheduler import SchedulerSaturated
+from .state_store import SharedSQLiteStateStore
+
+# Run workflows through the shared queue: API processes only admit workflows and serve
+# reads, while `python -m agentic_support.app.worker` processes run them
+WORKFLOW_SHARED_QUEUE = os.getenv("WORKFLOW_SHARED_QUEUE", "0").lower() in ("1", "true", "yes")
+# A claimed job goes back to the queue when its worker has not renewed the lease in time
+WORKFLOW_LEASE_SECONDS = float(os.getenv("WORKFLOW_LEASE_SECONDS", "30"))
+# How often an idle engine worker looks for new jobs (and for cancellation requests)
+WORKFLOW_QUEUE_POLL_SECONDS = float(os.getenv("WORKFLOW_QUEUE_POLL_SECONDS", "0.05"))
+# Unclaimed jobs beyond this are turned away (HTTP 429), like the in-process queue
+WORKFLOW_SHARED_QUEUE_SIZE = int(os.getenv("WORKFLOW_SHARED_QUEUE_SIZE", "10000"))
+
+
+@dataclass
+class Job:
+    """A claimed workflow: where it stands, and whether an earlier claim on it lapsed."""
+
+    checkpoint: Checkpoint
+    reclaimed: bool
+
+
+class WorkQueue:
+    """
+    Workflow job queue in the shared SQLite workflow database, for running the engine
+    across processes.
+
+    API processes put() jobs together with the workflow's initial state (one
+    transaction, so a worker never claims a job whose state is missing). Engine worker
+    processes claim() jobs earliest-deadline-first under a lease, renew() it while they
+    run, and pick up cancel() requests made by any process.
+
+    The queue is also the engine's checkpoint log in this mode: each completed stage
+    updates the job's state and next stage, and end() removes the job. A job whose
+    lease runs out (its worker died) is claimed again and resumes from its last
+    completed stage. All writes go through the state store's writer thread
+    (submit_write), so a job is only removed after the workflow's final state has
+    been written.
+    """
+
+    def __init__(
+        self,
+        store: SharedSQLiteStateStore,
+        lease_seconds: float = WORKFLOW_LEASE_SECONDS,
+        poll_seconds: float = WORKFLOW_QUEUE_POLL_SECONDS,
+        max_queued: int = WORKFLOW_SHARED_QUEUE_SIZE,
+    ) -> None:
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_queued = max_queued
+        store.submit_write(self._create_tables).result()
+
+        # Stage checkpoints waiting to be written, coalesced per workflow like state writes
+        self._progress: Dict[str, Tuple[str, Optional[str], str]] = {}
+        self._progress_lock = threading.Lock()
+        self._flush_scheduled = False
+        # Lease owners in this process, released on close
+        self._owners: Set[str] = set()
+        self._depth = 0
+        self._stats = {"enqueued": 0, "rejected": 0, "claimed": 0, "reclaimed": 0, "finished": 0, "cancelled": 0}
+
+    @staticmethod
+    def _create_tables(conn: Any) -> None:
+        # lease_expires is 0 while a job waits to be claimed
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS workflow_jobs (
+                id TEXT PRIMARY KEY,
+                priority REAL NOT NULL,
+                request TEXT NOT NULL,
+                state TEXT NOT NULL,
+                stage TEXT,
+                next_stage TEXT,
+                lease_owner TEXT,
+                lease_expires REAL NOT NULL DEFAULT 0,
+                claims INTEGER NOT NULL DEFAULT 0,
+                cancel_reason TEXT,
+                enqueued_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_workflow_jobs_priority ON workflow_jobs(priority)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_workflow_jobs_lease ON workflow_jobs(lease_expires)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_workflow_jobs_owner ON workflow_jobs(lease_owner)")
+
+    def _background(self, failure: str, fn: Callable[..., Any], *args: Any) -> None:
+        """A write nobody waits for: report it if it fails."""
+
+        def report(future: "Future[Any]") -> None:
+            if future.exception() is not None:
+                print(f"⚠️ Failed to {failure}: {future.exception()}")
+
+        self.store.submit_write(fn, *args).add_done_callback(report)
+
+    # Admission (API processes)
+
+    async def put_many(self, jobs: List[Tuple[WorkflowTriggerRequest, WorkflowState, float]]) -> int:
+        """
+        Queue (request, initial state, priority) jobs. Returns how many were accepted:
+        a prefix of `jobs`, cut short once max_queued jobs are waiting to be claimed.
+        """
+        accepted = await self.store.run_write(self._put_many, jobs)
+        self._stats["enqueued"] += accepted
+        self._stats["rejected"] += len(jobs) - accepted
+        return accepted
+
+    def _put_many(self, conn: Any, jobs: List[Tuple[WorkflowTriggerRequest, WorkflowState, float]]) -> int:
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        depth = conn.execute("SELECT COUNT(*) FROM workflow_jobs WHERE lease_expires = 0").fetchone()[0]
+        accepted = jobs[: max(0, self.max_queued - depth)]
+        conn.executemany(
+            "INSERT INTO workflow_jobs (id, priority, request, state, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                (state.id, priority, req.model_dump_json(), state.model_dump_json(warnings=False), now)
+                for req, state, priority in accepted
+            ],
+        )
+        self.store.upsert(conn, [state for _, state, _ in accepted])
+        self._depth = depth + len(accepted)
+        return len(accepted)
+
+    def saturated(self) -> SchedulerSaturated:
+        # An API process cannot see how fast the workers drain the queue; ask again in a second
+        return SchedulerSaturated(1, self._depth)
+
+    async def cancel(self, workflow_id: str, reason: str) -> Optional[str]:
+        """
+        Cancel a job from any process. An unclaimed job is removed ("queued"); a claimed
+        one is flagged for its worker to cancel ("leased"). None if it is not queued.
+        """
+        where = await self.store.run_write(self._cancel, workflow_id, reason)
+        if where:
+            self._stats["cancelled"] += 1
+        return where
+
+    @staticmethod
+    def _cancel(conn: Any, workflow_id: str, reason: str) -> Optional[str]:
+        if conn.execute("DELETE FROM workflow_jobs WHERE id = ? AND lease_expires = 0", (workflow_id,)).rowcount:
+            return "queued"
+        if conn.execute("UPDATE workflow_jobs SET cancel_reason = ? WHERE id = ?", (reason, workflow_id)).rowcount:
+            return "leased"
+        return None
+
+    # Claiming (engine worker processes)
+
+    async def claim(self, owner: str, limit: int) -> List[Job]:
+        """Lease up to `limit` unclaimed or lapsed jobs to owner, earliest deadline first."""
+        if limit <= 0 or not await self.store.run_read(self._claimable):
+            return []
+        self._owners.add(owner)
+        rows = await self.store.run_write(self._claim, owner, limit)
+        jobs = [
+            Job(
+                Checkpoint(
+                    WorkflowTriggerRequest.model_validate_json(row["request"]),
+                    WorkflowState.model_validate_json(row["state"]),
+                    row["stage"],
+                    row["next_stage"],
+                ),
+                reclaimed=row["claims"] > 0,
+            )
+            for row in rows
+        ]
+        self._stats["claimed"] += len(jobs)
+        self._stats["reclaimed"] += sum(job.reclaimed for job in jobs)
+        return jobs
+
+    @staticmethod
+    def _claimable(conn: Any) -> bool:
+        # Idle workers poll on a reader, so they only take the write lock when there is work
+        row = conn.execute("SELECT 1 FROM workflow_jobs WHERE lease_expires < ? LIMIT 1", (time.time(),)).fetchone()
+        return row is not None
+
+    def _claim(self, conn: Any, owner: str, limit: int) -> List[Any]:
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            """
+            SELECT id, request, state, stage, next_stage, claims FROM workflow_jobs
+            WHERE lease_expires < ? ORDER BY priority LIMIT ?
+            """,
+            (now, limit),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE workflow_jobs SET lease_owner = ?, lease_expires = ?, claims = claims + 1 WHERE id = ?",
+            [(owner, now + self.lease_seconds, row["id"]) for row in rows],
+        )
+        return rows
+
+    async def renew(self, owner: str) -> None:
+        """Extend the lease on every job owner holds."""
+        await self.store.run_write(self._renew, owner)
+
+    def _renew(self, conn: Any, owner: str) -> None:
+        conn.execute(
+            "UPDATE workflow_jobs SET lease_expires = ? WHERE lease_owner = ? AND lease_expires > 0",
+            (time.time() + self.lease_seconds, owner),
+        )
+
+    async def cancel_requests(self, owner: str) -> List[Tuple[str, str]]:
+        """(workflow_id, reason) of owner's jobs that some process asked to cancel."""
+        return await self.store.run_read(self._cancel_requests, owner)
+
+    @staticmethod
+    def _cancel_requests(conn: Any, owner: str) -> List[Tuple[str, str]]:
+        rows = conn.execute(
+            "SELECT id, cancel_reason FROM workflow_jobs WHERE lease_owner = ? AND cancel_reason IS NOT NULL",
+            (owner,),
+        ).fetchall()
+        return [(row["id"], row["cancel_reason"]) for row in rows]
+
+    # Checkpoint log interface (see checkpoints.py), used by the engine that runs the job
+
+    def stage(self, state: WorkflowState, stage: str, next_stage: Optional[str]) -> None:
+        payload = state.model_dump_json(warnings=False)
+        with self._progress_lock:
+            self._progress[state.id] = (stage, next_stage, payload)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self._background("checkpoint queued workflows", self._flush_progress)
+
+    def end(self, workflow_id: str) -> None:
+        with self._progress_lock:
+            self._progress.pop(workflow_id, None)
+        # Queued on the writer thread behind the workflow's final state write
+        self._background(f"remove finished workflow job {workflow_id}", self._finish, workflow_id)
+
+    def _flush_progress(self, conn: Any) -> None:
+        with self._progress_lock:
+            progress = list(self._progress.items())
+            self._progress.clear()
+            self._flush_scheduled = False
+        conn.executemany(
+            "UPDATE workflow_jobs SET state = ?, stage = ?, next_stage = ? WHERE id = ?",
+            [(payload, stage, next_stage, workflow_id) for workflow_id, (stage, next_stage, payload) in progress],
+        )
+
+    def _finish(self, conn: Any, workflow_id: str) -> None:
+        conn.execute("DELETE FROM workflow_jobs WHERE id = ?", (workflow_id,))
+        self._stats["finished"] += 1
+
+    @staticmethod
+    def _release(conn: Any, owners: List[str]) -> None:
+        conn.executemany(
+            "UPDATE workflow_jobs SET lease_owner = NULL, lease_expires = 0 WHERE lease_owner = ?",
+            [(owner,) for owner in owners],
+        )
+
+    def close(self) -> None:
+        """
+        Write outstanding checkpoints and hand this process's unfinished jobs straight
+        back to the queue, rather than leaving them until their leases run out. Must be
+        called before the store is closed, which waits for these writes.
+        """
+        self._background("checkpoint queued workflows", self._flush_progress)
+        if self._owners:
+            self._background("release workflow job leases", self._release, list(self._owners))
+            self._owners.clear()
+
+    @staticmethod
+    def _counts(conn: Any) -> Any:
+        return conn.execute("""
+            SELECT
+                COALESCE(SUM(lease_expires = 0), 0) AS queued,
+                COALESCE(SUM(lease_expires > 0), 0) AS leased,
+                COALESCE(SUM(cancel_reason IS NOT NULL), 0) AS cancelling
+            FROM workflow_jobs
+        """).fetchone()
+
+    def stats(self) -> Dict[str, Any]:
+        row = self.store.read(self._counts)
+        return {
+            "queued": row["queued"],
+            "leased": row["leased"],
+            "cancelling": row["cancelling"],
+            "max_queued": self.max_queued,
+            "lease_seconds": self.lease_seconds,
+            # Counters for this process only; the counts above cover every process
+            "process": dict(self._stats),
+        }
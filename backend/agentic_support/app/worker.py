@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+from typing import List, Optional
+
+
+async def _serve() -> None:
+    # Imported in the child process, where WORKFLOW_SHARED_QUEUE is already set, so the
+    # module-level engine is built on the shared queue
+    from ..db.database import db_pool
+    from ..utils.metrics_writer import metrics_writer
+    from .engine import engine
+    from .telemetry import telemetry_hub
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    await engine.start()
+    # Replay files only: a TCP telemetry port can be bound by one process, not every worker
+    await telemetry_hub.start(tcp_port=0)
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    consumer = asyncio.create_task(engine.serve_queue(owner), name="workflow-queue-consumer")
+    stopped = asyncio.create_task(stop.wait())
+    await asyncio.wait({consumer, stopped}, return_when=asyncio.FIRST_COMPLETED)
+    if consumer.done() and consumer.exception():
+        print(f"⚠️ Workflow queue consumer {owner} stopped: {consumer.exception()}")
+
+    consumer.cancel()
+    stopped.cancel()
+    await asyncio.gather(consumer, stopped, return_exceptions=True)
+    # Running workflows are cut off at their last checkpoint and handed back to the queue
+    await telemetry_hub.close()
+    await engine.close()
+    metrics_writer.close()
+    db_pool.close()
+
+
+def _run() -> None:
+    from ..db.schema import init_database
+
+    init_database()
+    asyncio.run(_serve())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run engine worker processes for the shared workflow queue.
+
+    API processes started with WORKFLOW_SHARED_QUEUE=1 only admit workflows and serve
+    status reads; these processes claim the workflows from the queue in the workflow
+    database and run them, so throughput scales across cores. Each process runs its own
+    scheduler (WORKFLOW_WORKERS concurrent workflows).
+
+    Usage (from backend/):
+        python -m agentic_support.app.worker [-n PROCESSES]
+    """
+    parser = argparse.ArgumentParser(description="Run engine worker processes for the shared workflow queue")
+    parser.add_argument("-n", "--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    os.environ["WORKFLOW_SHARED_QUEUE"] = "1"
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_run, name=f"workflow-engine-{i}") for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    print(f"✅ Started {len(processes)} workflow engine processes")
+
+    def terminate(*_: object) -> None:
+        for process in processes:
+            process.terminate()
+
+    signal.signal(signal.SIGTERM, terminate)
+    while True:
+        try:
+            for process in processes:
+                process.join()
+            break
+        except KeyboardInterrupt:
+            # Ctrl-C also reaches the workers; wait while they hand back their jobs
+            continue
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
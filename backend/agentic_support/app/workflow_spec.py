@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+WORKFLOW_SPEC_PATH = Path(os.getenv("WORKFLOW_SPEC_PATH", str(Path(__file__).parent / "workflows.json")))
+
+# Fallback rule key in a workflow's "actions" table
+DEFAULT_ACTION = "*"
+
+Condition = Callable[[Dict[str, Any]], bool]
+
+# A field absent from the diagnosis (its probe did not answer), as opposed to one answered with None
+_MISSING = object()
+
+
+def _compile_test(key: str, test: Any) -> Callable[[Any], bool]:
+    """One field test: a bare value means equality, otherwise {"<op>": operand}."""
+    if isinstance(test, dict) and set(test) == {"falsy"}:
+        # Like "empty", but only for a field that is present: None, False or empty as answered
+        operand = test["falsy"]
+        return lambda value: value is not _MISSING and (not value) == operand
+    check = _compile_value_test(key, test)
+    return lambda value: check(None if value is _MISSING else value)
+
+
+def _compile_value_test(key: str, test: Any) -> Callable[[Any], bool]:
+    if not isinstance(test, dict):
+        return lambda value: value == test
+    if len(test) != 1:
+        raise ValueError(f"Condition on {key!r} must have exactly one operator, got {sorted(test)}")
+    op, operand = next(iter(test.items()))
+    if op == "eq":
+        return lambda value: value == operand
+    if op == "ne":
+        return lambda value: value != operand
+    if op == "not_null":
+        return lambda value: (value is not None) == operand
+    if op == "empty":
+        return lambda value: (not value) == operand
+    if op == "any_prefix":
+        return lambda value: any(isinstance(v, str) and v.startswith(operand) for v in value or ())
+    if op == "any_eq":
+        return lambda value: any(v == operand for v in (value.values() if isinstance(value, dict) else value or ()))
+    raise ValueError(f"Unknown condition operator {op!r} on {key!r}")
+
+
+def compile_condition(spec: Dict[str, Any]) -> Condition:
+    """
+    Compile {"field": test, ...} into a predicate over a dict; every test must hold.
+    A missing field reads as None, so a probe that did not answer never matches `true`;
+    only {"falsy": true} tells a missing field apart from one answered with None.
+    """
+    tests: List[Tuple[str, Callable[[Any], bool]]] = [(key, _compile_test(key, test)) for key, test in spec.items()]
+    return lambda fields: all(test(fields.get(key, _MISSING)) for key, test in tests)
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    # Agent stages run `agent` and follow `transitions[outcome]` (None ends the workflow)
+    agent: Optional[str] = None
+    transitions: Dict[str, Optional[str]] = field(default_factory=dict)
+    # Retry stages go back to `retry` while attempts remain, else to `otherwise`
+    retry: Optional[str] = None
+    otherwise: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ActionSpec:
+    name: str
+    details: str
+
+
+@dataclass(frozen=True)
+class VerificationSpec:
+    # probe name -> telemetry fields it reads; probes run concurrently each poll
+    probes: Dict[str, Tuple[str, ...]]
+    checks: Dict[str, Condition]
+    passed: str
+    failed: str
+
+    def evaluate(self, fields: Dict[str, Any]) -> Dict[str, bool]:
+        return {name: check(fields) for name, check in self.checks.items()}
+
+
+@dataclass(frozen=True)
+class EscalationSpec:
+    queue: str
+    reason: str
+    # Root causes that skip the remaining attempts and go straight to a human
+    immediate_root_causes: FrozenSet[str] = frozenset()
+
+
+@dataclass(frozen=True)
+class WorkflowSpec:
+    """One workflow definition from the spec file, with its conditions compiled."""
+
+    name: str
+    summary: str
+    max_attempts: int
+    start: str
+    stages: Dict[str, Stage]
+    probes: Tuple[str, ...]
+    root_causes: Tuple[Tuple[Condition, str], ...]
+    actions: Dict[str, ActionSpec]
+    verification: VerificationSpec
+    escalation: EscalationSpec
+
+    def root_cause(self, diagnosis: Dict[str, Any]) -> str:
+        """The first rule whose condition holds for the diagnosis."""
+        for condition, root_cause in self.root_causes:
+            if condition(diagnosis):
+                return root_cause
+        return "undetermined"
+
+    def action_for(self, root_cause: Optional[str]) -> ActionSpec:
+        return self.actions.get(root_cause) or self.actions[DEFAULT_ACTION]
+
+    def can_retry(self, attempts: int, root_cause: Optional[str]) -> bool:
+        return attempts < self.max_attempts and root_cause not in self.escalation.immediate_root_causes
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict[str, Any]) -> "WorkflowSpec":
+        stages: Dict[str, Stage] = {}
+        for stage_name, stage in data["stages"].items():
+            if "retry" in stage:
+                stages[stage_name] = Stage(stage_name, retry=stage["retry"], otherwise=stage["otherwise"])
+            else:
+                transitions = stage["on"] if "on" in stage else {"done": stage["next"]}
+                stages[stage_name] = Stage(stage_name, agent=stage["agent"], transitions=dict(transitions))
+
+        targets = [data["start"]]
+        for stage in stages.values():
+            targets.extend(stage.transitions.values())
+            targets.extend([stage.retry, stage.otherwise] if stage.agent is None else [])
+        unknown = sorted({t for t in targets if t is not None and t not in stages})
+        if unknown:
+            raise ValueError(f"Workflow {name!r} transitions to unknown stages: {', '.join(unknown)}")
+
+        actions = {
+            root_cause: ActionSpec(action["action"], action["details"]) for root_cause, action in data["actions"].items()
+        }
+        if DEFAULT_ACTION not in actions:
+            raise ValueError(f"Workflow {name!r} has no default ({DEFAULT_ACTION!r}) action")
+
+        verification = data["verification"]
+        escalation = data["escalation"]
+        return cls(
+            name=name,
+            summary=data["summary"],
+            max_attempts=int(data.get("max_attempts", 1)),
+            start=data["start"],
+            stages=stages,
+            probes=tuple(data["probes"]),
+            root_causes=tuple((compile_condition(rule.get("if", {})), rule["then"]) for rule in data["root_causes"]),
+            actions=actions,
+            verification=VerificationSpec(
+                probes={probe: tuple(fields) for probe, fields in verification["probes"].items()},
+                checks={check: compile_condition(condition) for check, condition in verification["checks"].items()},
+                passed=verification["passed"],
+                failed=verification["failed"],
+            ),
+            escalation=EscalationSpec(
+                queue=escalation["queue"],
+                reason=escalation["reason"],
+                immediate_root_causes=frozenset(escalation.get("immediate_root_causes", [])),
+            ),
+        )
+
+
+def load_workflow_specs(path: Path = WORKFLOW_SPEC_PATH) -> Dict[str, WorkflowSpec]:
+    """
+    Parse and compile every workflow in the spec file. Raises ValueError (naming the
+    workflow) on a malformed definition, so a bad file stops the service at startup.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    specs = {}
+    for name, workflow in data["workflows"].items():
+        try:
+            specs[name] = WorkflowSpec.from_dict(name, workflow)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Workflow {name!r} in {path} is malformed: missing or invalid {e}") from e
+    return specs
+
+
+# Global instance
+workflow_specs = load_workflow_specs()
@@ -0,0 +1,141 @@
+"""
+Benchmark: /api/v1/metrics/insights latency against metrics table size
+Author: Vinod Kumar V (VKV)
+
+Compares the single-pass MetricsService.get_category_insights against the old
+per-category loop (one get_resolution_metrics + one unfiltered
+get_agent_aggregates per category) on a throwaway database.
+
+Usage (from backend/):
+    python -m agentic_support.benchmarks.insights_benchmark [rows ...]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+DEFAULT_SIZES = [10_000, 100_000, 500_000]
+CATEGORIES = [f"category_{i:02d}" for i in range(25)]
+AGENTS = ["intent_detection", "diagnostic", "action_execution", "verification", "escalation_decision"]
+DAYS = 30
+REPEATS = 5
+
+
+def _seed(conn, start_row: int, end_row: int, now: datetime) -> None:
+    from ..db.rollups import apply_rollups
+
+    rng = random.Random(start_row)
+    batch = []
+    for i in range(start_row, end_row):
+        latency = int(rng.lognormvariate(4, 1))
+        batch.append((
+            rng.choice(AGENTS), None, f"TKT-{i}", rng.choice(CATEGORIES),
+            None, None, None, None, None,
+            latency, 10, 10, 20, 0.00001, rng.random() > 0.1, None,
+            now - timedelta(seconds=rng.randrange(DAYS * 86400)),
+        ))
+        if len(batch) == 10_000:
+            _insert(conn, batch, apply_rollups)
+            batch = []
+    if batch:
+        _insert(conn, batch, apply_rollups)
+
+    resolution_types = ["auto-resolved", "escalated", "failed"]
+    conn.executemany(
+        """
+        INSERT OR IGNORE INTO ticket_resolution_metrics (
+            ticket_id, category_id, category_name, channel, resolution_type, mtr_seconds, created_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                f"TKT-{i}", rng.choice(CATEGORIES), "Category", rng.choice(["chat", "voice"]),
+                rng.choice(resolution_types), rng.randrange(30, 900),
+                now - timedelta(seconds=rng.randrange(DAYS * 86400)),
+            )
+            for i in range(start_row // 5, end_row // 5)
+        ],
+    )
+
+
+def _insert(conn, batch, apply_rollups) -> None:
+    from ..utils.metrics_writer import INSERT_AGENT_METRICS
+
+    conn.executemany(INSERT_AGENT_METRICS, batch)
+    apply_rollups(conn, batch)
+
+
+def _seed_categories(conn, now: datetime) -> None:
+    rows = []
+    for day in range(DAYS):
+        date = (now - timedelta(days=day)).strftime("%Y-%m-%d")
+        for category in CATEGORIES:
+            total = random.randrange(50, 500)
+            rows.append((category, category.replace("_", " ").title(), date, total, int(total * 0.8), 120, 1.5))
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO category_metrics (
+            category_id, category_name, date, total_tickets, successful_tickets,
+            avg_latency_ms, total_cost_usd
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+
+
+def _legacy_insights(service, from_date, to_date):
+    categories = service.get_category_metrics(None, from_date, to_date)
+    service.get_resolution_metrics(None, from_date, to_date)
+    insights = []
+    for cat in categories[:10]:
+        service.get_resolution_metrics(cat["category_id"], from_date, to_date)
+        service.get_agent_aggregates(None, from_date, to_date)
+        insights.append(cat["category_id"])
+    return insights
+
+
+def _time_ms(fn, *args) -> float:
+    fn(*args)  # warm up caches
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(*args)
+    return (time.perf_counter() - started) * 1000 / REPEATS
+
+
+def main(sizes) -> None:
+    from ..db.database import get_writer
+    from ..db.schema import init_database
+    from ..services.metrics_service import MetricsService
+
+    init_database()
+    now = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    with get_writer() as conn:
+        _seed_categories(conn, now)
+
+    windows = {
+        "all time": (None, None),
+        "last 7 days": ((now - timedelta(days=7)).strftime("%Y-%m-%d"), now.strftime("%Y-%m-%d")),
+    }
+
+    print(f"{'rows':>10}  {'window':<12}  {'legacy ms':>10}  {'single-pass ms':>15}")
+    seeded = 0
+    for size in sorted(sizes):
+        with get_writer() as conn:
+            _seed(conn, seeded, size, now)
+        seeded = size
+        for label, (from_date, to_date) in windows.items():
+            legacy = _time_ms(_legacy_insights, MetricsService, from_date, to_date)
+            single = _time_ms(MetricsService.get_category_insights, from_date, to_date)
+            print(f"{size:>10}  {label:<12}  {legacy:>10.2f}  {single:>15.2f}")
+
+
+if __name__ == "__main__":
+    requested = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before the db package is imported
+        os.environ["METRICS_DB_PATH"] = str(Path(tmp) / "insights_benchmark.db")
+        main(requested)
@@ -0,0 +1,111 @@
+"""
+Benchmark: complete workflows against the fake integration backends
+Author: Vinod Kumar V (VKV)
+
+Runs N concurrent printer_offline / ink_error workflows through WorkflowEngine
+with every backend call going to the fake servers (fake_servers.py) mounted
+in-process, at several backend error rates. Devices are simulated
+(device_simulator.py) and react to the remediation they receive, so most
+workflows complete and verification stays short. Reports workflow throughput,
+outcomes, how many backend calls failed after retries, and breaker state.
+
+Usage (from backend/):
+    python -m agentic_support.benchmarks.integration_load_benchmark [workflows] [error_rate ...]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DEFAULT_ERROR_RATES = [0.0, 0.05, 0.2]
+BACKENDS = {
+    "device_management": "DEVICE_MANAGEMENT_URL",
+    "crm": "CRM_URL",
+    "ccaas": "CCAAS_URL",
+}
+
+
+def _request(i: int):
+    from ..app.models import WorkflowTriggerRequest
+
+    offline = i % 2 == 0
+    return WorkflowTriggerRequest(
+        interaction={
+            "channel": "chat",
+            "text": "My printer is offline and not responding" if offline else "Ink cartridge error on my printer",
+        },
+        device={"device_id": f"dev-{i}", "model": "HP-1", "os": "win", "firmware_version": "1.0"},
+        telemetry={"online": False, "spooler_healthy": False, "network_reachable": True, "error_codes": []}
+        if offline
+        else {"online": True, "error_codes": ["INK_AUTH_01"], "ink_level_black": 40},
+        entitlement={"account_id": f"acct-{i}", "tier": "gold", "sla_minutes": 30},
+    )
+
+
+async def _run(count: int, error_rate: float):
+    from ..app.device_simulator import DeviceSimulator
+    from ..app.engine import WorkflowEngine
+    from ..app.state_store import TERMINAL_STATUSES, InMemoryStateStore
+    from ..integrations.backends import IntegrationClients
+    from ..integrations.fake_servers import create_fake_app
+    from ..integrations.http_client import IntegrationPool
+
+    pool = IntegrationPool()
+    for backend, env_var in BACKENDS.items():
+        url = f"http://{backend.replace('_', '-')}.bench"
+        pool.mount(url, create_fake_app(backend, error_rate=error_rate, seed=7))
+        os.environ[env_var] = url
+    integrations = IntegrationClients(pool)
+
+    simulator = DeviceSimulator(effect_delay=0.05, seed=7)
+    requests = [_request(i) for i in range(count)]
+    for req in requests:
+        simulator.add_device(req.device.device_id, req.telemetry)
+
+    engine = WorkflowEngine(store=InMemoryStateStore(), telemetry_client=simulator, integrations=integrations)
+    await engine.start()
+    started = time.perf_counter()
+    ids = [(await engine.trigger(req)).id for req in requests]
+    pending = set(ids)
+    outcomes = {}
+    while pending:
+        await asyncio.sleep(0.05)
+        for workflow_id in list(pending):
+            state = await engine.get_state(workflow_id)
+            if state.status in TERMINAL_STATUSES:
+                outcomes[state.status.value] = outcomes.get(state.status.value, 0) + 1
+                pending.discard(workflow_id)
+    elapsed = time.perf_counter() - started
+
+    stats = integrations.stats()
+    await engine.close()
+    return count / elapsed, outcomes, stats
+
+
+async def main(count: int, error_rates) -> None:
+    from ..db.schema import init_database
+
+    init_database()
+    for error_rate in error_rates:
+        throughput, outcomes, stats = await _run(count, error_rate)
+        print(f"error rate {error_rate:.0%}: {throughput:.0f} workflows/s  {outcomes}")
+        for backend in BACKENDS:
+            s = stats[backend]
+            print(
+                f"  {backend:<18} requests={s['requests']:<6} attempts={s['attempts']:<6} "
+                f"retries={s['retries']:<6} failed={s['failures']:<5} breaker={s['breaker']['state']} "
+                f"(opened {s['breaker']['opened']}x, rejected {s['breaker']['rejected']})"
+            )
+
+
+if __name__ == "__main__":
+    workflows = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rates = [float(arg) for arg in sys.argv[2:]] or DEFAULT_ERROR_RATES
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before the db package is imported
+        os.environ["METRICS_DB_PATH"] = str(Path(tmp) / "integration_benchmark_metrics.db")
+        os.environ["WORKFLOW_CHECKPOINT_PATH"] = str(Path(tmp) / "workflow_checkpoints.jsonl")
+        asyncio.run(main(workflows, rates))
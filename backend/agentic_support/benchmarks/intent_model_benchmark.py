@@ -0,0 +1,78 @@
+"""
+Benchmark: hashed n-gram intent model throughput and accuracy
+Author: Vinod Kumar V (VKV)
+
+Synthesizes labeled chat/voice transcripts from the shipped rule phrases plus
+filler words, trains IntentModel, and reports held-out accuracy and
+classifications per second at several batch sizes, next to the rule table.
+
+Usage (from backend/):
+    python -m agentic_support.benchmarks.intent_model_benchmark [training rows]
+"""
+
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+BATCH_SIZES = [1, 100, 10_000]
+FILLER = (
+    "hi hello yes so um my the it is was and but please help i need my home office printer today "
+    "again since yesterday after update tried restart still same problem thanks could you check it"
+).split()
+
+
+def _transcripts(count: int, seed: int):
+    rules_path = Path(__file__).parent.parent / "app" / "intent_rules.json"
+    with open(rules_path, "r", encoding="utf-8") as f:
+        rules = json.load(f)["rules"]
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for _ in range(count):
+        rule = rng.choice(rules)
+        phrases = [p if isinstance(p, str) else p["phrase"] for p in rule["phrases"]]
+        words = [rng.choice(FILLER) for _ in range(rng.randint(5, 40))]
+        for phrase in rng.sample(phrases, k=rng.randint(1, 2)):
+            words.insert(rng.randrange(len(words) + 1), phrase)
+        texts.append(" ".join(words))
+        labels.append(rule["intent"])
+    return texts, labels
+
+
+def _per_second(fn, texts, batch_size: int) -> float:
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    fn(batches[0])  # warm up
+    started = time.perf_counter()
+    for batch in batches:
+        fn(batch)
+    return len(texts) / (time.perf_counter() - started)
+
+
+def main(rows: int) -> None:
+    from ..app.intent_model import IntentModel, NUMPY_AVAILABLE
+    from ..app.intent_rules import intent_rules
+
+    if not NUMPY_AVAILABLE:
+        print("❌ numpy is required for this benchmark")
+        return
+
+    texts, labels = _transcripts(rows, seed=1)
+    started = time.perf_counter()
+    model = IntentModel.train(texts, labels)
+    print(f"Trained on {rows} rows in {time.perf_counter() - started:.1f}s")
+
+    test_texts, test_labels = _transcripts(10_000, seed=2)
+    predicted = model.predict(test_texts)
+    accuracy = sum(p == label for (p, _), label in zip(predicted, test_labels)) / len(test_labels)
+    print(f"Held-out accuracy: {accuracy:.3f}")
+
+    rules_rate = _per_second(lambda batch: [intent_rules.match(t) for t in batch], test_texts, 1)
+    print(f"{'batch':>7}  {'model/s':>10}  {'rules/s':>10}")
+    for batch_size in BATCH_SIZES:
+        rate = _per_second(model.predict, test_texts, batch_size)
+        print(f"{batch_size:>7}  {rate:>10.0f}  {rules_rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
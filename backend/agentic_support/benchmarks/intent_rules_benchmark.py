@@ -0,0 +1,94 @@
+"""
+Benchmark: intent matching cost against rule count and transcript length
+Author: Vinod Kumar V (VKV)
+
+Generates synthetic rule tables (1-3 word phrases spread over 20 intents) and
+long voice-style transcripts, then compares:
+  - substring chain: one `phrase in text` check per phrase (the previous approach)
+  - flat regex:      one alternation of every phrase
+  - trie regex:      IntentRuleSet, the prefix-factored combined pattern
+
+Usage (from backend/):
+    python -m agentic_support.benchmarks.intent_rules_benchmark [rules ...]
+"""
+
+import random
+import re
+import sys
+import time
+
+DEFAULT_RULE_COUNTS = [100, 1_000, 5_000]
+TRANSCRIPT_WORDS = [500, 5_000]
+INTENTS = [f"intent_{i:02d}" for i in range(20)]
+VOCABULARY_SIZE = 20_000
+REPEATS = 5
+
+
+def _vocabulary(rng: random.Random):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 9))))
+    return sorted(words)
+
+
+def _rules(rng: random.Random, vocabulary, count: int):
+    phrases = set()
+    while len(phrases) < count:
+        phrases.add(" ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3))))
+    phrases = sorted(phrases)
+    rules = []
+    for i, intent in enumerate(INTENTS):
+        rules.append({"intent": intent, "weight": 1.0 + i % 3, "phrases": phrases[i::len(INTENTS)]})
+    return rules
+
+
+def _substring_chain(rules):
+    table = [(phrase, rule["intent"], rule["weight"]) for rule in rules for phrase in rule["phrases"]]
+
+    def match(text):
+        text = text.lower()
+        scores = {}
+        for phrase, intent, weight in table:
+            if phrase in text:
+                scores[intent] = scores.get(intent, 0.0) + weight
+        return max(scores, key=scores.get) if scores else None
+
+    return match
+
+
+def _flat_regex(rules):
+    phrases = sorted({phrase for rule in rules for phrase in rule["phrases"]}, key=len, reverse=True)
+    pattern = re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, phrases)) + r")(?!\w)")
+    return lambda text: pattern.findall(" ".join(text.lower().split()))
+
+
+def _time_ms(fn, texts) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - started) * 1000 / (REPEATS * len(texts))
+
+
+def main(rule_counts) -> None:
+    from ..app.intent_rules import IntentRuleSet
+
+    rng = random.Random(42)
+    vocabulary = _vocabulary(rng)
+    print(f"{'rules':>7}  {'words':>6}  {'substring ms':>13}  {'flat regex ms':>14}  {'trie regex ms':>14}  {'compile ms':>11}")
+    for count in sorted(rule_counts):
+        rules = _rules(rng, vocabulary, count)
+        chain = _substring_chain(rules)
+        flat = _flat_regex(rules)
+        rule_set = IntentRuleSet(rules, INTENTS[0])
+        for words in TRANSCRIPT_WORDS:
+            texts = [" ".join(rng.choice(vocabulary) for _ in range(words)) for _ in range(5)]
+            print(
+                f"{count:>7}  {words:>6}  {_time_ms(chain, texts):>13.3f}  {_time_ms(flat, texts):>14.3f}  "
+                f"{_time_ms(rule_set.match, texts):>14.3f}  {rule_set.compile_ms:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_RULE_COUNTS)
@@ -0,0 +1,106 @@
+"""
+EXPLAIN QUERY PLAN regression check for the hot metrics queries
+Author: Vinod Kumar V (VKV)
+
+Runs every dashboard query through MetricsService with a bounded date range,
+captures the SQL actually executed, and fails if SQLite plans a full scan of a
+metrics table for any of them.
+
+Usage (from backend/):
+    python -m agentic_support.benchmarks.query_plans
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+METRICS_TABLES = (
+    "agent_metrics",
+    "category_metrics",
+    "ticket_resolution_metrics",
+    "agent_metrics_rollup_minute",
+    "agent_metrics_rollup_hour",
+    "agent_metrics_rollup_day",
+)
+
+# Ranges that hit the rollup path (day-aligned) and the raw path (second-aligned)
+RANGES = [
+    ("2024-01-01", "2024-02-01"),
+    ("2024-01-01T00:00:30", "2024-01-31T12:00:30"),
+]
+
+
+def hot_queries(service) -> List[Tuple[str, Callable[[str, str], object]]]:
+    """(label, call) pairs covering every metrics endpoint."""
+    return [
+        ("agent_metrics", lambda f, t: service.get_agent_metrics("diagnostic", f, t)),
+        ("agent_aggregates", lambda f, t: service.get_agent_aggregates(None, f, t)),
+        ("agent_aggregates[agent]", lambda f, t: service.get_agent_aggregates("diagnostic", f, t)),
+        ("agent_aggregates[category]", lambda f, t: service.get_agent_aggregates(None, f, t, category_id="ink_error")),
+        ("category_metrics", lambda f, t: service.get_category_metrics(None, f, t)),
+        ("category_insights", lambda f, t: service.get_category_insights(f, t)),
+        ("resolution_metrics", lambda f, t: service.get_resolution_metrics(None, f, t)),
+        ("resolution_metrics[category]", lambda f, t: service.get_resolution_metrics("ink_error", f, t)),
+        ("handoff_metrics", lambda f, t: service.get_handoff_metrics(f, t)),
+        ("channel_volumes", lambda f, t: service.get_channel_volumes(f, t)),
+        ("kpi_metrics", lambda f, t: service.get_kpi_metrics(f, t)),
+        ("collaboration_metrics", lambda f, t: service.get_collaboration_metrics(f, t)),
+        ("alerts", lambda f, t: service.get_alerts(f, t)),
+        ("update_category_metrics", lambda f, t: service.update_category_metrics("ink_error", "Ink Error", f[:10])),
+    ]
+
+
+def _is_full_scan(detail: str) -> bool:
+    # "SCAN t" or "SCAN t USING [COVERING] INDEX i" both visit every row; "SEARCH" is a range/lookup
+    if not detail.startswith("SCAN "):
+        return False
+    table = detail[len("SCAN "):].split(" ", 1)[0]
+    return table in METRICS_TABLES
+
+
+def find_full_scans() -> List[Tuple[str, str, str]]:
+    """Return (label, sql, plan detail) for every hot query that scans a whole metrics table."""
+    from ..db.database import db_pool, get_reader
+    from ..services.metrics_service import MetricsService
+
+    captured: List[Tuple[str, str]] = []
+    for from_date, to_date in RANGES:
+        for label, call in hot_queries(MetricsService):
+            statements: List[str] = []
+            with db_pool.trace(statements.append):
+                call(from_date, to_date)
+            captured.extend(
+                (label, sql) for sql in statements
+                if sql.lstrip().upper().startswith(("SELECT", "INSERT"))
+            )
+
+    failures = []
+    with get_reader() as conn:
+        for label, sql in captured:
+            for row in conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall():
+                if _is_full_scan(row["detail"]):
+                    failures.append((label, " ".join(sql.split()), row["detail"]))
+    return failures
+
+
+def main() -> int:
+    from ..db.schema import init_database
+
+    init_database()
+    failures = find_full_scans()
+    for label, sql, detail in failures:
+        print(f"❌ {label}: {detail}\n   {sql}")
+    if failures:
+        print(f"{len(failures)} hot quer{'y' if len(failures) == 1 else 'ies'} fell back to a full scan")
+        return 1
+    print("✅ All hot metrics queries use index searches")
+    return 0
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before the db package is imported
+        os.environ.setdefault("METRICS_DB_PATH", str(Path(tmp) / "query_plans.db"))
+        sys.exit(main())
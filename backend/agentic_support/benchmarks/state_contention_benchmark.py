@@ -0,0 +1,130 @@
+"""
+Benchmark: workflow state access under concurrent status polling
+Author: Vinod Kumar V (VKV)
+
+Drives N concurrent workflows through their stage transitions while pollers call
+get_state in a loop (what /get-workflow-status does), and compares the previous
+single asyncio.Lock around every store access with WorkflowEngine's striped
+writer locks and lock-free snapshot reads. Both state store backends are run;
+with SQLite, the hot layer only holds half of the finished workflows, so some
+polls read from disk, which used to happen while holding the global lock.
+
+Usage (from backend/):
+    python -m agentic_support.benchmarks.state_contention_benchmark [workflows ...]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_SIZES = [1_000, 10_000]
+POLLERS = 200
+AGENT_IO_SECONDS = 0.005
+STAGES = ["diagnosing", "acting", "verifying", "closing"]
+
+
+class _GlobalLockEngine:
+    """The previous WorkflowEngine state access: one lock around every read and write."""
+
+    def __init__(self, store) -> None:
+        self.store = store
+        self._lock = asyncio.Lock()
+
+    async def get_state(self, workflow_id):
+        async with self._lock:
+            return await self.store.get(workflow_id)
+
+    async def _persist(self, state) -> None:
+        async with self._lock:
+            await self.store.put(state)
+
+
+async def _workflow(engine, state, io_seconds: float = AGENT_IO_SECONDS) -> None:
+    from ..app.models import WorkflowStage, WorkflowStatus
+
+    state.status = WorkflowStatus.running
+    for stage in STAGES:
+        state.stage = WorkflowStage(stage)
+        state.logs.append({"timestamp": datetime.utcnow(), "level": "info", "message": stage, "data": {}})
+        await engine._persist(state)
+        # Agent I/O between transitions
+        await asyncio.sleep(io_seconds)
+    state.status = WorkflowStatus.completed
+    state.stage = WorkflowStage.completed
+    await engine._persist(state)
+
+
+async def _poller(engine, ids, done: asyncio.Event, latencies) -> None:
+    rng = random.Random(len(latencies))
+    while not done.is_set():
+        started = time.perf_counter()
+        await engine.get_state(rng.choice(ids))
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0)
+
+
+async def _run(engine, size: int):
+    from ..app.models import WorkflowState, WorkflowType
+
+    # Workflows finished earlier in the day, still being polled
+    history = [WorkflowState(id=f"old-{i}", workflow_type=WorkflowType.ink_error) for i in range(size)]
+    for state in history:
+        await _workflow(engine, state, io_seconds=0)
+
+    states = [WorkflowState(id=f"wf-{i}", workflow_type=WorkflowType.printer_offline) for i in range(size)]
+    for state in states:
+        await engine._persist(state)
+    ids = [s.id for s in history + states]
+
+    done = asyncio.Event()
+    latencies = []
+    pollers = [asyncio.create_task(_poller(engine, ids, done, latencies)) for _ in range(POLLERS)]
+    started = time.perf_counter()
+    await asyncio.gather(*(_workflow(engine, state) for state in states))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*pollers)
+
+    latencies.sort()
+    writes = size * (len(STAGES) + 1)
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+    return writes / elapsed, len(latencies) / elapsed, p99
+
+
+def _make_store(backend: str, size: int, tmp: str, run: int):
+    from ..app.state_store import InMemoryStateStore, SQLiteStateStore
+
+    if backend == "memory":
+        return InMemoryStateStore(max_finished=2 * size)
+    # Hot layer holds half of the finished workflows, so part of the polls go to disk
+    return SQLiteStateStore(db_path=Path(tmp) / f"state_{run}.db", max_finished=size // 2)
+
+
+async def main(sizes, tmp: str) -> None:
+    from ..app.engine import WorkflowEngine
+
+    print(f"{'workflows':>10}  {'store':<7}  {'engine':<12}  {'writes/s':>10}  {'reads/s':>10}  {'read p99 ms':>12}")
+    run = 0
+    for size in sorted(sizes):
+        for backend in ("memory", "sqlite"):
+            for label in ("global lock", "striped"):
+                run += 1
+                store = _make_store(backend, size, tmp, run)
+                engine = _GlobalLockEngine(store) if label == "global lock" else WorkflowEngine(store=store)
+                writes, reads, p99 = await _run(engine, size)
+                await store.close()
+                print(f"{size:>10}  {backend:<7}  {label:<12}  {writes:>10.0f}  {reads:>10.0f}  {p99:>12.3f}")
+
+
+if __name__ == "__main__":
+    requested = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before the db package is imported
+        os.environ["METRICS_DB_PATH"] = str(Path(tmp) / "state_benchmark_metrics.db")
+        os.environ["WORKFLOW_CHECKPOINT_PATH"] = str(Path(tmp) / "workflow_checkpoints.jsonl")
+        asyncio.run(main(requested, tmp))
@@ -0,0 +1,101 @@
+"""
+Benchmark: columnar telemetry history - memory per sample and fleet query latency
+Author: Vinod Kumar V (VKV)
+
+Fills TelemetryColumns with synthetic samples for a fleet spread over a few
+models and firmware versions, then reports bytes per sample (next to keeping a
+TelemetrySnapshot object per sample, measured with tracemalloc) and the latency
+of the fleet queries.
+
+Usage (from backend/):
+    python -m agentic_support.benchmarks.telemetry_fleet_benchmark [samples] [devices]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+MODELS = [f"HP-{i}" for i in range(12)]
+FIRMWARE = [f"{major}.{minor}" for major in range(3) for minor in range(5)]
+ERRORS = [[], [], [], [], ["INK_AUTH_01"], ["NET_02"], ["INK_AUTH_01", "SPOOL_03"]]
+REPEATS = 5
+
+
+def _snapshots(rng: random.Random, count: int):
+    from ..app.models import TelemetrySnapshot
+
+    return [
+        TelemetrySnapshot(
+            online=rng.random() > 0.2,
+            last_heartbeat_ts=datetime.fromtimestamp(1_760_000_000 + rng.randrange(86_400)),
+            error_codes=rng.choice(ERRORS),
+            ink_level_cyan=rng.randint(0, 100),
+            ink_level_magenta=rng.randint(0, 100),
+            ink_level_yellow=rng.randint(0, 100),
+            ink_level_black=rng.randint(0, 100),
+            spooler_healthy=rng.random() > 0.05,
+            network_reachable=rng.random() > 0.05,
+        )
+        for _ in range(count)
+    ]
+
+
+def _object_bytes(snapshots) -> float:
+    from ..app.models import TelemetrySnapshot
+
+    tracemalloc.start()
+    kept = [TelemetrySnapshot(**s.model_dump()) for s in snapshots]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(kept)
+
+
+def _time_ms(query) -> float:
+    query()  # warm up
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        query()
+    return (time.perf_counter() - started) * 1000 / REPEATS
+
+
+def main(samples: int, devices: int) -> None:
+    from ..app.telemetry_columns import NUMPY_AVAILABLE, TelemetryColumns
+
+    if not NUMPY_AVAILABLE:
+        print("❌ numpy is required for this benchmark")
+        return
+
+    rng = random.Random(11)
+    pool = _snapshots(rng, 1_000)
+    columns = TelemetryColumns(max_samples=samples)
+    device_ids = [f"dev-{i}" for i in range(devices)]
+    for device_id in device_ids:
+        columns.set_device(device_id, rng.choice(MODELS), rng.choice(FIRMWARE))
+
+    now = time.time()
+    started = time.perf_counter()
+    for i in range(samples):
+        # One simulated day of readings, in arrival order
+        columns.append(rng.choice(device_ids), rng.choice(pool), now - 86_400 + i * 86_400 / samples)
+    elapsed = time.perf_counter() - started
+    stats = columns.stats()
+    print(f"{samples} samples over {devices} devices, appended at {samples / elapsed:.0f}/s")
+    print(f"bytes/sample: columns {stats['bytes_per_sample']:.1f}, TelemetrySnapshot objects {_object_bytes(pool):.0f}")
+
+    queries = {
+        "offline > 10 min by firmware": lambda: columns.offline_devices(600, "firmware_version", now=now),
+        "ink < 5% by model": lambda: columns.low_ink(5, "model"),
+        "error codes last hour by model": lambda: columns.error_code_devices(3600, "model", now=now),
+        "error codes last day": lambda: columns.error_code_devices(86_400, now=now),
+    }
+    for name, query in queries.items():
+        print(f"{name:<32} {_time_ms(query):>8.2f} ms   devices={query().get('devices', '-')}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100_000,
+    )
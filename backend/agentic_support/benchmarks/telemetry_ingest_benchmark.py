@@ -0,0 +1,74 @@
+"""
+Benchmark: telemetry hub ingestion throughput
+Author: Vinod Kumar V (VKV)
+
+Generates NDJSON device updates for a simulated fleet and reports updates per
+second into TelemetryHub at several chunk sizes, and through the streaming path
+(64 KiB byte chunks split into lines), plus latest-value lookups per second.
+
+Usage (from backend/):
+    python -m agentic_support.benchmarks.telemetry_ingest_benchmark [updates] [devices]
+"""
+
+import asyncio
+import json
+import random
+import sys
+import time
+
+CHUNK_SIZES = [1, 100, 1_000, 10_000]
+
+
+def _lines(count: int, devices: int):
+    rng = random.Random(7)
+    lines = []
+    for _ in range(count):
+        telemetry = {
+            "online": rng.random() > 0.1,
+            "last_heartbeat_ts": "2026-01-01T00:00:00",
+            "error_codes": rng.choice([[], [], ["INK_AUTH_01"], ["NET_02"]]),
+            "ink_level_black": rng.randint(0, 100),
+            "spooler_healthy": rng.random() > 0.05,
+            "network_reachable": rng.random() > 0.05,
+        }
+        lines.append(json.dumps({"device_id": f"dev-{rng.randrange(devices)}", "telemetry": telemetry}).encode())
+    return lines
+
+
+def main(updates: int, devices: int) -> None:
+    from ..app.telemetry import TelemetryHub
+
+    lines = _lines(updates, devices)
+    print(f"{updates} updates over {devices} devices")
+    print(f"{'chunk':>7}  {'updates/s':>10}")
+
+    for chunk in CHUNK_SIZES:
+        hub = TelemetryHub()
+        started = time.perf_counter()
+        for i in range(0, updates, chunk):
+            hub.ingest_lines(lines[i:i + chunk])
+        print(f"{chunk:>7}  {updates / (time.perf_counter() - started):>10.0f}")
+
+    body = b"\n".join(lines) + b"\n"
+
+    async def chunks():
+        for i in range(0, len(body), 1 << 16):
+            yield body[i:i + (1 << 16)]
+
+    hub = TelemetryHub()
+    started = time.perf_counter()
+    asyncio.run(hub.ingest_stream(chunks()))
+    print(f"{'stream':>7}  {updates / (time.perf_counter() - started):>10.0f}")
+
+    device_ids = [f"dev-{i}" for i in range(devices)]
+    started = time.perf_counter()
+    for device_id in device_ids:
+        hub.latest(device_id)
+    print(f"latest(): {devices / (time.perf_counter() - started):.0f} lookups/s")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20_000,
+    )
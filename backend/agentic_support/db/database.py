@@ -3,24 +3,229 @@ Database connection management
 Author: Vinod Kumar V (VKV)
 """
 
+import os
+import queue
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Generator
-
-DB_PATH = Path(__file__).parent.parent / "metrics.db"
-
-
-@contextmanager
-def get_db() -> Generator[sqlite3.Connection, None, None]:
-    """Context manager for database connections."""
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+
+from ..utils.latency_sketch import register_sqlite_functions
+
+DB_PATH = Path(os.getenv("METRICS_DB_PATH", str(Path(__file__).parent.parent / "metrics.db")))
+
+
+class ConnectionPool:
+    """
+    Long-lived SQLite connections for the metrics database.
+
+    A single writer connection (serialized by a lock) handles every INSERT/UPDATE,
+    while a bounded pool of read-only connections serves dashboard queries. The
+    database runs in WAL mode so readers never block the writer and vice versa.
+    Connections stay open, so sqlite3's per-connection statement cache turns the
+    repeated metrics queries into prepared-statement reuse.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = DB_PATH,
+        max_readers: Optional[int] = None,
+        mmap_size: Optional[int] = None,
+        cache_size_kib: Optional[int] = None,
+        statement_cache_size: Optional[int] = None,
+        busy_timeout_ms: int = 5000,
+    ):
+        self.db_path = Path(db_path)
+        self.max_readers = max_readers or int(os.getenv("METRICS_DB_MAX_READERS", "8"))
+        self.mmap_size = mmap_size if mmap_size is not None else int(os.getenv("METRICS_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+        self.cache_size_kib = cache_size_kib or int(os.getenv("METRICS_DB_CACHE_KIB", "16384"))
+        self.statement_cache_size = statement_cache_size or int(os.getenv("METRICS_DB_STATEMENT_CACHE", "256"))
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._idle_readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        # Bumped by close(); readers borrowed under an older generation are closed when returned
+        self._generation = 0
+        self._trace_callback: Optional[Callable[[str], None]] = None
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "writer_checkouts": 0,
+            "writer_wait_ms": 0.0,
+            "reader_checkouts": 0,
+            "reader_waits": 0,
+            "reader_wait_ms": 0.0,
+            "readers_created": 0,
+        }
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        if read_only:
+            conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                cached_statements=self.statement_cache_size,
+            )
+        else:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.db_path),
+                check_same_thread=False,
+                cached_statements=self.statement_cache_size,
+            )
+            # WAL is persistent in the database file, so setting it once on the writer is enough
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        register_sqlite_functions(conn)
+        conn.set_trace_callback(self._trace_callback)
+        return conn
+
+    def _get_writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            self._writer = self._connect(read_only=False)
+        return self._writer
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    @contextmanager
+    def writer(self) -> Generator[sqlite3.Connection, None, None]:
+        """Exclusive access to the writer connection; commits on success."""
+        started = time.perf_counter()
+        with self._writer_lock:
+            self._count("writer_checkouts")
+            self._count("writer_wait_ms", (time.perf_counter() - started) * 1000)
+            conn = self._get_writer()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def reader(self) -> Generator[sqlite3.Connection, None, None]:
+        """Borrow a read-only connection, waiting if every reader is busy."""
+        conn, generation = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._release_reader(conn, generation)
+
+    def _acquire_reader(self) -> Tuple[sqlite3.Connection, int]:
+        self._count("reader_checkouts")
+        generation = self._generation
+        try:
+            return self._idle_readers.get_nowait(), generation
+        except queue.Empty:
+            pass
+
+        with self._readers_lock:
+            if len(self._readers) < self.max_readers:
+                # The writer creates the file and switches it to WAL before any read-only open
+                with self._writer_lock:
+                    self._get_writer()
+                conn = self._connect(read_only=True)
+                self._readers.append(conn)
+                self._count("readers_created")
+                return conn, self._generation
+
+        started = time.perf_counter()
+        self._count("reader_waits")
+        conn = self._idle_readers.get()
+        self._count("reader_wait_ms", (time.perf_counter() - started) * 1000)
+        return conn, generation
+
+    def _release_reader(self, conn: sqlite3.Connection, generation: int) -> None:
+        with self._readers_lock:
+            if generation == self._generation:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle_readers.put(conn)
+                return
+            # Borrowed before close(): close it rather than hand it out again
+            if conn in self._readers:
+                self._readers.remove(conn)
         conn.close()
+
+    @contextmanager
+    def trace(self, callback: Callable[[str], None]) -> Generator[None, None, None]:
+        """Report every SQL statement run on pooled connections to callback (diagnostics only)."""
+        self._set_trace_callback(callback)
+        try:
+            yield
+        finally:
+            self._set_trace_callback(None)
+
+    def _set_trace_callback(self, callback: Optional[Callable[[str], None]]) -> None:
+        self._trace_callback = callback
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.set_trace_callback(callback)
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.set_trace_callback(callback)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool usage counters for monitoring."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["writer_wait_ms"] = round(stats["writer_wait_ms"], 3)
+        stats["reader_wait_ms"] = round(stats["reader_wait_ms"], 3)
+        stats.update({
+            "db_path": str(self.db_path),
+            "max_readers": self.max_readers,
+            "open_readers": len(self._readers),
+            "idle_readers": self._idle_readers.qsize(),
+            "writer_open": self._writer is not None,
+        })
+        return stats
+
+    def close(self) -> None:
+        """
+        Close the pooled connections; the pool reopens lazily if used again. Readers
+        that are checked out stay open until they are returned, and are closed then.
+        """
+        with self._readers_lock:
+            self._generation += 1
+            while True:
+                try:
+                    conn = self._idle_readers.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+            self._readers.clear()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+# Global instance
+db_pool = ConnectionPool()
+
+
+def get_writer():
+    """Context manager for the shared writer connection."""
+    return db_pool.writer()
+
+
+def get_reader():
+    """Context manager for a pooled read-only connection."""
+    return db_pool.reader()
+
+
+def get_db():
+    """Context manager for database connections (alias for the writer)."""
+    return db_pool.writer()
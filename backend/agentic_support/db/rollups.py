@@ -0,0 +1,181 @@
+"""
+Time-bucketed rollup tables for agent metrics
+Author: Vinod Kumar V (VKV)
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..utils.latency_sketch import LatencySketch
+from .time_range import parse_bound
+
+# Granularities from coarsest to finest: (name, bucket format for strftime)
+ROLLUP_GRANULARITIES: List[Tuple[str, str]] = [
+    ("day", "%Y-%m-%d 00:00:00"),
+    ("hour", "%Y-%m-%d %H:00:00"),
+    ("minute", "%Y-%m-%d %H:%M:00"),
+]
+
+# Column positions in a utils.metrics_writer.INSERT_AGENT_METRICS row
+_ROW_AGENT_NAME = 0
+_ROW_CATEGORY_ID = 3
+_ROW_LATENCY_MS = 9
+_ROW_TOKENS_TOTAL = 12
+_ROW_COST_USD = 13
+_ROW_SUCCESS = 14
+_ROW_TIMESTAMP = 16
+
+
+def rollup_table(granularity: str) -> str:
+    """Name of the rollup table for a granularity."""
+    return f"agent_metrics_rollup_{granularity}"
+
+
+def create_rollup_tables(cursor) -> None:
+    """Create one rollup table per granularity (idempotent)."""
+    for granularity, _ in ROLLUP_GRANULARITIES:
+        table = rollup_table(granularity)
+        columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+        if columns and "latency_sketch" not in columns:
+            # Rollups predating latency sketches are rebuilt from agent_metrics by backfill_rollups
+            cursor.execute(f"DROP TABLE {table}")
+        # category_id is '' rather than NULL so it can take part in the primary key
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket_start DATETIME NOT NULL,
+                agent_name TEXT NOT NULL,
+                category_id TEXT NOT NULL DEFAULT '',
+                execution_count INTEGER NOT NULL DEFAULT 0,
+                success_count INTEGER NOT NULL DEFAULT 0,
+                latency_sum_ms INTEGER NOT NULL DEFAULT 0,
+                latency_min_ms INTEGER,
+                latency_max_ms INTEGER,
+                tokens_sum INTEGER NOT NULL DEFAULT 0,
+                cost_sum_usd REAL NOT NULL DEFAULT 0.0,
+                latency_sketch BLOB,
+                PRIMARY KEY (bucket_start, agent_name, category_id)
+            ) WITHOUT ROWID
+        """)
+
+
+def backfill_rollups(cursor) -> None:
+    """Populate empty rollup tables from existing agent_metrics rows."""
+    for granularity, bucket_format in ROLLUP_GRANULARITIES:
+        table = rollup_table(granularity)
+        if cursor.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+            continue
+        cursor.execute(f"""
+            INSERT INTO {table} (
+                bucket_start, agent_name, category_id, execution_count, success_count,
+                latency_sum_ms, latency_min_ms, latency_max_ms, tokens_sum, cost_sum_usd,
+                latency_sketch
+            )
+            SELECT
+                strftime('{bucket_format}', timestamp),
+                agent_name,
+                COALESCE(category_id, ''),
+                COUNT(*),
+                SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END),
+                COALESCE(SUM(latency_ms), 0),
+                MIN(latency_ms),
+                MAX(latency_ms),
+                COALESCE(SUM(tokens_total), 0),
+                COALESCE(SUM(cost_usd), 0.0),
+                sketch_build(latency_ms)
+            FROM agent_metrics
+            WHERE timestamp IS NOT NULL
+            GROUP BY 1, 2, 3
+        """)
+
+
+def apply_rollups(conn, rows: Sequence[Sequence[Any]]) -> None:
+    """
+    Fold a batch of freshly inserted agent_metrics rows into every rollup table.
+
+    Rows are pre-aggregated in memory so each bucket gets a single UPSERT per batch;
+    latency sketches are merged into the stored one with the sketch_merge() SQL function.
+    Must run inside the same transaction as the raw INSERT.
+    """
+    for granularity, bucket_format in ROLLUP_GRANULARITIES:
+        buckets: Dict[Tuple[str, str, str], List[Any]] = {}
+        for row in rows:
+            timestamp = row[_ROW_TIMESTAMP]
+            key = (
+                timestamp.strftime(bucket_format),
+                row[_ROW_AGENT_NAME],
+                row[_ROW_CATEGORY_ID] or "",
+            )
+            latency = row[_ROW_LATENCY_MS]
+            agg = buckets.get(key)
+            if agg is None:
+                agg = buckets[key] = [0, 0, 0, None, None, 0, 0.0, LatencySketch()]
+            agg[0] += 1
+            agg[1] += 1 if row[_ROW_SUCCESS] else 0
+            if latency is not None:
+                agg[2] += latency
+                agg[3] = latency if agg[3] is None else min(agg[3], latency)
+                agg[4] = latency if agg[4] is None else max(agg[4], latency)
+            agg[5] += row[_ROW_TOKENS_TOTAL] or 0
+            agg[6] += row[_ROW_COST_USD] or 0.0
+            agg[7].add(latency)
+
+        conn.executemany(f"""
+            INSERT INTO {rollup_table(granularity)} (
+                bucket_start, agent_name, category_id, execution_count, success_count,
+                latency_sum_ms, latency_min_ms, latency_max_ms, tokens_sum, cost_sum_usd,
+                latency_sketch
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(bucket_start, agent_name, category_id) DO UPDATE SET
+                execution_count = execution_count + excluded.execution_count,
+                success_count = success_count + excluded.success_count,
+                latency_sum_ms = latency_sum_ms + excluded.latency_sum_ms,
+                latency_min_ms = MIN(COALESCE(latency_min_ms, excluded.latency_min_ms), COALESCE(excluded.latency_min_ms, latency_min_ms)),
+                latency_max_ms = MAX(COALESCE(latency_max_ms, excluded.latency_max_ms), COALESCE(excluded.latency_max_ms, latency_max_ms)),
+                tokens_sum = tokens_sum + excluded.tokens_sum,
+                cost_sum_usd = cost_sum_usd + excluded.cost_sum_usd,
+                latency_sketch = sketch_merge(latency_sketch, excluded.latency_sketch)
+        """, [key + tuple(agg[:7]) + (agg[7].to_bytes() if agg[7].count else None,) for key, agg in buckets.items()])
+
+
+def choose_rollup(
+    from_date: Optional[str],
+    to_date: Optional[str],
+) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Pick the coarsest rollup whose buckets line up with both ends of the range.
+
+    Returns (table, from_bucket, to_bucket) where rows satisfy
+    from_bucket <= bucket_start < to_bucket, or None when the bounds are not
+    minute-aligned (or unparseable) and the raw table has to be scanned.
+    """
+    try:
+        bounds = [parse_bound(from_date), parse_bound(to_date)]
+    except ValueError:
+        return None
+
+    for granularity, bucket_format in ROLLUP_GRANULARITIES:
+        formatted: List[Optional[str]] = []
+        for bound in bounds:
+            if bound is None:
+                formatted.append(None)
+                continue
+            bucket = bound.strftime(bucket_format)
+            if bucket != bound.strftime("%Y-%m-%d %H:%M:%S") or bound.microsecond:
+                break
+            formatted.append(bucket)
+        else:
+            return rollup_table(granularity), formatted[0], formatted[1]
+    return None
+
+
+def bucket_range_clause(from_bucket: Optional[str], to_bucket: Optional[str]) -> Tuple[str, List[str]]:
+    """SQL fragment and params restricting bucket_start to [from_bucket, to_bucket)."""
+    clause = ""
+    params: List[str] = []
+    if from_bucket:
+        clause += " AND bucket_start >= ?"
+        params.append(from_bucket)
+    if to_bucket:
+        clause += " AND bucket_start < ?"
+        params.append(to_bucket)
+    return clause, params
+
@@ -3,27 +3,48 @@ Database schema for AI Watchtower metrics tracking
 Author: Vinod Kumar V (VKV)
 """
 
-import sqlite3
-from datetime import datetime
-from pathlib import Path
-from typing import Optional
+from .database import DB_PATH, get_writer
+from .rollups import backfill_rollups, create_rollup_tables
 
-# Database file path
-DB_PATH = Path(__file__).parent.parent / "metrics.db"
+# Versioned migrations, applied in order. PRAGMA user_version records the last one applied.
+MIGRATIONS = [
+    (1, [
+        # Composite covering indexes: every hot query filters on a half-open range over
+        # the leading time column (optionally after an equality column) and reads the rest
+        # straight from the index.
+        "CREATE INDEX IF NOT EXISTS idx_agent_metrics_agent_time_cover ON agent_metrics(agent_name, timestamp, success, latency_ms, cost_usd, tokens_total)",
+        "CREATE INDEX IF NOT EXISTS idx_agent_metrics_time_cover ON agent_metrics(timestamp, agent_name, success, latency_ms, cost_usd, tokens_total)",
+        "CREATE INDEX IF NOT EXISTS idx_agent_metrics_category_time_cover ON agent_metrics(category_id, timestamp, latency_ms, tokens_total, cost_usd)",
+        "CREATE INDEX IF NOT EXISTS idx_resolution_metrics_created_cover ON ticket_resolution_metrics(created_at, resolution_type, channel, mtr_seconds, handoff_type, category_name)",
+        "CREATE INDEX IF NOT EXISTS idx_resolution_metrics_category_created_cover ON ticket_resolution_metrics(category_id, created_at, resolution_type, mtr_seconds)",
+        "CREATE INDEX IF NOT EXISTS idx_resolution_metrics_handoff_cover ON ticket_resolution_metrics(handoff_timestamp, handoff_type)",
+        # Superseded by the covering indexes above (same leading column)
+        "DROP INDEX IF EXISTS idx_agent_metrics_agent_name",
+        "DROP INDEX IF EXISTS idx_agent_metrics_timestamp",
+        "DROP INDEX IF EXISTS idx_resolution_metrics_category_id",
+        "ANALYZE",
+    ]),
+]
 
 
 def get_db_connection():
-    """Get SQLite database connection."""
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get the pooled writer connection (use as a context manager)."""
+    return get_writer()
 
 
 def init_database():
     """Initialize database with all required tables."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with get_writer() as conn:
+        cursor = conn.cursor()
+        _create_tables(cursor)
+        create_rollup_tables(cursor)
+        backfill_rollups(cursor)
+        _apply_migrations(cursor)
+    print(f"✅ Database initialized at {DB_PATH}")
+
 
+def _create_tables(cursor):
+    """Create tables and indexes (idempotent)."""
     # Agent metrics table - individual agent execution records
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS agent_metrics (
@@ -85,8 +106,6 @@ def init_database():
     """)
 
     # Create indexes for performance
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_agent_metrics_agent_name ON agent_metrics(agent_name)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_agent_metrics_timestamp ON agent_metrics(timestamp)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_agent_metrics_ticket_id ON agent_metrics(ticket_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_agent_metrics_trace_id ON agent_metrics(trace_id)")
     
@@ -94,12 +113,19 @@ def init_database():
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_category_metrics_date ON category_metrics(date)")
     
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_resolution_metrics_ticket_id ON ticket_resolution_metrics(ticket_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resolution_metrics_category_id ON ticket_resolution_metrics(category_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_resolution_metrics_resolution_type ON ticket_resolution_metrics(resolution_type)")
 
-    conn.commit()
-    conn.close()
-    print(f"✅ Database initialized at {DB_PATH}")
+
+def _apply_migrations(cursor):
+    """Run migrations newer than the database's user_version."""
+    current = cursor.execute("PRAGMA user_version").fetchone()[0]
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute(f"PRAGMA user_version = {int(version)}")
+        print(f"✅ Applied metrics schema migration {version}")
 
 
 if __name__ == "__main__":
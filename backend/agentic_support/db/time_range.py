@@ -0,0 +1,100 @@
+"""
+Half-open time range helpers for metrics queries
+Author: Vinod Kumar V (VKV)
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional, Tuple
+
+
+def parse_bound(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO date/datetime query parameter into a naive UTC datetime."""
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def format_timestamp(value: datetime) -> str:
+    """Format a datetime the way sqlite3 stores DATETIME columns, so text comparison is ordered."""
+    return value.isoformat(sep=" ")
+
+
+def _normalize(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    try:
+        return format_timestamp(parse_bound(value))
+    except ValueError:
+        # Leave unparseable input untouched (previous behaviour)
+        return value
+
+
+def range_clause(column: str, from_date: Optional[str], to_date: Optional[str]) -> Tuple[str, List[Any]]:
+    """
+    SQL fragment and params for from_date <= column < to_date on a DATETIME column.
+
+    The bare column comparison keeps the predicate sargable, so an index on
+    `column` (or one that leads with it) can serve the range.
+    """
+    clause = ""
+    params: List[Any] = []
+    if from_date:
+        clause += f" AND {column} >= ?"
+        params.append(_normalize(from_date))
+    if to_date:
+        clause += f" AND {column} < ?"
+        params.append(_normalize(to_date))
+    return clause, params
+
+
+def _is_bare_date(value: str) -> bool:
+    return len(value.strip()) == len("YYYY-MM-DD")
+
+
+def date_range_end(to_date: Optional[str]) -> Optional[datetime]:
+    """
+    Exclusive end (midnight) of the days date_range_clause includes for to_date.
+
+    A bare-date to_date includes that day, as these columns always did
+    (date <= to_date). A datetime bound includes the day it falls in if the range
+    covers any of it, so only an exact-midnight to_date excludes its day.
+    Raises ValueError if to_date does not parse.
+    """
+    end = parse_bound(to_date)
+    if end is None:
+        return None
+    if _is_bare_date(to_date) or end.time() != datetime.min.time():
+        end = end + timedelta(days=1)
+    return datetime.combine(end.date(), datetime.min.time())
+
+
+def date_range_clause(column: str, from_date: Optional[str], to_date: Optional[str]) -> Tuple[str, List[Any]]:
+    """Like range_clause, for DATE columns ('YYYY-MM-DD'); see date_range_end for the end day."""
+    clause = ""
+    params: List[Any] = []
+    try:
+        start, end = parse_bound(from_date), date_range_end(to_date)
+    except ValueError:
+        start = end = None
+    if from_date:
+        clause += f" AND {column} >= ?"
+        params.append(start.date().isoformat() if start else from_date)
+    if to_date:
+        if end is None:
+            # Unparseable: compare the raw value as before
+            clause += f" AND {column} <= ?"
+            params.append(to_date)
+        else:
+            clause += f" AND {column} < ?"
+            params.append(end.date().isoformat())
+    return clause, params
+
+
+def day_bounds(date: str) -> Tuple[str, str]:
+    """[start, end) timestamps for one calendar day given as 'YYYY-MM-DD'."""
+    start = datetime.fromisoformat(date)
+    start = datetime.combine(start.date(), datetime.min.time())
+    return format_timestamp(start), format_timestamp(start + timedelta(days=1))
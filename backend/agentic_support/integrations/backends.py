@@ -0,0 +1,97 @@
+"""
+Async clients for the device management, CRM and CCaaS backends
+Author: Vinod Kumar V (VKV)
+
+Each backend is reached at the URL in its environment variable. When the
+variable is unset the backend's fake server (fake_servers.py) is mounted
+in-process on the shared pool, so workflows run end to end offline.
+
+    DEVICE_MANAGEMENT_URL   remediation commands sent to printers
+    CRM_URL                 subscriptions, replacement shipments, tickets
+    CCAAS_URL               routing escalated interactions to agent queues
+
+Usage:
+    from agentic_support.integrations.backends import integration_clients
+    await integration_clients.device.run_action("dev-1", "restart_spooler", idempotency_key="wf-1:restart_spooler:1")
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from .fake_servers import create_fake_app
+from .http_client import IntegrationClient, IntegrationPool, integration_pool
+
+
+class DeviceManagementClient(IntegrationClient):
+    backend = "device_management"
+
+    async def run_action(self, device_id: str, action: str, idempotency_key: str) -> Dict[str, Any]:
+        return await self.request(
+            "POST", f"/devices/{device_id}/actions", json={"action": action}, idempotency_key=idempotency_key
+        )
+
+    async def get_status(self, device_id: str) -> Dict[str, Any]:
+        return await self.request("GET", f"/devices/{device_id}/status")
+
+
+class CRMClient(IntegrationClient):
+    backend = "crm"
+
+    async def sync_subscription(self, account_id: str, idempotency_key: str) -> Dict[str, Any]:
+        return await self.request("POST", f"/accounts/{account_id}/subscription:sync", idempotency_key=idempotency_key)
+
+    async def create_shipment(self, account_id: str, device_id: str, item: str, idempotency_key: str) -> Dict[str, Any]:
+        return await self.request(
+            "POST",
+            "/shipments",
+            json={"account_id": account_id, "device_id": device_id, "item": item},
+            idempotency_key=idempotency_key,
+        )
+
+    async def create_ticket(self, ticket: Dict[str, Any], idempotency_key: str) -> Dict[str, Any]:
+        return await self.request("POST", "/tickets", json=ticket, idempotency_key=idempotency_key)
+
+
+class CCaaSClient(IntegrationClient):
+    backend = "ccaas"
+
+    async def route_to_queue(self, workflow_id: str, queue: str, summary: Dict[str, Any], idempotency_key: str) -> Dict[str, Any]:
+        return await self.request(
+            "POST",
+            "/interactions/route",
+            json={"workflow_id": workflow_id, "queue": queue, "summary": summary},
+            idempotency_key=idempotency_key,
+        )
+
+
+class IntegrationClients:
+    """The backend clients used by the agents, on one shared connection pool."""
+
+    def __init__(self, pool: Optional[IntegrationPool] = None) -> None:
+        self.pool = pool or integration_pool
+        self.device = DeviceManagementClient(self._base_url("DEVICE_MANAGEMENT_URL", "device_management"), self.pool)
+        self.crm = CRMClient(self._base_url("CRM_URL", "crm"), self.pool)
+        self.ccaas = CCaaSClient(self._base_url("CCAAS_URL", "ccaas"), self.pool)
+
+    def _base_url(self, env_var: str, backend: str) -> str:
+        url = os.getenv(env_var)
+        if url:
+            return url
+        url = f"http://{backend.replace('_', '-')}.fake"
+        self.pool.mount(url, create_fake_app(backend))
+        return url
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pool": self.pool.stats(),
+            "device_management": self.device.stats(),
+            "crm": self.crm.stats(),
+            "ccaas": self.ccaas.stats(),
+        }
+
+
+# Global instance
+integration_clients = IntegrationClients()
@@ -0,0 +1,129 @@
+"""
+Local fake servers for the integration backends (device management, CRM, CCaaS)
+Author: Vinod Kumar V (VKV)
+
+Small FastAPI apps that stand in for the real backends so complete workflows can
+run - and be load-tested - offline. They answer after a random latency, fail a
+configurable share of requests with 503, and honour Idempotency-Key on writes
+(a repeated key returns the first response).
+
+By default the service mounts them in-process (see backends.py); they can also
+be served over HTTP to exercise real connection pooling.
+
+Usage (from backend/):
+    # in-process, as the service does when no backend URL is configured
+    from agentic_support.integrations.fake_servers import create_fake_app
+    app = create_fake_app("crm", latency_ms=(5, 20), error_rate=0.05)
+
+    # over HTTP (requires uvicorn)
+    python -m agentic_support.integrations.fake_servers crm --port 9102
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+FAKE_LATENCY_MS = (
+    float(os.getenv("INTEGRATION_FAKE_LATENCY_MIN_MS", "5")),
+    float(os.getenv("INTEGRATION_FAKE_LATENCY_MAX_MS", "25")),
+)
+FAKE_ERROR_RATE = float(os.getenv("INTEGRATION_FAKE_ERROR_RATE", "0"))
+
+BACKENDS = ("device_management", "crm", "ccaas")
+
+
+def create_fake_app(
+    backend: str,
+    latency_ms: Tuple[float, float] = FAKE_LATENCY_MS,
+    error_rate: float = FAKE_ERROR_RATE,
+    seed: Optional[int] = None,
+) -> FastAPI:
+    """A fake server for one of BACKENDS."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+
+    app = FastAPI(title=f"Fake {backend} backend")
+    rng = random.Random(seed)
+    # Idempotency-Key -> first response
+    responses: Dict[str, Dict[str, Any]] = {}
+    app.state.stats = {"requests": 0, "errors": 0, "replayed": 0}
+
+    @app.middleware("http")
+    async def latency_and_errors(request: Request, call_next):
+        app.state.stats["requests"] += 1
+        await asyncio.sleep(rng.uniform(*latency_ms) / 1000)
+        if rng.random() < error_rate:
+            app.state.stats["errors"] += 1
+            return JSONResponse({"detail": "Simulated backend error"}, status_code=503)
+        return await call_next(request)
+
+    def once(key: Optional[str], build) -> Dict[str, Any]:
+        if key and key in responses:
+            app.state.stats["replayed"] += 1
+            return responses[key]
+        response = build()
+        if key:
+            responses[key] = response
+        return response
+
+    @app.get("/health")
+    async def health() -> Dict[str, Any]:
+        return {"status": "ok", "backend": backend, **app.state.stats}
+
+    if backend == "device_management":
+        @app.post("/devices/{device_id}/actions")
+        async def run_action(device_id: str, body: Dict[str, Any], idempotency_key: Optional[str] = Header(None)) -> Dict[str, Any]:
+            if "action" not in body:
+                raise HTTPException(status_code=422, detail="action is required")
+            return once(idempotency_key, lambda: {
+                "command_id": str(uuid.uuid4()),
+                "device_id": device_id,
+                "action": body["action"],
+                "status": "accepted",
+            })
+
+        @app.get("/devices/{device_id}/status")
+        async def device_status(device_id: str) -> Dict[str, Any]:
+            return {"device_id": device_id, "reachable": True}
+
+    elif backend == "crm":
+        @app.post("/accounts/{account_id}/subscription:sync")
+        async def sync_subscription(account_id: str, idempotency_key: Optional[str] = Header(None)) -> Dict[str, Any]:
+            return once(idempotency_key, lambda: {"account_id": account_id, "status": "synced"})
+
+        @app.post("/shipments")
+        async def create_shipment(body: Dict[str, Any], idempotency_key: Optional[str] = Header(None)) -> Dict[str, Any]:
+            return once(idempotency_key, lambda: {"shipment_id": f"SHP-{uuid.uuid4().hex[:10]}", "status": "created", **body})
+
+        @app.post("/tickets")
+        async def create_ticket(body: Dict[str, Any], idempotency_key: Optional[str] = Header(None)) -> Dict[str, Any]:
+            return once(idempotency_key, lambda: {"ticket_id": f"TCK-{uuid.uuid4().hex[:10]}", "status": "open", "queue": body.get("queue")})
+
+    else:
+        @app.post("/interactions/route")
+        async def route_interaction(body: Dict[str, Any], idempotency_key: Optional[str] = Header(None)) -> Dict[str, Any]:
+            return once(idempotency_key, lambda: {"routing_id": str(uuid.uuid4()), "queue": body.get("queue"), "status": "queued"})
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a fake integration backend over HTTP")
+    parser.add_argument("backend", choices=BACKENDS)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--error-rate", type=float, default=FAKE_ERROR_RATE)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(create_fake_app(args.backend, error_rate=args.error_rate), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
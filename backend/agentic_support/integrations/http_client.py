@@ -0,0 +1,252 @@
+"""
+Async HTTP client layer for backend integrations (device management, CRM, CCaaS)
+Author: Vinod Kumar V (VKV)
+
+All integration clients share one httpx.AsyncClient, so keep-alive connections
+are pooled across backends. On top of it every request gets:
+  - a per-host concurrency limit (asyncio.Semaphore)
+  - connect / read timeouts
+  - retries with exponential backoff and full jitter on transport errors,
+    429 and 5xx - only for requests that are safe to repeat (GET, or a write
+    carrying an Idempotency-Key)
+  - a per-backend circuit breaker that fails fast while the backend is down
+
+Hosts can be mounted onto in-process ASGI apps (see fake_servers.py), which is
+how the service runs and is load-tested offline.
+
+Usage:
+    from agentic_support.integrations.http_client import IntegrationClient, integration_pool
+
+    class TicketingClient(IntegrationClient):
+        async def create_ticket(self, payload):
+            return await self.request("POST", "/tickets", json=payload, idempotency_key=payload["id"])
+"""
+
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+INTEGRATION_TIMEOUT_SECONDS = float(os.getenv("INTEGRATION_TIMEOUT_SECONDS", "5"))
+INTEGRATION_CONNECT_TIMEOUT_SECONDS = float(os.getenv("INTEGRATION_CONNECT_TIMEOUT_SECONDS", "2"))
+INTEGRATION_MAX_CONNECTIONS = int(os.getenv("INTEGRATION_MAX_CONNECTIONS", "200"))
+INTEGRATION_MAX_KEEPALIVE = int(os.getenv("INTEGRATION_MAX_KEEPALIVE", "50"))
+INTEGRATION_PER_HOST_CONCURRENCY = int(os.getenv("INTEGRATION_PER_HOST_CONCURRENCY", "32"))
+INTEGRATION_RETRIES = int(os.getenv("INTEGRATION_RETRIES", "3"))
+INTEGRATION_BACKOFF_BASE_SECONDS = float(os.getenv("INTEGRATION_BACKOFF_BASE_SECONDS", "0.1"))
+INTEGRATION_BACKOFF_MAX_SECONDS = float(os.getenv("INTEGRATION_BACKOFF_MAX_SECONDS", "2"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("INTEGRATION_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("INTEGRATION_BREAKER_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class IntegrationError(Exception):
+    """A backend call failed after its retries."""
+
+    def __init__(self, backend: str, message: str, status_code: Optional[int] = None) -> None:
+        super().__init__(f"{backend}: {message}")
+        self.backend = backend
+        self.status_code = status_code
+
+
+class CircuitOpenError(IntegrationError):
+    """The backend's circuit breaker is open; the call was not attempted."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed -> open after `failure_threshold` failed calls in a row; open -> half_open
+    once `reset_seconds` have passed, letting a single trial call through; the trial's
+    outcome closes the breaker or opens it again. A trial that never reports back
+    (e.g. cancelled) is replaced by another after `reset_seconds`.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started: Optional[float] = None
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self.state = "half_open"
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if self.state == "half_open" and (self._trial_started is None or now - self._trial_started >= self.reset_seconds):
+            self._trial_started = now
+            return True
+        self._stats["rejected"] += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self._failures = 0
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial_started = None
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                self._stats["opened"] += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self._failures, **self._stats}
+
+
+class IntegrationPool:
+    """The shared AsyncClient plus per-host semaphores; created lazily on first use."""
+
+    def __init__(
+        self,
+        max_connections: int = INTEGRATION_MAX_CONNECTIONS,
+        max_keepalive: int = INTEGRATION_MAX_KEEPALIVE,
+        per_host_concurrency: int = INTEGRATION_PER_HOST_CONCURRENCY,
+    ) -> None:
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.timeout = httpx.Timeout(INTEGRATION_TIMEOUT_SECONDS, connect=INTEGRATION_CONNECT_TIMEOUT_SECONDS)
+        self.per_host_concurrency = per_host_concurrency
+        self._mounts: Dict[str, httpx.AsyncBaseTransport] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def mount(self, base_url: str, app: Any) -> None:
+        """Serve `base_url` from an in-process ASGI app instead of the network."""
+        if self._client is not None:
+            raise RuntimeError("Mount integration apps before the first request")
+        self._mounts[base_url.rstrip("/")] = httpx.ASGITransport(app=app)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, mounts=self._mounts or None)
+        return self._client
+
+    @asynccontextmanager
+    async def host_slot(self, url: str) -> AsyncIterator[None]:
+        """Hold one of the host's concurrent request slots."""
+        host = urlsplit(url).netloc
+        semaphore = self._host_limits.get(host)
+        if semaphore is None:
+            semaphore = self._host_limits[host] = asyncio.Semaphore(self.per_host_concurrency)
+        async with semaphore:
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            try:
+                yield
+            finally:
+                self._in_flight[host] -= 1
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_connections": self.limits.max_connections,
+            "max_keepalive": self.limits.max_keepalive_connections,
+            "per_host_concurrency": self.per_host_concurrency,
+            "in_flight": dict(self._in_flight),
+            "mounted": sorted(self._mounts),
+        }
+
+
+class IntegrationClient:
+    """Base class of the backend clients: one base URL, one circuit breaker, the shared pool."""
+
+    backend = "integration"
+
+    def __init__(
+        self,
+        base_url: str,
+        pool: Optional[IntegrationPool] = None,
+        retries: int = INTEGRATION_RETRIES,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.pool = pool or integration_pool
+        self.retries = retries
+        self.breaker = breaker or CircuitBreaker()
+        self._stats = {"requests": 0, "attempts": 0, "retries": 0, "failures": 0}
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), INTEGRATION_BACKOFF_MAX_SECONDS)
+            except ValueError:
+                pass
+        # Full jitter: uniform over [0, base * 2^attempt], capped
+        return random.uniform(0, min(INTEGRATION_BACKOFF_MAX_SECONDS, INTEGRATION_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        json: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Send a request and return its JSON body; raises IntegrationError / CircuitOpenError."""
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.backend, "circuit open")
+        self._stats["requests"] += 1
+
+        url = self.base_url + path
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        retries = self.retries if method == "GET" or idempotency_key else 0
+        error = ""
+        status_code = None
+        for attempt in range(retries + 1):
+            self._stats["attempts"] += 1
+            retry_after = None
+            try:
+                async with self.pool.host_slot(url):
+                    response = await self.pool.client.request(method, url, json=json, params=params, headers=headers)
+            except httpx.TransportError as e:
+                error, status_code = f"{type(e).__name__}: {e}", None
+            else:
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    try:
+                        return response.json() if response.content else {}
+                    except ValueError:
+                        raise IntegrationError(self.backend, "response is not JSON", response.status_code)
+                status_code = response.status_code
+                error = f"HTTP {status_code}: {response.text[:200]}"
+                if status_code not in RETRYABLE_STATUS:
+                    break
+                retry_after = response.headers.get("Retry-After")
+            if attempt < retries:
+                self._stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+
+        self._stats["failures"] += 1
+        # A 4xx other than 429 is the caller's problem, not a sign the backend is down
+        if status_code is None or status_code in RETRYABLE_STATUS:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        raise IntegrationError(self.backend, error, status_code)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"base_url": self.base_url, **self._stats, "breaker": self.breaker.stats()}
+
+
+# Global instance
+integration_pool = IntegrationPool()
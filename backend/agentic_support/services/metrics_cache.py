@@ -0,0 +1,169 @@
+"""
+In-process response cache for metrics endpoints
+Author: Vinod Kumar V (VKV)
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..db.time_range import format_timestamp, parse_bound
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "window_end")
+
+    def __init__(self, value: Any, size: int, expires_at: Optional[float], window_end: Optional[datetime]):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.window_end = window_end
+
+
+class MetricsCache:
+    """
+    LRU cache of metrics query results keyed by endpoint and normalized parameters.
+
+    - Windows that reach "now" (no to_date, or to_date in the future) expire after a
+      short TTL, which bounds how stale a live dashboard can get.
+    - Closed historical windows are cached until evicted or until the write path
+      reports a row landing inside them (invalidate_since).
+    - Total size (approximated by the JSON-encoded length) is capped; least recently
+      used entries are evicted first.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, open_window_ttl_seconds: Optional[float] = None):
+        self.max_bytes = max_bytes or int(os.getenv("METRICS_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+        if open_window_ttl_seconds is None:
+            open_window_ttl_seconds = float(os.getenv("METRICS_CACHE_OPEN_TTL_SECONDS", "5"))
+        self.open_window_ttl_seconds = open_window_ttl_seconds
+
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so results computed across one are not stored
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "expirations": 0}
+
+    @staticmethod
+    def _normalize(value: Any) -> Any:
+        if isinstance(value, str):
+            try:
+                return format_timestamp(parse_bound(value))
+            except ValueError:
+                return value
+        return value
+
+    def get_or_compute(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Any],
+        always_open: bool = False,
+        window_end: Optional[datetime] = None,
+    ) -> Any:
+        """
+        Return the cached result for (endpoint, params) or compute and store it.
+
+        always_open marks endpoints whose SQL is relative to the current time
+        (e.g. alerts), so they are always treated as open windows.
+        window_end is the end of the data the endpoint's SQL reads, when that is later
+        than to_date (e.g. DATE columns include to_date's whole day, see
+        date_range_end); whether the window is still open is decided from it.
+        """
+        key = (endpoint,) + tuple(sorted(
+            (k, self._normalize(v) if k.endswith("_date") else v) for k, v in params.items()
+        ))
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at is not None and entry.expires_at <= now:
+                    self._remove(key)
+                    self._stats["expirations"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry.value
+            self._stats["misses"] += 1
+            generation = self._generation
+
+        value = compute()
+
+        if always_open:
+            window_end = None
+        elif window_end is None:
+            try:
+                window_end = parse_bound(params.get("to_date"))
+            except ValueError:
+                window_end = None
+        is_open = window_end is None or window_end > datetime.utcnow()
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return value
+
+        with self._lock:
+            if not is_open and generation != self._generation:
+                # A write landed while computing; the closed-window result may be stale
+                return value
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(
+                value,
+                size,
+                now + self.open_window_ttl_seconds if is_open else None,
+                None if is_open else window_end,
+            )
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+        return value
+
+    def invalidate_since(self, since: Optional[datetime] = None) -> int:
+        """
+        Drop closed-window entries that could contain data written at or after `since`.
+
+        Called from the metrics write path; `since` is the earliest timestamp written.
+        Open windows are left to their TTL. None drops everything.
+        """
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if since is None or (entry.window_end is not None and entry.window_end >= since)
+            ]
+            for key in stale:
+                self._remove(key)
+            self._stats["invalidations"] += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current footprint."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"entries": len(self._entries), "bytes": self._bytes})
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_bytes"] = self.max_bytes
+        stats["open_window_ttl_seconds"] = self.open_window_ttl_seconds
+        return stats
+
+    def _remove(self, key: Tuple) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+# Global instance
+metrics_cache = MetricsCache()
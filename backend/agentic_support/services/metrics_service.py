@@ -5,9 +5,13 @@ Author: Vinod Kumar V (VKV)
 
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
-from ..db.database import get_db
+from ..db.database import get_reader, get_writer
+from ..db.rollups import bucket_range_clause, choose_rollup
+from ..db.time_range import date_range_clause, day_bounds, range_clause
+from ..utils.latency_sketch import LatencySketch
+from .metrics_cache import metrics_cache
 
 
 class MetricsService:
@@ -21,7 +25,7 @@ class MetricsService:
         limit: int = 100,
     ) -> List[Dict[str, Any]]:
         """Get agent execution metrics."""
-        with get_db() as conn:
+        with get_reader() as conn:
             cursor = conn.cursor()
             
             query = "SELECT * FROM agent_metrics WHERE 1=1"
@@ -31,13 +35,9 @@ class MetricsService:
                 query += " AND agent_name = ?"
                 params.append(agent_name)
             
-            if from_date:
-                query += " AND timestamp >= ?"
-                params.append(from_date)
-            
-            if to_date:
-                query += " AND timestamp <= ?"
-                params.append(to_date)
+            range_sql, range_params = range_clause("timestamp", from_date, to_date)
+            query += range_sql
+            params.extend(range_params)
             
             query += " ORDER BY timestamp DESC LIMIT ?"
             params.append(limit)
@@ -48,64 +48,196 @@ class MetricsService:
             return [dict(row) for row in rows]
     
     @staticmethod
-    def get_agent_aggregates(
+    def _agent_aggregate_query(
+        group_by: str,
         agent_name: Optional[str] = None,
+        category_ids: Optional[List[str]] = None,
         from_date: Optional[str] = None,
         to_date: Optional[str] = None,
-    ) -> Dict[str, Any]:
-        """Get aggregated metrics for agents."""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            
-            query = """
+    ) -> Tuple[str, List[Any]]:
+        """
+        Build a grouped agent aggregate query (group_by is agent_name or category_id).
+
+        Uses the coarsest rollup that fits the range, falling back to agent_metrics.
+        NULL category ids are reported as '' in both paths.
+        """
+        rollup = choose_rollup(from_date, to_date)
+        if rollup:
+            table, from_bucket, to_bucket = rollup
+            query = f"""
                 SELECT 
-                    agent_name,
+                    {group_by} as group_key,
+                    SUM(execution_count) as execution_count,
+                    SUM(success_count) as successful_executions,
+                    SUM(execution_count) - SUM(success_count) as failed_executions,
+                    SUM(latency_sum_ms) * 1.0 / SUM(execution_count) as avg_latency_ms,
+                    MIN(latency_min_ms) as min_latency_ms,
+                    MAX(latency_max_ms) as max_latency_ms,
+                    SUM(tokens_sum) as total_tokens,
+                    SUM(cost_sum_usd) as total_cost_usd,
+                    sketch_merge_agg(latency_sketch) as latency_sketch
+                FROM {table}
+                WHERE 1=1
+            """
+            category_column = "category_id"
+            range_sql, range_params = bucket_range_clause(from_bucket, to_bucket)
+        else:
+            group_expr = "COALESCE(category_id, '')" if group_by == "category_id" else group_by
+            query = f"""
+                SELECT 
+                    {group_expr} as group_key,
                     COUNT(*) as execution_count,
                     SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful_executions,
                     SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as failed_executions,
                     AVG(latency_ms) as avg_latency_ms,
+                    MIN(latency_ms) as min_latency_ms,
+                    MAX(latency_ms) as max_latency_ms,
                     SUM(tokens_total) as total_tokens,
-                    SUM(cost_usd) as total_cost_usd
+                    SUM(cost_usd) as total_cost_usd,
+                    sketch_build(latency_ms) as latency_sketch
                 FROM agent_metrics
                 WHERE 1=1
             """
-            params = []
+            category_column = "COALESCE(category_id, '')"
+            range_sql, range_params = range_clause("timestamp", from_date, to_date)
+        
+        params: List[Any] = []
+        
+        if agent_name:
+            query += " AND agent_name = ?"
+            params.append(agent_name)
+        
+        if category_ids is not None:
+            query += f" AND {category_column} IN ({', '.join('?' for _ in category_ids) or 'NULL'})"
+            params.extend(category_ids)
+        
+        query += range_sql + " GROUP BY group_key"
+        params.extend(range_params)
+        return query, params
+    
+    @staticmethod
+    def _format_agent_aggregate(row) -> Dict[str, Any]:
+        exec_count = row["execution_count"]
+        success_count = row["successful_executions"]
+        success_rate = (success_count / exec_count * 100) if exec_count > 0 else 0
+        
+        return {
+            "execution_count": exec_count,
+            "successful_executions": success_count,
+            "failed_executions": row["failed_executions"],
+            "success_rate": round(success_rate, 2),
+            "avg_latency_ms": round(row["avg_latency_ms"] or 0, 2),
+            "min_latency_ms": row["min_latency_ms"] or 0,
+            "max_latency_ms": row["max_latency_ms"] or 0,
+            **LatencySketch.from_bytes(row["latency_sketch"]).percentiles(),
+            "total_tokens": row["total_tokens"] or 0,
+            "total_cost_usd": round(row["total_cost_usd"] or 0.0, 4),
+        }
+    
+    @staticmethod
+    def get_agent_aggregates(
+        agent_name: Optional[str] = None,
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+        category_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Get aggregated metrics for agents (served from rollups when the range allows)."""
+        with get_reader() as conn:
+            cursor = conn.cursor()
             
-            if agent_name:
-                query += " AND agent_name = ?"
-                params.append(agent_name)
+            query, params = MetricsService._agent_aggregate_query(
+                "agent_name",
+                agent_name=agent_name,
+                category_ids=[category_id] if category_id else None,
+                from_date=from_date,
+                to_date=to_date,
+            )
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            
+            return [
+                {"agent_name": row["group_key"], **MetricsService._format_agent_aggregate(row)}
+                for row in rows
+            ]
+    
+    @staticmethod
+    def get_category_insights(
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+        limit: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """
+        AI vs human comparison for the busiest categories.
+
+        Two grouped queries on one connection: category totals over the range, then
+        agent aggregates grouped by category_id for just those categories.
+        """
+        with get_reader() as conn:
+            cursor = conn.cursor()
             
-            if from_date:
-                query += " AND timestamp >= ?"
-                params.append(from_date)
+            category_query = """
+                SELECT 
+                    category_id,
+                    MAX(category_name) as category_name,
+                    SUM(total_tickets) as total_tickets,
+                    SUM(successful_tickets) as successful_tickets,
+                    SUM(avg_latency_ms * total_tickets) * 1.0 / NULLIF(SUM(total_tickets), 0) as avg_latency_ms,
+                    SUM(total_cost_usd) as total_cost_usd
+                FROM category_metrics
+                WHERE 1=1
+            """
+            params: List[Any] = []
             
-            if to_date:
-                query += " AND timestamp <= ?"
-                params.append(to_date)
+            range_sql, range_params = date_range_clause("date", from_date, to_date)
+            category_query += range_sql
+            params.extend(range_params)
             
-            query += " GROUP BY agent_name"
+            category_query += " GROUP BY category_id ORDER BY total_tickets DESC, category_id LIMIT ?"
+            params.append(limit)
             
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
+            cursor.execute(category_query, params)
+            categories = cursor.fetchall()
+            if not categories:
+                return []
+            
+            agent_query, agent_params = MetricsService._agent_aggregate_query(
+                "category_id",
+                category_ids=[row["category_id"] for row in categories],
+                from_date=from_date,
+                to_date=to_date,
+            )
+            cursor.execute(agent_query, agent_params)
+            agents_by_category = {
+                row["group_key"]: MetricsService._format_agent_aggregate(row)
+                for row in cursor.fetchall()
+            }
             
-            results = []
-            for row in rows:
-                exec_count = row["execution_count"]
-                success_count = row["successful_executions"]
-                success_rate = (success_count / exec_count * 100) if exec_count > 0 else 0
+            insights = []
+            for cat in categories:
+                total = cat["total_tickets"] or 0
+                success_rate = round((cat["successful_tickets"] or 0) / total * 100, 2) if total > 0 else 0
+                agents = agents_by_category.get(cat["category_id"])
                 
-                results.append({
-                    "agent_name": row["agent_name"],
-                    "execution_count": exec_count,
-                    "successful_executions": success_count,
-                    "failed_executions": row["failed_executions"],
-                    "success_rate": round(success_rate, 2),
-                    "avg_latency_ms": round(row["avg_latency_ms"] or 0, 2),
-                    "total_tokens": row["total_tokens"] or 0,
-                    "total_cost_usd": round(row["total_cost_usd"] or 0.0, 4),
+                insights.append({
+                    "category_id": cat["category_id"],
+                    "category_name": cat["category_name"],
+                    "ai_handled": {
+                        "resolution_rate": success_rate,
+                        "avg_time_seconds": (cat["avg_latency_ms"] / 1000) if cat["avg_latency_ms"] else 0,
+                        "accuracy": agents["success_rate"] if agents else success_rate,
+                        "cost_usd": cat["total_cost_usd"] or 0.0,
+                        "agent_executions": agents["execution_count"] if agents else 0,
+                        "agent_p90_latency_ms": agents["p90_latency_ms"] if agents else 0.0,
+                    },
+                    "human_handled": {
+                        "resolution_rate": 82.0,  # Placeholder
+                        "avg_time_seconds": 432.0,  # 7.2 minutes placeholder
+                        "csat": 4.3,  # Placeholder
+                        "cost_usd": 12.50,  # Placeholder
+                    },
                 })
             
-            return results
+            return insights
     
     @staticmethod
     def get_category_metrics(
@@ -114,7 +246,7 @@ class MetricsService:
         to_date: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
         """Get category-level metrics."""
-        with get_db() as conn:
+        with get_reader() as conn:
             cursor = conn.cursor()
             
             query = "SELECT * FROM category_metrics WHERE 1=1"
@@ -124,13 +256,9 @@ class MetricsService:
                 query += " AND category_id = ?"
                 params.append(category_id)
             
-            if from_date:
-                query += " AND date >= ?"
-                params.append(from_date)
-            
-            if to_date:
-                query += " AND date <= ?"
-                params.append(to_date)
+            range_sql, range_params = date_range_clause("date", from_date, to_date)
+            query += range_sql
+            params.extend(range_params)
             
             query += " ORDER BY date DESC"
             
@@ -146,7 +274,7 @@ class MetricsService:
         to_date: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Get ticket resolution metrics with breakdown."""
-        with get_db() as conn:
+        with get_reader() as conn:
             cursor = conn.cursor()
             
             query = """
@@ -163,13 +291,9 @@ class MetricsService:
                 query += " AND category_id = ?"
                 params.append(category_id)
             
-            if from_date:
-                query += " AND created_at >= ?"
-                params.append(from_date)
-            
-            if to_date:
-                query += " AND created_at <= ?"
-                params.append(to_date)
+            range_sql, range_params = range_clause("created_at", from_date, to_date)
+            query += range_sql
+            params.extend(range_params)
             
             query += " GROUP BY resolution_type"
             
@@ -199,7 +323,7 @@ class MetricsService:
         to_date: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Get human handoff statistics."""
-        with get_db() as conn:
+        with get_reader() as conn:
             cursor = conn.cursor()
             
             query = """
@@ -211,13 +335,9 @@ class MetricsService:
             """
             params = []
             
-            if from_date:
-                query += " AND handoff_timestamp >= ?"
-                params.append(from_date)
-            
-            if to_date:
-                query += " AND handoff_timestamp <= ?"
-                params.append(to_date)
+            range_sql, range_params = range_clause("handoff_timestamp", from_date, to_date)
+            query += range_sql
+            params.extend(range_params)
             
             query += " GROUP BY handoff_type"
             
@@ -229,12 +349,9 @@ class MetricsService:
             # Get total tickets for percentage calculation
             total_query = "SELECT COUNT(*) as total FROM ticket_resolution_metrics WHERE 1=1"
             total_params = []
-            if from_date:
-                total_query += " AND created_at >= ?"
-                total_params.append(from_date)
-            if to_date:
-                total_query += " AND created_at <= ?"
-                total_params.append(to_date)
+            range_sql, range_params = range_clause("created_at", from_date, to_date)
+            total_query += range_sql
+            total_params.extend(range_params)
             
             cursor.execute(total_query, total_params)
             total_tickets = cursor.fetchone()["total"] or 0
@@ -260,7 +377,7 @@ class MetricsService:
         to_date: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
         """Get volume by entry channel."""
-        with get_db() as conn:
+        with get_reader() as conn:
             cursor = conn.cursor()
             
             query = """
@@ -274,13 +391,9 @@ class MetricsService:
             """
             params = []
             
-            if from_date:
-                query += " AND created_at >= ?"
-                params.append(from_date)
-            
-            if to_date:
-                query += " AND created_at <= ?"
-                params.append(to_date)
+            range_sql, range_params = range_clause("created_at", from_date, to_date)
+            query += range_sql
+            params.extend(range_params)
             
             query += " GROUP BY channel ORDER BY volume DESC"
             
@@ -303,7 +416,7 @@ class MetricsService:
         to_date: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Get key performance indicators."""
-        with get_db() as conn:
+        with get_reader() as conn:
             cursor = conn.cursor()
             
             # Self-heal success rate
@@ -315,12 +428,9 @@ class MetricsService:
                 WHERE 1=1
             """
             resolution_params = []
-            if from_date:
-                resolution_query += " AND created_at >= ?"
-                resolution_params.append(from_date)
-            if to_date:
-                resolution_query += " AND created_at <= ?"
-                resolution_params.append(to_date)
+            range_sql, range_params = range_clause("created_at", from_date, to_date)
+            resolution_query += range_sql
+            resolution_params.extend(range_params)
             
             cursor.execute(resolution_query, resolution_params)
             resolution_row = cursor.fetchone()
@@ -335,30 +445,34 @@ class MetricsService:
                 WHERE mtr_seconds IS NOT NULL
             """
             mtr_params = []
-            if from_date:
-                mtr_query += " AND created_at >= ?"
-                mtr_params.append(from_date)
-            if to_date:
-                mtr_query += " AND created_at <= ?"
-                mtr_params.append(to_date)
+            range_sql, range_params = range_clause("created_at", from_date, to_date)
+            mtr_query += range_sql
+            mtr_params.extend(range_params)
             
             cursor.execute(mtr_query, mtr_params)
             mtr_row = cursor.fetchone()
             avg_mtr_seconds = mtr_row["avg_mtr"] or 0
             
             # Total cost savings (estimate: human support costs $12.50 per ticket, AI costs from agent_metrics)
-            cost_query = """
-                SELECT SUM(cost_usd) as total_cost
-                FROM agent_metrics
-                WHERE 1=1
-            """
-            cost_params = []
-            if from_date:
-                cost_query += " AND timestamp >= ?"
-                cost_params.append(from_date)
-            if to_date:
-                cost_query += " AND timestamp <= ?"
-                cost_params.append(to_date)
+            rollup = choose_rollup(from_date, to_date)
+            if rollup:
+                table, from_bucket, to_bucket = rollup
+                range_sql, cost_params = bucket_range_clause(from_bucket, to_bucket)
+                cost_query = f"""
+                    SELECT SUM(cost_sum_usd) as total_cost
+                    FROM {table}
+                    WHERE 1=1{range_sql}
+                """
+            else:
+                cost_query = """
+                    SELECT SUM(cost_usd) as total_cost
+                    FROM agent_metrics
+                    WHERE 1=1
+                """
+                cost_params = []
+                range_sql, range_params = range_clause("timestamp", from_date, to_date)
+                cost_query += range_sql
+                cost_params.extend(range_params)
             
             cursor.execute(cost_query, cost_params)
             cost_row = cursor.fetchone()
@@ -384,7 +498,7 @@ class MetricsService:
         to_date: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Get agent collaboration patterns."""
-        with get_db() as conn:
+        with get_reader() as conn:
             cursor = conn.cursor()
             
             # Autonomous agent chain (tickets that were auto-resolved)
@@ -394,12 +508,9 @@ class MetricsService:
                 WHERE resolution_type = 'auto-resolved'
             """
             auto_params = []
-            if from_date:
-                auto_query += " AND created_at >= ?"
-                auto_params.append(from_date)
-            if to_date:
-                auto_query += " AND created_at <= ?"
-                auto_params.append(to_date)
+            range_sql, range_params = range_clause("created_at", from_date, to_date)
+            auto_query += range_sql
+            auto_params.extend(range_params)
             
             cursor.execute(auto_query, auto_params)
             auto_count = cursor.fetchone()["count"] or 0
@@ -413,12 +524,9 @@ class MetricsService:
                 WHERE 1=1
             """
             agent_params = []
-            if from_date:
-                agent_success_query += " AND timestamp >= ?"
-                agent_params.append(from_date)
-            if to_date:
-                agent_success_query += " AND timestamp <= ?"
-                agent_params.append(to_date)
+            range_sql, range_params = range_clause("timestamp", from_date, to_date)
+            agent_success_query += range_sql
+            agent_params.extend(range_params)
             
             cursor.execute(agent_success_query, agent_params)
             agent_row = cursor.fetchone()
@@ -435,16 +543,16 @@ class MetricsService:
                 WHERE success = 1
             """
             agent_avg_params = []
-            if from_date:
-                agent_avg_query += " AND timestamp >= ?"
-                agent_avg_params.append(from_date)
-            if to_date:
-                agent_avg_query += " AND timestamp <= ?"
-                agent_avg_params.append(to_date)
+            range_sql, range_params = range_clause("timestamp", from_date, to_date)
+            agent_avg_query += range_sql
+            agent_avg_params.extend(range_params)
             
             cursor.execute(agent_avg_query, agent_avg_params)
             agent_avg_row = cursor.fetchone()
             
+            # Tail latency across the agent chain (merged sketches, all executions)
+            latency_percentiles = MetricsService._latency_sketch(cursor, from_date, to_date).percentiles()
+            
             # AI-to-Human handoff
             handoff_query = """
                 SELECT 
@@ -454,12 +562,9 @@ class MetricsService:
                 WHERE resolution_type = 'escalated' AND handoff_type IS NOT NULL
             """
             handoff_params = []
-            if from_date:
-                handoff_query += " AND created_at >= ?"
-                handoff_params.append(from_date)
-            if to_date:
-                handoff_query += " AND created_at <= ?"
-                handoff_params.append(to_date)
+            range_sql, range_params = range_clause("created_at", from_date, to_date)
+            handoff_query += range_sql
+            handoff_params.extend(range_params)
             
             cursor.execute(handoff_query, handoff_params)
             handoff_row = cursor.fetchone()
@@ -473,6 +578,7 @@ class MetricsService:
                     "volume": auto_count,
                     "success_rate": round(agent_success_rate, 2),
                     "avg_latency_ms": round(agent_avg_row["avg_latency"] or 0, 2),
+                    **latency_percentiles,
                     "cost_per_resolution_usd": round(agent_avg_row["avg_cost"] or 0.0, 4),
                 },
                 "ai_to_human_handoff": {
@@ -489,6 +595,28 @@ class MetricsService:
                 },
             }
     
+    @staticmethod
+    def _latency_sketch(
+        cursor,
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+    ) -> LatencySketch:
+        """Merge stored latency sketches for a range (raw scan if no rollup fits)."""
+        rollup = choose_rollup(from_date, to_date)
+        if rollup:
+            table, from_bucket, to_bucket = rollup
+            range_sql, params = bucket_range_clause(from_bucket, to_bucket)
+            query = f"SELECT sketch_merge_agg(latency_sketch) as sketch FROM {table} WHERE 1=1{range_sql}"
+        else:
+            query = "SELECT sketch_build(latency_ms) as sketch FROM agent_metrics WHERE 1=1"
+            params = []
+            range_sql, range_params = range_clause("timestamp", from_date, to_date)
+            query += range_sql
+            params.extend(range_params)
+        
+        cursor.execute(query, params)
+        return LatencySketch.from_bytes(cursor.fetchone()["sketch"])
+    
     @staticmethod
     def get_alerts(
         from_date: Optional[str] = None,
@@ -497,13 +625,14 @@ class MetricsService:
         """Get system health alerts based on thresholds."""
         alerts = []
         
-        with get_db() as conn:
+        with get_reader() as conn:
             cursor = conn.cursor()
             
-            # Check for high latency agents
+            # Check for high latency agents (pinned to the time index: the planner otherwise
+            # prefers the agent_name index to skip the GROUP BY sort and scans all of it)
             latency_query = """
                 SELECT agent_name, AVG(latency_ms) as avg_latency
-                FROM agent_metrics
+                FROM agent_metrics INDEXED BY idx_agent_metrics_time_cover
                 WHERE timestamp >= datetime('now', '-1 hour')
                 GROUP BY agent_name
                 HAVING AVG(latency_ms) > 2000
@@ -525,7 +654,7 @@ class MetricsService:
                 SELECT 
                     agent_name,
                     (SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*)) as current_rate
-                FROM agent_metrics
+                FROM agent_metrics INDEXED BY idx_agent_metrics_time_cover
                 WHERE timestamp >= datetime('now', '-24 hours')
                 GROUP BY agent_name
                 HAVING current_rate < 70
@@ -575,9 +704,12 @@ class MetricsService:
         date: str,
     ):
         """Update or insert category metrics (called after ticket resolution)."""
-        with get_db() as conn:
+        with get_writer() as conn:
             cursor = conn.cursor()
             
+            # Half-open [day, day + 1) bounds keep both lookups on the composite indexes
+            day_start, day_end = day_bounds(date)
+            
             # Get ticket counts for this category and date
             resolution_query = """
                 SELECT 
@@ -586,9 +718,9 @@ class MetricsService:
                     SUM(CASE WHEN resolution_type = 'failed' THEN 1 ELSE 0 END) as failed,
                     AVG(mtr_seconds) as avg_mtr
                 FROM ticket_resolution_metrics
-                WHERE category_id = ? AND DATE(created_at) = ?
+                WHERE category_id = ? AND created_at >= ? AND created_at < ?
             """
-            cursor.execute(resolution_query, (category_id, date))
+            cursor.execute(resolution_query, (category_id, day_start, day_end))
             resolution_row = cursor.fetchone()
             
             # Get agent metrics for this category
@@ -598,9 +730,9 @@ class MetricsService:
                     SUM(tokens_total) as total_tokens,
                     SUM(cost_usd) as total_cost
                 FROM agent_metrics
-                WHERE category_id = ? AND DATE(timestamp) = ?
+                WHERE category_id = ? AND timestamp >= ? AND timestamp < ?
             """
-            cursor.execute(agent_query, (category_id, date))
+            cursor.execute(agent_query, (category_id, day_start, day_end))
             agent_row = cursor.fetchone()
             
             total = resolution_row["total"] or 0
@@ -636,6 +768,8 @@ class MetricsService:
                 agent_row["total_cost"] or 0.0,
                 datetime.utcnow(),
             ))
+        
+        metrics_cache.invalidate_since(datetime.fromisoformat(day_start))
 
 
 # Global instance
@@ -0,0 +1,166 @@
+"""
+Mergeable latency quantile sketch (DDSketch-style) for agent metrics
+Author: Vinod Kumar V (VKV)
+"""
+
+import math
+import struct
+from typing import Dict, Iterable, Optional
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BINS = 2048
+
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<BdQI")  # version, relative accuracy, zero count, number of bins
+
+
+class LatencySketch:
+    """
+    Log-bucketed quantile sketch with a fixed relative error.
+
+    Every value v > 0 lands in bin ceil(log_gamma(v)), so any quantile is reported
+    within +/- relative_accuracy of the true value. Two sketches with the same
+    accuracy merge by adding bin counts, which makes them safe to store per time
+    bucket and combine at query time. Size depends on the latency spread, not on
+    how many samples were added (~700 bins cover 1ms..1000s at 1%).
+    """
+
+    __slots__ = ("relative_accuracy", "max_bins", "_gamma", "_log_gamma", "bins", "zero_count", "count")
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, max_bins: int = DEFAULT_MAX_BINS):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: Optional[float], count: int = 1) -> None:
+        """Record a latency sample (values <= 0 are kept in a dedicated zero bin)."""
+        if value is None or count <= 0:
+            return
+        self.count += count
+        if value <= 0:
+            self.zero_count += count
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def merge(self, other: "LatencySketch") -> "LatencySketch":
+        """Fold another sketch into this one in place."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at quantile q (0..1), or None if the sketch is empty."""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self._gamma ** key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self.bins) / (self._gamma + 1)
+
+    def percentiles(self) -> Dict[str, float]:
+        """p50/p90/p99 latency in ms, rounded for API responses."""
+        return {
+            f"p{int(q * 100)}_latency_ms": round(self.quantile(q) or 0.0, 2)
+            for q in (0.5, 0.9, 0.99)
+        }
+
+    def _collapse(self) -> None:
+        # Fold the lowest bins together; high quantiles keep their accuracy
+        keys = sorted(self.bins)
+        overflow = len(keys) - self.max_bins + 1
+        target = keys[overflow]
+        for key in keys[:overflow]:
+            self.bins[target] += self.bins.pop(key)
+
+    def to_bytes(self) -> bytes:
+        """Compact little-endian encoding for storage in SQLite BLOB columns."""
+        keys = sorted(self.bins)
+        return (
+            _HEADER.pack(_FORMAT_VERSION, self.relative_accuracy, self.zero_count, len(keys))
+            + struct.pack(f"<{len(keys)}i", *keys)
+            + struct.pack(f"<{len(keys)}Q", *(self.bins[key] for key in keys))
+        )
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> "LatencySketch":
+        """Decode a sketch produced by to_bytes(); None decodes to an empty sketch."""
+        if not data:
+            return cls()
+        version, accuracy, zero_count, n = _HEADER.unpack_from(data, 0)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported latency sketch version {version}")
+        sketch = cls(relative_accuracy=accuracy)
+        offset = _HEADER.size
+        keys = struct.unpack_from(f"<{n}i", data, offset)
+        counts = struct.unpack_from(f"<{n}Q", data, offset + 4 * n)
+        sketch.bins = dict(zip(keys, counts))
+        sketch.zero_count = zero_count
+        sketch.count = zero_count + sum(counts)
+        return sketch
+
+    @classmethod
+    def from_values(cls, values: Iterable[Optional[float]]) -> "LatencySketch":
+        sketch = cls()
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+
+def _merge_blobs(left: Optional[bytes], right: Optional[bytes]) -> Optional[bytes]:
+    if not left:
+        return right
+    if not right:
+        return left
+    return LatencySketch.from_bytes(left).merge(LatencySketch.from_bytes(right)).to_bytes()
+
+
+class _SketchBuildAggregate:
+    """SQL aggregate: sketch_build(latency_ms) -> sketch blob."""
+
+    def __init__(self):
+        self.sketch = LatencySketch()
+
+    def step(self, value):
+        self.sketch.add(value)
+
+    def finalize(self):
+        return self.sketch.to_bytes() if self.sketch.count else None
+
+
+class _SketchMergeAggregate:
+    """SQL aggregate: sketch_merge_agg(sketch_blob) -> merged sketch blob."""
+
+    def __init__(self):
+        self.sketch = LatencySketch()
+
+    def step(self, blob):
+        if blob:
+            self.sketch.merge(LatencySketch.from_bytes(blob))
+
+    def finalize(self):
+        return self.sketch.to_bytes() if self.sketch.count else None
+
+
+def register_sqlite_functions(conn) -> None:
+    """Expose sketch helpers to SQL on a sqlite3 connection."""
+    conn.create_function("sketch_merge", 2, _merge_blobs, deterministic=True)
+    conn.create_aggregate("sketch_build", 1, _SketchBuildAggregate)
+    conn.create_aggregate("sketch_merge_agg", 1, _SketchMergeAggregate)
@@ -5,13 +5,14 @@ Author: Vinod Kumar V (VKV)
 
 import json
 import time
+import uuid
 from contextlib import contextmanager
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from ..db.database import get_db
 from ..integrations.langtrace import langtrace_wrapper
 from .cost_calculator import calculate_cost, get_model_from_agent
+from .metrics_writer import metrics_writer
 
 
 @contextmanager
@@ -49,8 +50,7 @@ def track_agent_execution(
         parent_span_id=parent_span_id,
     )
     
-    with trace_ctx:
-        trace_info = trace_ctx.__enter__()
+    with trace_ctx as trace_info:
         span_id = trace_info["span_id"]
         final_trace_id = trace_info["trace_id"]
         
@@ -89,10 +89,6 @@ def track_agent_execution(
             error_message = str(e)
             raise
         finally:
-            try:
-                trace_ctx.__exit__(None, None, None)
-            except Exception:
-                pass
             # Calculate metrics
             latency_ms = int((time.time() - start_time) * 1000)
             
@@ -106,42 +102,28 @@ def track_agent_execution(
             model = get_model_from_agent(agent_name)
             cost_usd = calculate_cost(model, int(tokens_input), int(tokens_output))
             
-            # Store in database
-            try:
-                with get_db() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        INSERT INTO agent_metrics (
-                            agent_name, agent_description, ticket_id, category_id,
-                            trace_id, span_id, input_text, output_text, tool_calls,
-                            latency_ms, tokens_input, tokens_output, tokens_total,
-                            cost_usd, success, error_message, timestamp
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        agent_name,
-                        agent_description,
-                        ticket_id,
-                        category_id,
-                        final_trace_id,
-                        span_id,
-                        input_text,
-                        output_text,
-                        json.dumps(tool_calls) if tool_calls else None,
-                        latency_ms,
-                        int(tokens_input),
-                        int(tokens_output),
-                        int(tokens_total),
-                        cost_usd,
-                        success,
-                        error_message,
-                        datetime.utcnow(),
-                    ))
-            except Exception as e:
-                print(f"⚠️ Failed to store agent metrics: {e}")
+            # Hand the row to the background writer; never block the event loop on SQLite
+            metrics_writer.submit((
+                agent_name,
+                agent_description,
+                ticket_id,
+                category_id,
+                final_trace_id,
+                span_id,
+                input_text,
+                output_text,
+                json.dumps(tool_calls) if tool_calls else None,
+                latency_ms,
+                int(tokens_input),
+                int(tokens_output),
+                int(tokens_total),
+                cost_usd,
+                success,
+                error_message,
+                datetime.utcnow(),
+            ))
 
 
 def get_trace_id_for_workflow(workflow_id: str) -> str:
-    """Get or create trace ID for a workflow."""
-    # In production, this might be stored in workflow state
-    # For now, generate a new one
-    return langtrace_wrapper.generate_trace_id()
+    """Trace ID for a workflow: derived from its ID, so every agent step shares one trace."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"agentic-support:workflow:{workflow_id}"))
@@ -0,0 +1,219 @@
+"""
+Background batched writer for agent metrics rows
+Author: Vinod Kumar V (VKV)
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from ..db.database import get_writer
+from ..db.rollups import apply_rollups
+
+
+INSERT_AGENT_METRICS = """
+    INSERT INTO agent_metrics (
+        agent_name, agent_description, ticket_id, category_id,
+        trace_id, span_id, input_text, output_text, tool_calls,
+        latency_ms, tokens_input, tokens_output, tokens_total,
+        cost_usd, success, error_message, timestamp
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Sentinel used to ask the writer thread to drain and exit
+_STOP = object()
+
+
+class MetricsWriter:
+    """
+    Buffers agent metrics rows in a bounded queue and writes them from a dedicated
+    thread using one executemany() transaction per batch.
+
+    Agents only pay for a non-blocking queue put; the event loop never touches SQLite.
+    The per-minute/hour/day rollup tables are updated in the same transaction.
+    A batch is written once it reaches batch_size rows or once linger_ms has passed
+    since its first row, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        linger_ms: Optional[float] = None,
+        max_queue_size: Optional[int] = None,
+    ):
+        self.batch_size = batch_size or int(os.getenv("METRICS_WRITER_BATCH_SIZE", "200"))
+        if linger_ms is None:
+            linger_ms = float(os.getenv("METRICS_WRITER_LINGER_MS", "50"))
+        self.linger_seconds = linger_ms / 1000
+        self.max_queue_size = max_queue_size or int(os.getenv("METRICS_WRITER_QUEUE_SIZE", "10000"))
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self._listeners: List[Callable[[datetime], None]] = []
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "overflowed": 0,  # rejected because the queue was full
+            "dropped": 0,  # lost to a failed write or submitted after close()
+        }
+
+    def submit(self, row: Sequence[Any]) -> bool:
+        """
+        Queue one agent_metrics row (in INSERT_AGENT_METRICS column order).
+
+        Never blocks. Returns False if the row was not accepted.
+        """
+        if self._closed:
+            self._count("dropped")
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(tuple(row))
+        except queue.Full:
+            self._count("overflowed")
+            return False
+        self._count("enqueued")
+        return True
+
+    def add_listener(self, callback: Callable[[datetime], None]) -> None:
+        """
+        Call callback(earliest_timestamp) on the writer thread after each committed batch.
+
+        Used to invalidate caches derived from agent_metrics.
+        """
+        self._listeners.append(callback)
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Block until every row queued before this call has been written."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Flush pending rows and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print("⚠️ Metrics writer queue still full at shutdown; pending rows may be lost")
+            return
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and configuration for monitoring the writer."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            "queue_depth": self._queue.qsize(),
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "linger_ms": self.linger_seconds * 1000,
+            "running": bool(self._thread and self._thread.is_alive()),
+        })
+        return stats
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="metrics-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch: List[tuple] = []
+            waiters: List[threading.Event] = []
+            stop = False
+            deadline = time.monotonic() + self.linger_seconds
+
+            # Collect until the batch is full, the linger time expires or a control item arrives
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if stop:
+                # Drain whatever is still queued so shutdown loses nothing
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                    elif item is not _STOP:
+                        batch.append(item)
+
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _write(self, batch: List[tuple]) -> None:
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            try:
+                with get_writer() as conn:
+                    conn.executemany(INSERT_AGENT_METRICS, chunk)
+                    apply_rollups(conn, chunk)
+            except Exception as e:
+                self._count("dropped", len(chunk))
+                print(f"⚠️ Failed to store {len(chunk)} agent metrics rows: {e}")
+                continue
+            self._count("written", len(chunk))
+            self._count("batches")
+            self._notify(min(row[-1] for row in chunk))
+
+    def _notify(self, earliest: datetime) -> None:
+        for callback in self._listeners:
+            try:
+                callback(earliest)
+            except Exception as e:
+                print(f"⚠️ Metrics writer listener failed: {e}")
+
+
+# Global instance
+metrics_writer = MetricsWriter()
+atexit.register(metrics_writer.close)